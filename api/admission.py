@@ -0,0 +1,211 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+from api.timing import phase
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised when a request can't be admitted: the wait queue of its limit is
+    full or it waited longer than the deadline.
+    """
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ConcurrencyLimit:
+    """
+    Limits the requests running at the same time to `limit`. Requests over
+    the limit wait in a FIFO queue of at most `max_queue` requests for up to
+    `timeout` seconds, and are rejected with `AdmissionRejectedError` when
+    the queue is full or the time is over, instead of piling up.
+
+    It's only used from the event loop, so it needs no locks. A limit of 0
+    disables it.
+
+    Args:
+        name (str): Name of what is limited, used in the errors.
+        limit (int): Requests allowed to run at the same time.
+        max_queue (int): Requests allowed to wait for a slot.
+        timeout (float): Seconds a request can wait for a slot.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queue_full = 0
+        self.timeouts = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(not waiter.done() for waiter in self._waiters)
+
+    def idle(self) -> bool:
+        return self.active == 0 and not self._waiters
+
+    async def acquire(self):
+        if not self.limit:
+            self.admitted += 1
+            return
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.queue_full += 1
+            raise AdmissionRejectedError(
+                f"Too many requests waiting for {self.name}.", 'queue_full')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except BaseException as e:
+            # The slot may have been handed over right as the wait ended
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise AdmissionRejectedError(
+                    f"Waited more than {self.timeout}s for {self.name}.",
+                    'timeout')
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self._discard(waiter)
+        self.admitted += 1
+
+    def release(self):
+        if not self.limit:
+            return
+        # Hand the slot over to the oldest waiter still waiting
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'queue_full': self.queue_full,
+            'timeouts': self.timeouts,
+        }
+
+
+class AdmissionControl:
+    """
+    Admission of the prediction requests: each model can run at most
+    `model_limit` requests at the same time and all of them together at
+    most `global_limit`, each limit with its own wait queue and deadline
+    (see `ConcurrencyLimit`). The model's slot is taken first, so requests
+    queued behind a busy model don't hold global slots.
+
+    Args:
+        global_limit (int): Requests allowed to run at the same time.
+        global_queue (int): Requests allowed to wait for a global slot.
+        model_limit (int): Requests of a model allowed to run at the same
+        time.
+        model_queue (int): Requests of a model allowed to wait for a slot.
+        timeout (float): Seconds a request can wait for each slot.
+        on_reject (Callable[[str, str], None] | None): Called with the scope
+        ('global' or 'model') and the reason ('queue_full' or 'timeout') of
+        each rejection, e.g. to export metrics.
+        max_rejection_models (int): Models whose rejections are counted.
+        Model ids come from the request path, so the models rejected the
+        longest ago are forgotten past it.
+    """
+
+    def __init__(
+            self,
+            global_limit: int,
+            global_queue: int,
+            model_limit: int,
+            model_queue: int,
+            timeout: float,
+            on_reject: Optional[Callable[[str, str], None]] = None,
+            max_rejection_models: int = 1000):
+        self.global_limit = ConcurrencyLimit(
+            'the server', global_limit, global_queue, timeout)
+        self.model_limit = model_limit
+        self.model_queue = model_queue
+        self.timeout = timeout
+        self.on_reject = on_reject
+        self.max_rejection_models = max_rejection_models
+        # Limits of the models with requests running or waiting
+        self.models: dict[str, ConcurrencyLimit] = {}
+        # Rejections by model, kept after their limits are dropped, from the
+        # least to the most recently rejected
+        self.model_rejections: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def admit(self, model_id: str):
+        model = self.models.get(model_id)
+        if model is None:
+            model = self.models[model_id] = ConcurrencyLimit(
+                f'model {model_id}',
+                self.model_limit, self.model_queue, self.timeout)
+        try:
+            with phase('admission'):
+                await self._acquire(model, 'model', model_id)
+            try:
+                with phase('admission'):
+                    await self._acquire(self.global_limit, 'global')
+                try:
+                    yield
+                finally:
+                    self.global_limit.release()
+            finally:
+                model.release()
+        finally:
+            if model.idle() and self.models.get(model_id) is model:
+                del self.models[model_id]
+
+    async def _acquire(
+            self,
+            limit: ConcurrencyLimit,
+            scope: str,
+            model_id: Optional[str] = None):
+        try:
+            await limit.acquire()
+        except AdmissionRejectedError as e:
+            if model_id is not None:
+                count = self.model_rejections.pop(model_id, 0) + 1
+                self.model_rejections[model_id] = count
+                if len(self.model_rejections) > self.max_rejection_models:
+                    oldest = next(iter(self.model_rejections))
+                    del self.model_rejections[oldest]
+            if self.on_reject is not None:
+                self.on_reject(scope, e.reason)
+            raise
+
+    def stats(self) -> dict:
+        models = {
+            model_id: limit.stats() for model_id, limit in self.models.items()
+        }
+        return {
+            'global_limit': self.global_limit.stats(),
+            'model_limit': self.model_limit,
+            'model_queue': self.model_queue,
+            'timeout': self.timeout,
+            'models': models,
+            'model_rejections': dict(self.model_rejections),
+        }
@@ -1,39 +1,756 @@
-import pandas as pd
+import numpy as np
 import os
-import mlflow
 import json
-from fastapi import FastAPI, HTTPException, Query, Path
+import math
+import io
+import csv
+import asyncio
+import logging
+import itertools
+import importlib
+from time import perf_counter
+from tempfile import SpooledTemporaryFile
+from fastapi import FastAPI, HTTPException, Query, Path, Request, Response, \
+    Depends
+from fastapi.responses import StreamingResponse, JSONResponse
 from database.queries import queries
 from database.crud import *
 from api.schemas import *
-from functools import lru_cache
-from tests.conftest import standard_uuid
+from api.model_cache import ModelCache
+from api.warmup import WarmUp, Popularity, select_models, dummy_features
+from api.executors import BoundedExecutor, QueueFullError, \
+    DeadlineExceededError
+from api.admission import AdmissionControl, AdmissionRejectedError
+from api.batching import MicroBatcher
+from api.prediction_cache import PredictionCache
+from api.native import NATIVE_FLAVORS, get_input_dtypes, load_native_model, \
+    matches_pyfunc, run_model
+from api.compiled import CompiledModel
+from api.serialization import encoded_response
+from api.timing import ServerTimingMiddleware, phase, record
+from api.metrics import MetricsMiddleware, CONTENT_TYPE_LATEST, \
+    VALIDATION_FAILURES, generate_metrics, mark_process_dead, \
+    observe_model_cache, observe_query, observe_admission_rejection
+from api.catalog import CatalogVersion, Catalog, CatalogIndex, \
+    load_catalog_index, etag_matches, changed_models
+from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, ValidationError
 
 
+# Model used in the OpenAPI examples (the dev model)
+EXAMPLE_MODEL_ID = '55555555-5555-5555-5555-555555555555'
+
 # Get storage path
 STORAGE_PATH = os.getenv('STORAGE_PATH')
 MODEL_FOLDER_NAME = os.getenv('MODEL_FOLDER_NAME')
+MODEL_JSON_NAME = os.getenv('MODEL_JSON_NAME', 'model_metadata.json')
+
+# Use the ONNX version of the models saved by the ingestion, when present
+COMPILED_INFERENCE = \
+    os.getenv('COMPILED_INFERENCE', 'true').lower() == 'true'
+COMPILED_MODEL_NAME = os.getenv('COMPILED_MODEL_NAME', 'model.onnx')
+
+# Call sklearn, xgboost and lightgbm estimators without the pyfunc wrapper
+NATIVE_INFERENCE = os.getenv('NATIVE_INFERENCE', 'false').lower() == 'true'
+
+# Cache-Control of the catalog endpoints, sent along with their ETag
+CATALOG_CACHE_CONTROL = os.getenv(
+    'CATALOG_CACHE_CONTROL', 'public, max-age=60')
+
+# Send the time of each phase of a request in the Server-Timing header, and
+# log requests slower than SLOW_REQUEST_MS as warnings
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 1000))
+
+# Maximum number of results of the city search endpoint
+CITY_SEARCH_MAX_LIMIT = int(os.getenv('CITY_SEARCH_MAX_LIMIT', 50))
+
+# Maximum number of rows accepted by the batch prediction endpoint
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+
+# Maximum number of grid points of the what-if endpoint
+MAX_SWEEP_POINTS = int(os.getenv('MAX_SWEEP_POINTS', 10_000))
+
+# Maximum resolution of the heatmap endpoint and heatmaps kept in memory
+HEATMAP_MAX_RESOLUTION = int(os.getenv('HEATMAP_MAX_RESOLUTION', 256))
+HEATMAP_CACHE_SIZE = int(os.getenv('HEATMAP_CACHE_SIZE', 64))
+
+# Rows parsed and predicted at a time by the streaming prediction endpoint
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 10_000))
+# Bytes of the streamed body kept in memory before spilling it to disk
+STREAM_SPOOL_SIZE = int(os.getenv('STREAM_SPOOL_SIZE', 8 * 1024 * 1024))
+
+# Models loaded and warmed at startup: "", "all", "top:N" or a list of ids
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', '')
+PRELOAD_WORKERS = int(os.getenv('PRELOAD_WORKERS', 2))
+
+# Threads, queue sizes and deadlines (seconds) of the database and inference
+# executors. They are kept apart so slow predictions can't block the catalog.
+DB_WORKERS = int(os.getenv('DB_WORKERS', 4))
+DB_QUEUE_SIZE = int(os.getenv('DB_QUEUE_SIZE', 64))
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', 5))
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', os.cpu_count() or 1))
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', 64))
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 30))
+
+# Admission of the prediction requests: requests running at the same time
+# (in total and per model), requests allowed to wait for a slot and seconds
+# they can wait. Requests over them are refused with 503. 0 disables a limit.
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 256))
+IN_FLIGHT_QUEUE_SIZE = int(os.getenv('IN_FLIGHT_QUEUE_SIZE', 512))
+MODEL_MAX_IN_FLIGHT = int(os.getenv('MODEL_MAX_IN_FLIGHT', 32))
+MODEL_QUEUE_SIZE = int(os.getenv('MODEL_QUEUE_SIZE', 64))
+ADMISSION_TIMEOUT = float(os.getenv('ADMISSION_TIMEOUT', 2))
+# Seconds sent in the Retry-After header of refused requests
+RETRY_AFTER = int(os.getenv('RETRY_AFTER', 1))
+
+# Window (milliseconds) and size of the micro-batches of concurrent
+# predictions of the same model. A window of 0 disables micro-batching.
+MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', 0))
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', 64))
+
+# Predictions cached (0 disables the cache) and decimal places of the
+# coordinates used in their keys
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 10_000))
+PREDICTION_CACHE_COORDINATE_DIGITS = int(
+    os.getenv('PREDICTION_CACHE_COORDINATE_DIGITS', 5))
+
+def read_csv(f, chunksize: int, columns: dict[str, InputItem]):
+    """
+    Read a CSV body in chunks of rows, converting each field to the type of
+    its input. Empty fields and lines are left out.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("The body has no header.")
+    header_inputs = [(column, columns.get(column)) for column in header]
+
+    def read_chunks():
+        records = (values for values in reader if values)
+        while chunk := list(itertools.islice(records, chunksize)):
+            yield [
+                {
+                    column: parse_csv_value(input_def, value)
+                    for (column, input_def), value
+                    in zip(header_inputs, values) if value != ''
+                }
+                for values in chunk
+            ]
+
+    return read_chunks()
+
+
+def read_ndjson(f, chunksize: int, columns: dict[str, InputItem]):
+    """
+    Read an NDJSON body in chunks of rows, skipping blank lines.
+    """
+    lines = (line for line in f if line.strip())
+    while chunk := list(itertools.islice(lines, chunksize)):
+        yield [json.loads(line) for line in chunk]
+
+
+# Readers of the streaming endpoint by content type. Each one returns an
+# iterator of lists with at most `chunksize` rows. Every chunk is parsed on
+# its own, so the types of its values don't depend on the other rows.
+STREAM_READERS = {
+    'text/csv': read_csv,
+    'application/x-ndjson': read_ndjson,
+}
+
+db_executor = BoundedExecutor(
+    'db', DB_WORKERS, DB_QUEUE_SIZE, DB_TIMEOUT)
+inference_executor = BoundedExecutor(
+    'inference', INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_TIMEOUT)
+
+admission = AdmissionControl(
+    MAX_IN_FLIGHT,
+    IN_FLIGHT_QUEUE_SIZE,
+    MODEL_MAX_IN_FLIGHT,
+    MODEL_QUEUE_SIZE,
+    ADMISSION_TIMEOUT,
+    on_reject=observe_admission_rejection
+)
+
+logger = logging.getLogger(__name__)
+
+
+def record_query(query: str, seconds: float):
+    record('db', seconds)
+
+
+query_listeners.append(record_query)
+query_listeners.append(observe_query)
+
+
+def load_model_artifact(model_path: str):
+    """
+    Load a model, preferring its compiled (ONNX) version when it exists and
+    COMPILED_INFERENCE is on. Otherwise load it with pyfunc and, when
+    NATIVE_INFERENCE is on and the model's flavor supports it, return its
+    native estimator instead, as long as it predicts the same values as pyfunc
+    for the model's test sample.
+    """
+    compiled_path = os.path.join(
+        os.path.dirname(model_path), COMPILED_MODEL_NAME)
+    metadata_path = os.path.join(os.path.dirname(model_path), MODEL_JSON_NAME)
+    if COMPILED_INFERENCE and os.path.exists(compiled_path):
+        try:
+            compiled = CompiledModel(compiled_path)
+            # Models compiled with columns that aren't inputs (derived by
+            # the model) can't be fed by the API
+            with open(metadata_path, encoding='utf-8') as f:
+                inputs = json.load(f)['inputs']
+            missing = set(compiled.columns) - set(get_input_dtypes(inputs))
+            if not missing:
+                return compiled
+            logger.warning(
+                "Compiled model %s needs columns without an input %s, "
+                "using pyfunc.", compiled_path, sorted(missing))
+        except Exception as e:
+            logger.warning(
+                "Compiled model %s could not be loaded, using pyfunc: %s",
+                compiled_path, e)
+
+    # mlflow takes seconds to import, so it waits for the first model load
+    import mlflow.pyfunc
+    model = mlflow.pyfunc.load_model(model_path)
+    if not NATIVE_INFERENCE:
+        return model
+
+    flavor = next(
+        (f for f in NATIVE_FLAVORS if f in model.metadata.flavors), None)
+    if flavor is None:
+        return model
+
+    try:
+        with open(metadata_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+        native = load_native_model(model_path, flavor, metadata['inputs'])
+        if matches_pyfunc(native, model, metadata['x_test']):
+            return native
+        logger.warning(
+            "Native %s model %s differs from pyfunc, using pyfunc.",
+            flavor, model_path)
+    except Exception as e:
+        logger.warning(
+            "Native %s model %s could not be loaded, using pyfunc: %s",
+            flavor, model_path, e)
+    return model
+
+
+def import_model_modules():
+    """
+    Import the modules used to load the models before the first load, so
+    their memory isn't counted as the size of a model.
+    """
+    modules = ['mlflow.pyfunc']
+    if COMPILED_INFERENCE:
+        modules.append('onnxruntime')
+    if NATIVE_INFERENCE:
+        modules += [f'mlflow.{flavor}' for flavor in NATIVE_FLAVORS]
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+# Cache mlflow models within a memory budget
+model_cache = ModelCache(
+    loader=load_model_artifact,
+    max_bytes=int(os.getenv('MODEL_CACHE_MAX_BYTES', 2 * 1024 ** 3)),
+    ttl=float(os.getenv('MODEL_CACHE_TTL', 3600)),
+    listener=observe_model_cache,
+    prepare=import_model_modules
+)
+
 
-# Cache mlflow models
-@lru_cache(maxsize=2)
 def get_model_cached(model_path: str):
     try:
-        return mlflow.pyfunc.load_model(model_path)
+        with phase('model_load'):
+            return model_cache.get(model_path)
     except Exception as e:
         raise RuntimeError(f"Error loading model: {e}")
 
 
-# API description
-with open(file='./api/description.md') as f:
-    description = f.read()
-    description = description.format(
+prediction_cache = PredictionCache(
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_COORDINATE_DIGITS)
+# Encoded heatmaps and model's MAPE, keyed by the model, the fixed features,
+# the resolution and the bounds
+heatmap_cache = PredictionCache(HEATMAP_CACHE_SIZE)
+
+# Compiled validator, coordinate columns and inputs by column of each model,
+# models' inputs never change
+validators: dict[str, type[BaseModel]] = {}
+coordinate_columns: dict[str, frozenset[str]] = {}
+input_columns: dict[str, dict[str, InputItem]] = {}
+# South, west, north and east limits of each model's test sample
+model_bounds: dict[str, tuple[float, float, float, float]] = {}
+
+
+def validation_error_detail(error: ValidationError) -> str:
+    VALIDATION_FAILURES.inc()
+    return format_validation_error(error)
+
+
+def get_validator(model_id: str) -> type[BaseModel]:
+    validator = validators.get(model_id)
+    if validator is None:
+        inputs = query_inputs(model_id).inputs
+        if not inputs:
+            raise HTTPException(
+                status_code=404,
+                detail="Model not found")
+        coordinate_columns[model_id] = get_coordinate_columns(inputs)
+        input_columns[model_id] = get_input_columns(inputs)
+        validator = validators[model_id] = \
+            create_features_model(model_id, inputs)
+    return validator
+
+
+async def get_validator_async(model_id: str) -> type[BaseModel]:
+    # Only go to the database executor when the validator isn't compiled yet
+    validator = validators.get(model_id)
+    if validator is None:
+        validator = await db_executor.run(get_validator, model_id)
+    return validator
+
+
+def read_catalog_version() -> int:
+    return fetch_value(queries['get_catalog_version'])
+
+
+catalog_version = CatalogVersion(
+    read_catalog_version, lambda: os.getenv('DB_PATH'))
+
+
+async def get_catalog_version() -> int:
+    """
+    Returns the catalog version, reading it in the database executor when
+    the database changed.
+    """
+    version = catalog_version.peek()
+    if version is None:
+        version = await db_executor.run(catalog_version.get)
+    return version
+
+
+async def catalog_etag(request: Request, response: Response):
+    """
+    Dependency of the catalog endpoints. Answers 304 when the client already
+    has the current version of the catalog, before any query runs, and adds
+    the ETag and Cache-Control headers otherwise.
+    """
+    etag = f'"catalog-{await get_catalog_version()}"'
+    headers = {'ETag': etag, 'Cache-Control': CATALOG_CACHE_CONTROL}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+# Predictions per model, used to choose the models preloaded at startup
+popularity = Popularity()
+warm_up = WarmUp()
+
+
+# Catalog data served by the read endpoints, rebuilt when its version changes
+catalog = Catalog(
+    catalog_version,
+    load_catalog_index,
+    on_swap=lambda old, new: invalidate_changed_models(old, new)
+)
+
+
+async def get_catalog() -> CatalogIndex:
+    """
+    Returns the current catalog index, rebuilding it in the database
+    executor when the catalog version changed.
+    """
+    if catalog.is_current():
+        return catalog.get()
+    return await db_executor.run(catalog.get)
+
+
+def get_model_item(index: CatalogIndex, model_id: str) -> ModelItem:
+    model = index.get_model(model_id)
+    if model is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Model not found")
+    return model
+
+
+def query_inputs(model_id: str) -> GetInputsResponse:
+    return catalog.get().get_inputs(model_id)
+
+
+def invalidate_model(model_id: str):
+    """
+    Forget everything cached about a model.
+    """
+    validators.pop(model_id, None)
+    coordinate_columns.pop(model_id, None)
+    input_columns.pop(model_id, None)
+    model_bounds.pop(model_id, None)
+    model_cache.invalidate(f"{STORAGE_PATH}/{model_id}/{MODEL_FOLDER_NAME}")
+    prediction_cache.invalidate(model_id)
+    heatmap_cache.invalidate(model_id)
+
+
+def invalidate_changed_models(old: CatalogIndex, new: CatalogIndex):
+    """
+    Forget everything cached about the models removed or changed by an
+    ingestion, so they aren't served with stale validators, predictions or
+    model files.
+    """
+    for model_id in changed_models(old, new):
+        logger.info("Model %s changed in the catalog, invalidating it.",
+                    model_id)
+        invalidate_model(model_id)
+
+
+def get_model_ids() -> list[str]:
+    return catalog.get().model_ids
+
+
+def get_popularity_path() -> str:
+    return f"{STORAGE_PATH}/popularity.json"
+
+
+def warm_up_model(model_id: str):
+    """
+    Load a model and run a dummy prediction built from its inputs, so the
+    first request does not pay for the model's first call.
+    """
+    validator = get_validator(model_id)
+    model = get_model_cached(
+        f"{STORAGE_PATH}/{model_id}/{MODEL_FOLDER_NAME}")
+    inputs = query_inputs(model_id).inputs
+    features = dummy_features(inputs)
+    # Categoricals without options accept no value, so the dummy features of
+    # their models only go to the model
+    if all(
+            input_def.type != 'categorical' or input_def.options
+            for input_def in inputs):
+        validator.model_validate(features)
+    run_model(model, [features])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_ids = get_model_ids()
+    preload = select_models(
+        PRELOAD_MODELS,
+        model_ids,
+        lambda: popularity.rank(model_ids, get_popularity_path())
+    )
+    warm_up.start(preload, warm_up_model, PRELOAD_WORKERS)
+    yield
+    warm_up.shutdown()
+    popularity.save(get_popularity_path())
+    mark_process_dead()
+
+
+def load_model(model_id: str):
+    try:
+        return get_model_cached(
+            f"{STORAGE_PATH}/{model_id}/{MODEL_FOLDER_NAME}")
+    except Exception as e:
+        raise HTTPException(
+            status_code = 500,
+            detail = str(e)
+        )
+
+
+def predict_many(model_id: str, rows: list[dict]) -> list[float]:
+    """
+    Predict rows already validated with a single call to the model.
+    """
+    model = load_model(model_id)
+    try:
+        property_prices = run_model(model, rows)
+        return [round(float(price), 2) for price in property_prices]
+    except Exception as e:
+        raise HTTPException(
+            status_code = 500,
+            detail = f"Error predicting the price: {str(e)}"
+        )
+
+
+async def predict_many_async(model_id: str, rows: list[dict]) -> list[float]:
+    return await inference_executor.run(predict_many, model_id, rows)
+
+
+micro_batcher = MicroBatcher(
+    predict_many_async,
+    window=MICRO_BATCH_WINDOW_MS / 1000,
+    max_batch_size=MICRO_BATCH_MAX_SIZE
+) if MICRO_BATCH_WINDOW_MS > 0 else None
+
+
+async def predict_features(model_id: str, features: dict) -> float:
+    if micro_batcher is not None:
+        return await micro_batcher.predict(model_id, features)
+    property_prices = await predict_many_async(model_id, [features])
+    return property_prices[0]
+
+
+def ensemble_weights(mapes: list[float]) -> list[float]:
+    """
+    Weights of the models of an ensemble, proportional to the inverse of
+    their MAPE, so more accurate models count more. Models with a MAPE of 0
+    share the whole weight.
+    """
+    perfect = [mape <= 0 for mape in mapes]
+    if any(perfect):
+        return [p / sum(perfect) for p in perfect]
+    inverses = [1 / mape for mape in mapes]
+    return [inverse / sum(inverses) for inverse in inverses]
+
+
+async def predict_ensemble_member(
+        model: ModelItem,
+        features: dict) -> tuple[EnsembleModelPrediction, int]:
+    """
+    Predict the features with one model of an ensemble, using only the
+    features of its own inputs. The model waits for its own admission
+    slots, and its failures are returned instead of raised, so one model
+    can't fail the others.
+
+    Returns:
+    tuple[EnsembleModelPrediction, int]: Prediction of the model, without
+    its weight, and the status code of its failure (200 when it succeeded).
+    """
+    start = perf_counter()
+    property_price, error, status_code = None, None, 200
+    try:
+        validator = await get_validator_async(model.id)
+        row = {
+            column: features[column]
+            for column in input_columns[model.id] if column in features
+        }
+        with phase('validate'):
+            validator.model_validate(row)
+
+        with phase('cache'):
+            cache_key = prediction_cache.key(
+                model.id, row, coordinate_columns[model.id])
+            prediction = prediction_cache.get(cache_key)
+        if prediction is not None:
+            property_price = prediction['property_price']
+        else:
+            async with admission.admit(model.id):
+                property_price = await predict_features(model.id, row)
+            prediction_cache.put(cache_key, {
+                'mape': model.mape,
+                'property_price': property_price
+            })
+        popularity.add(model.id)
+    except ValidationError as e:
+        error, status_code = validation_error_detail(e), 422
+    except HTTPException as e:
+        error, status_code = str(e.detail), e.status_code
+    except (AdmissionRejectedError, QueueFullError,
+            DeadlineExceededError) as e:
+        error, status_code = str(e), 503
+    except Exception as e:
+        logger.exception(
+            "Model %s failed in the ensemble prediction.", model.id)
+        error, status_code = f"Error predicting the price: {str(e)}", 500
+
+    return EnsembleModelPrediction(
+        model_id=model.id,
+        mape=model.mape,
+        property_price=property_price,
+        weight=0,
+        latency_ms=round((perf_counter() - start) * 1000, 3),
+        error=error
+    ), status_code
+
+
+def predict_sweep(
+        model_id: str,
+        features: dict,
+        sweeps: dict[str, list]) -> list[float]:
+    """
+    Predict every combination of the swept values over the base features
+    with a single call to the model. The last swept feature varies fastest.
+    """
+    columns = list(sweeps)
+    rows = [
+        {**features, **dict(zip(columns, values))}
+        for values in itertools.product(*sweeps.values())
+    ]
+    return predict_many(model_id, rows)
+
+
+def get_model_bounds(
+        model_id: str,
+        lat: str,
+        lng: str) -> tuple[float, float, float, float]:
+    """
+    Returns the south, west, north and east limits of the coordinates of the
+    model's test sample, read from the metadata stored next to the model.
+    """
+    bounds = model_bounds.get(model_id)
+    if bounds is None:
+        metadata_path = f"{STORAGE_PATH}/{model_id}/{MODEL_JSON_NAME}"
+        with open(metadata_path, encoding='utf-8') as f:
+            x_test = json.load(f)['x_test']
+        lats = [row[lat] for row in x_test]
+        lngs = [row[lng] for row in x_test]
+        bounds = model_bounds[model_id] = \
+            (min(lats), min(lngs), max(lats), max(lngs))
+    return bounds
+
+
+def predict_heatmap(
+        model_id: str,
+        features: dict,
+        lat: str,
+        lng: str,
+        bounds: tuple[float, float, float, float],
+        resolution: int) -> bytes:
+    """
+    Predict a `resolution` x `resolution` grid of coordinates inside
+    `bounds` with a single call to the model.
+
+    Returns:
+    bytes: Little endian float32 prices in row-major order. The first row is
+    the northernmost and the first column the westernmost.
+    """
+    south, west, north, east = bounds
+    lats = np.linspace(north, south, resolution)
+    lngs = np.linspace(west, east, resolution)
+    rows = [
+        {**features, lat: float(y), lng: float(x)}
+        for y in lats for x in lngs
+    ]
+
+    model = load_model(model_id)
+    try:
+        prices = run_model(model, rows)
+    except Exception as e:
+        raise HTTPException(
+            status_code = 500,
+            detail = f"Error predicting the prices: {str(e)}"
+        )
+    return np.asarray(prices, dtype='<f4').tobytes()
+
+
+def predict_batch_features(
+        model_id: str,
+        validator: type[BaseModel],
+        rows: list[dict]) -> list[BatchPredictItem]:
+    model = load_model(model_id)
+    try:
+        return predict_rows(model, validator, rows)
+    except Exception as e:
+        raise HTTPException(
+            status_code = 500,
+            detail = f"Error predicting the prices: {str(e)}"
+        )
+
+
+def predict_rows(
+        model,
+        validator: type[BaseModel],
+        rows: list[dict]) -> list[BatchPredictItem]:
+    """
+    Validate each row and predict all the valid ones with a single call to
+    the model.
+
+    Returns:
+    list[BatchPredictItem]: One item per row, in the same order of `rows`.
+    """
+    results = [None] * len(rows)
+    valid_index = []
+    valid_rows = []
+
+    with phase('validate'):
+        for i, row in enumerate(rows):
+            try:
+                validator.model_validate(row)
+            except ValidationError as e:
+                results[i] = BatchPredictItem(
+                    index=i, error=validation_error_detail(e))
+                continue
+            valid_index.append(i)
+            valid_rows.append(row)
+
+    if valid_rows:
+        prices = run_model(model, valid_rows)
+        for i, price in zip(valid_index, prices):
+            results[i] = BatchPredictItem(
+                index=i, property_price=round(float(price), 2))
+
+    return results
+
+
+def predict_chunk(model, validator: type[BaseModel], reader, offset: int):
+    """
+    Read the next chunk of `reader` and predict it.
+
+    Returns:
+    tuple[str, int] | None: The NDJSON lines of the chunk and its number of
+    rows, or None when the reader is exhausted.
+    """
+    rows = next(reader, None)
+    if rows is None:
+        return None
+
+    lines = []
+    for item in predict_rows(model, validator, rows):
+        item.index += offset
+        lines.append(item.model_dump_json())
+    return '\n'.join(lines) + '\n', len(rows)
+
+
+async def stream_predictions(
+        model_id: str, model, validator: type[BaseModel], reader, body):
+    """
+    Predict the rows of `reader` chunk by chunk in the inference executor,
+    yielding the results as NDJSON lines. Only one chunk is kept in memory at
+    a time.
+
+    The admission slots of the model are taken here, as the body of a
+    streaming response runs after its route returns, so they are held while
+    the rows are predicted.
+    """
+    offset = 0
+    try:
+        async with admission.admit(model_id):
+            while True:
+                result = await inference_executor.run(
+                    predict_chunk, model, validator, reader, offset)
+                if result is None:
+                    break
+                lines, n_rows = result
+                offset += n_rows
+                yield lines
+    except Exception as e:
+        yield json.dumps(
+            {'error': f"Error predicting the prices: {str(e)}"}) + '\n'
+    finally:
+        body.close()
+
+
+def read_description() -> str:
+    """
+    Returns the API description. It is only read when the OpenAPI document is
+    built for the first time, not at startup.
+    """
+    with open(file='./api/description.md') as f:
+        description = f.read()
+    return description.format(
         API_BASE_URL = os.getenv("API_BASE_URL")
     )
 
+
 app = FastAPI(
     title="Real Estate Estimator API",
-    description=description,
     version="1.0.0",
     contact={
         "Github": "https://github.com/marcuszucareli/house-price-app"
@@ -41,8 +758,66 @@ app = FastAPI(
     license_info={
         "name": "MIT",
         "url": "https://opensource.org/licenses/MIT",
-    }
+    },
+    lifespan=lifespan
 )
+app.add_middleware(
+    ServerTimingMiddleware,
+    logger=logger,
+    slow_ms=SLOW_REQUEST_MS,
+    header=SERVER_TIMING
+)
+app.add_middleware(MetricsMiddleware)
+
+
+def custom_openapi():
+    """
+    Add the compiled features schema of every registered model to the
+    OpenAPI components, so clients can see what each model expects.
+    """
+    if app.openapi_schema is None:
+        app.description = read_description()
+    schema = FastAPI.openapi(app)
+    components = schema.setdefault('components', {}).setdefault('schemas', {})
+
+    for model_id in get_model_ids():
+        try:
+            validator = get_validator(model_id)
+        except HTTPException:
+            # Models without inputs have no features schema
+            continue
+        components[validator.__name__] = validator.model_json_schema(
+            ref_template='#/components/schemas/{model}')
+
+    return schema
+
+
+app.openapi = custom_openapi
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={'detail': str(exc)},
+        headers={'Retry-After': str(RETRY_AFTER)}
+    )
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(
+        request: Request, exc: AdmissionRejectedError):
+    return JSONResponse(
+        status_code=503,
+        content={'detail': str(exc)},
+        headers={'Retry-After': str(RETRY_AFTER)}
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(
+        request: Request, exc: DeadlineExceededError):
+    return JSONResponse(status_code=504, content={'detail': str(exc)})
 
 app.mount("/assets", StaticFiles(directory="./api/assets"), name="assets")
 
@@ -53,36 +828,107 @@ app.mount("/assets", StaticFiles(directory="./api/assets"), name="assets")
     response_model= StatusResponse,
     tags=["Health"]
 )
-def status():
+async def status():
     return {"status": "running"}
 
 
+@app.get(
+    "/ready",
+    summary="Check API readiness",
+    description="Returns whether the models preloaded at startup are warm. "
+    "Responds with status 503 until the warm-up is done. Models that failed "
+    "to warm up are listed but don't keep the API from being ready.",
+    response_model=ReadyResponse,
+    responses={503: {"model": ReadyResponse}},
+    tags=["Health"]
+)
+async def ready(response: Response):
+    status = warm_up.status()
+    if not status['ready']:
+        response.status_code = 503
+    return status
+
+
+@app.get(
+    "/cache/models",
+    summary="Check models cache",
+    description="Returns the usage and counters of the models cache.",
+    response_model=ModelCacheStats,
+    tags=["Health"]
+)
+async def get_model_cache_stats():
+    # The cache is keyed by the models' paths, only their ids are exposed
+    stats = model_cache.stats()
+    stats['models'] = [
+        os.path.basename(os.path.dirname(path)) for path in stats['models']]
+    return stats
+
+
+@app.get(
+    "/metrics",
+    summary="Get metrics",
+    description="Returns the API metrics in Prometheus text format: "
+    "latency histograms by route and by model, requests in flight, models "
+    "cache lookups and loads, SQLite queries and validation failures.",
+    response_class=Response,
+    responses={200: {"content": {"text/plain": {}}}},
+    tags=["Health"]
+)
+async def metrics():
+    return Response(content=generate_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get(
+    "/admission",
+    summary="Check admission control",
+    description="Returns the limits of the prediction requests, the "
+    "requests running and waiting and the requests admitted and refused, "
+    "globally and by model.",
+    response_model=AdmissionStats,
+    tags=["Health"]
+)
+async def get_admission_stats():
+    return admission.stats()
+
+
+@app.get(
+    "/cache/predictions",
+    summary="Check predictions cache",
+    description="Returns the usage and hit rate of the predictions cache.",
+    response_model=PredictionCacheStats,
+    tags=["Health"]
+)
+async def get_prediction_cache_stats():
+    return prediction_cache.stats()
+
+
 @app.get(
     "/countries/",
     summary="Get Countries",
     description="Returns a list of countries with available models.",
     response_model= GetCountriesResponse,
-    tags=["Consulting"]
+    tags=["Consulting"],
+    dependencies=[Depends(catalog_etag)]
 )
-def get_countries():
+async def get_countries(response: Response):
     """
     Get a list of countries with models.
 
     Returns:
     countries list[str]: List of countries with models.
     """
-    query = queries['get_all_countries'] 
-    df = execute_with_pandas(query)
-    countries = df['country'].to_list()
-    return {"countries": countries}
+    index = await get_catalog()
+    return encoded_response(index.encoded_countries(), response)
 
 
 @app.get(
     "/cities/",
     tags=["Consulting"],
-    response_model=GetCitiesResponse
+    response_model=GetCitiesResponse,
+    dependencies=[Depends(catalog_etag)]
 )
-def get_cities(
+async def get_cities(
+    response: Response,
     country: str = Query(
         default='all',
         title='country',
@@ -104,25 +950,65 @@ def get_cities(
         }
     )
 ):
+    index = await get_catalog()
+    return encoded_response(index.encoded_cities(country), response)
 
-    if country == 'all':
-        param = {'country': None}
-    else:
-        param = {'country': country}
 
-    query = queries['get_all_cities'] 
-    df = execute_with_pandas(query, param)
-    df["city"] = df['city'] + ' (' + df['hierarchy'] + ')'
-    cities_dict = dict(zip(df["city"], df["id"]))
-    return {"cities": cities_dict}
+@app.get(
+    "/cities/search",
+    summary="Search cities",
+    description="Returns the cities that best match a partial name, for " \
+    "autocomplete. Cities whose name (or a word of it) starts with the " \
+    "query come first, followed by similar names, so typos still find " \
+    "the city. Accents and case are ignored.",
+    tags=["Consulting"],
+    response_model=CitySearchResponse,
+    dependencies=[Depends(catalog_etag)]
+)
+async def search_cities(
+    q: str = Query(
+        min_length=1,
+        max_length=100,
+        description="Partial city name.",
+        examples=['sao jose']
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=CITY_SEARCH_MAX_LIMIT,
+        description="Maximum number of cities returned."
+    ),
+    country: str = Query(
+        default='all',
+        description="Optional parameter to filter cities by country, as " \
+        "in `/cities/`."
+    )
+):
+    index = await get_catalog()
+    matches = index.city_search.search(
+        q, limit, None if country == 'all' else country)
+    return CitySearchResponse(cities=[
+        CitySearchItem(
+            id=m.id,
+            city=m.city,
+            country=m.country,
+            hierarchy=m.hierarchy,
+            label=f'{m.city} ({m.hierarchy})',
+            match=m.match,
+            score=m.score
+        )
+        for m in matches
+    ])
 
 
 @app.get(
     '/models/',
     tags=["Consulting"],
-    response_model=GetModelsResponse
+    response_model=GetModelsResponse,
+    dependencies=[Depends(catalog_etag)]
 )
-def get_models(
+async def get_models(
+    response: Response,
     city: str = Query(
         default='all',
         title='city ID',
@@ -165,42 +1051,8 @@ def get_models(
     )
 ):
 
-    query = queries['get_models_from_city']
-    
-    match sortBy:
-        case 'year':
-            formatted_query = \
-                query.format(sort_by='data_year DESC')
-        case 'mae':
-            formatted_query = \
-                query.format(sort_by='mae')
-        case 'mape':
-            formatted_query = \
-                query.format(sort_by='mape')
-        case 'r2':
-            formatted_query = \
-                query.format(sort_by='r2 DESC')
-        case 'rmse':
-            formatted_query = \
-                query.format(sort_by='rmse')
-        case _:
-            raise HTTPException(
-                status_code=400, detail="Invalid sortBy parameter")
-    
-    if city == 'all':
-        param = {'city_id': None}
-    else:
-        param = {'city_id': city}
-        
-    df = execute_with_pandas(formatted_query, param)
-    df['links'] = df['links'].apply(lambda x: json.loads(x))
-    cities = df.to_dict(orient="records")
-    class_models = []
-
-    for model in cities:
-        class_models.append(ModelItem(**model))
-
-    return GetModelsResponse(models=class_models)
+    index = await get_catalog()
+    return encoded_response(index.encoded_models(city, sortBy), response)
 
 
 @app.get(
@@ -208,37 +1060,33 @@ def get_models(
     tags=["Consulting"],
     response_model=GetModelResponse
 )
-def get_model(model_id: str = Path(
+async def get_model(response: Response, model_id: str = Path(
         title='Model id',
         description=(
             "Get model's metadata."
         ),
         openapi_examples={
             "model id": {
-                "value": f"{standard_uuid}",
+                "value": EXAMPLE_MODEL_ID,
                 "description": "The id of the desired model."
             }
         }
     )):
-    
-    query = queries['get_model']
-    df = execute_with_pandas(query, {'model_id': model_id})
-    df['links'] = df['links'].apply(lambda x: json.loads(x))
-    model = df.to_dict(orient="records")
-    if model:
-        return GetModelResponse(model=ModelItem(**model[0]))
-    else:
+    encoded = (await get_catalog()).encoded_model(model_id)
+    if encoded is None:
         raise HTTPException(
             status_code=404,
             detail="Model not found")
+    return encoded_response(encoded, response)
 
 
 @app.get(
     '/inputs/{model_id}',
     tags=['Consulting'],
-    response_model=GetInputsResponse
+    response_model=GetInputsResponse,
+    dependencies=[Depends(catalog_etag)]
 )
-def get_inputs(model_id: str = 
+async def get_inputs(response: Response, model_id: str = 
     Path(
         title='Model id',
         description=(
@@ -246,26 +1094,14 @@ def get_inputs(model_id: str =
         ),
         openapi_examples={
             "model id": {
-                "value": f"{standard_uuid}",
+                "value": EXAMPLE_MODEL_ID,
                 "description": "The id of the desired model."
             }
         }
     )
 ):
-    
-    query = queries['get_inputs']
-    param = {'model_id': model_id}
-
-    df = execute_with_pandas(query, param)
-    df.drop('id', axis=1, inplace=True)
-    df['options'] = df['options'].apply(lambda x: json.loads(x))
-    
-    inputs = df.to_dict(orient="records")
-    class_inputs = []
-    for input in inputs:
-        class_inputs.append(InputItem(**input))
-    
-    return GetInputsResponse(inputs=class_inputs)
+    index = await get_catalog()
+    return encoded_response(index.encoded_inputs(model_id), response)
 
 
 @app.post(
@@ -273,7 +1109,7 @@ def get_inputs(model_id: str =
     tags=['Predicting'],
     response_model=PredictResponse
 )
-def predict(
+async def predict(
     features: PredictRequest,
     model_id: str = 
     Path(
@@ -283,46 +1119,433 @@ def predict(
         ),
         openapi_examples={
             "model id": {
-                "value": f"{standard_uuid}",
+                "value": EXAMPLE_MODEL_ID,
                 "description": "The id of the desired model."
             }
         }
     ),
     ):
 
-    # Get model's inputs
-    inputs = get_inputs(model_id)
-
     # Validate inputs
-    try:
-        validate_input_data(inputs.inputs, features.features)
-    except Exception as e:
+    validator = await get_validator_async(model_id)
+    with phase('validate'):
+        try:
+            validator.model_validate(features.features)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code = 422,
+                detail = validation_error_detail(e)
+            )
+
+    popularity.add(model_id)
+
+    # Serve repeated predictions from the cache
+    with phase('cache'):
+        cache_key = prediction_cache.key(
+            model_id, features.features, coordinate_columns[model_id])
+        prediction = prediction_cache.get(cache_key)
+    if prediction is not None:
+        return PredictResponse(predict=prediction)
+
+    model = get_model_item(await get_catalog(), model_id)
+    async with admission.admit(model_id):
+        property_price = await predict_features(model_id, features.features)
+
+    prediction = {
+        'mape': model.mape,
+        'property_price': property_price
+    }
+    prediction_cache.put(cache_key, prediction)
+    return PredictResponse(predict=prediction)
+
+
+@app.post(
+    "/predict/ensemble/{city_id}",
+    tags=['Predicting'],
+    response_model=EnsemblePredictResponse
+)
+async def predict_ensemble(
+    features: PredictRequest,
+    city_id: str =
+    Path(
+        title='City id',
+        description=(
+            "Predict the property value with every model of the city at "
+            "once and combine their prices weighted by their MAPE."
+        ),
+        openapi_examples={
+            "city id": {
+                "value": "Q191642",
+                "description": "São josé dos Campos' ID"
+            }
+        }
+    ),
+    ):
+
+    models = (await get_catalog()).get_models(
+        city_id, GetModelsCategory.mape).models
+    if not models:
+        raise HTTPException(
+            status_code = 404,
+            detail = "No models found for the city."
+        )
+
+    # Each model gets only its own features, and all of them run at once
+    start = perf_counter()
+    results = await asyncio.gather(*[
+        predict_ensemble_member(model, features.features) for model in models
+    ])
+    latency_ms = round((perf_counter() - start) * 1000, 3)
+
+    predictions = [prediction for prediction, _ in results]
+    succeeded = [p for p in predictions if p.property_price is not None]
+    if not succeeded:
+        status_codes = {status_code for _, status_code in results}
+        status_code = 503 if 503 in status_codes else max(status_codes)
+        raise HTTPException(
+            status_code = status_code,
+            detail = "No model of the city could predict the features. " +
+                " ".join(f"{p.model_id}: {p.error}" for p in predictions),
+            headers = {'Retry-After': str(RETRY_AFTER)}
+                if status_code == 503 else None
+        )
+
+    weights = ensemble_weights([p.mape for p in succeeded])
+    for prediction, weight in zip(succeeded, weights):
+        prediction.weight = round(weight, 6)
+    property_price = sum(
+        p.property_price * weight for p, weight in zip(succeeded, weights))
+
+    return EnsemblePredictResponse(
+        city=city_id,
+        property_price=round(property_price, 2),
+        latency_ms=latency_ms,
+        models=predictions
+    )
+
+
+@app.post(
+    "/predict/{model_id}/batch",
+    tags=['Predicting'],
+    response_model=BatchPredictResponse
+)
+async def predict_batch(
+    features: BatchPredictRequest,
+    model_id: str = 
+    Path(
+        title='Model id',
+        description=(
+            "Predict the value of several properties at once using the model "
+            "of provided id."
+        ),
+        openapi_examples={
+            "model id": {
+                "value": EXAMPLE_MODEL_ID,
+                "description": "The id of the desired model."
+            }
+        }
+    ),
+    ):
+
+    if len(features.features) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code = 413,
+            detail = f"Batch size must not exceed {MAX_BATCH_SIZE} rows."
+        )
+
+    validator = await get_validator_async(model_id)
+    model = get_model_item(await get_catalog(), model_id)
+    async with admission.admit(model_id):
+        predictions = await inference_executor.run(
+            predict_batch_features, model_id, validator, features.features)
+    popularity.add(model_id)
+
+    return BatchPredictResponse(mape=model.mape, predictions=predictions)
+
+
+@app.post(
+    "/predict/{model_id}/whatif",
+    tags=['Predicting'],
+    response_model=WhatIfResponse
+)
+async def predict_whatif(
+    whatif: WhatIfRequest,
+    model_id: str = 
+    Path(
+        title='Model id',
+        description=(
+            "Predict how the property value changes when one or two of its "
+            "features vary, using the model of provided id."
+        ),
+        openapi_examples={
+            "model id": {
+                "value": EXAMPLE_MODEL_ID,
+                "description": "The id of the desired model."
+            }
+        }
+    ),
+    ):
+
+    # Validate base inputs
+    validator = await get_validator_async(model_id)
+    with phase('validate'):
+        try:
+            validator.model_validate(whatif.features)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code = 422,
+                detail = validation_error_detail(e)
+            )
+
+    # Get the values of each swept feature
+    columns = input_columns[model_id]
+    sweeps = {}
+    for sweep in whatif.sweeps:
+        if sweep.feature not in columns:
+            raise HTTPException(
+                status_code = 422,
+                detail = f"Feature '{sweep.feature}' is not an input of " \
+                    "the model."
+            )
+        if sweep.feature in sweeps:
+            raise HTTPException(
+                status_code = 422,
+                detail = f"Feature '{sweep.feature}' is swept twice."
+            )
+        # Checked before the values are built, so huge ranges are refused
+        # without building them
+        if sweep.values is None and sweep.steps > MAX_SWEEP_POINTS:
+            raise HTTPException(
+                status_code = 413,
+                detail = f"The grid must not exceed {MAX_SWEEP_POINTS} points."
+            )
+        try:
+            sweeps[sweep.feature] = get_sweep_values(
+                columns[sweep.feature], sweep)
+        except ValueError as e:
+            raise HTTPException(status_code = 422, detail = str(e))
+
+    n_points = math.prod(len(values) for values in sweeps.values())
+    if n_points > MAX_SWEEP_POINTS:
+        raise HTTPException(
+            status_code = 413,
+            detail = f"The grid must not exceed {MAX_SWEEP_POINTS} points."
+        )
+
+    # Each swept value is validated once instead of once per grid point
+    with phase('validate'):
+        for feature, values in sweeps.items():
+            for value in values:
+                try:
+                    validator.model_validate(
+                        {**whatif.features, feature: value})
+                except ValidationError as e:
+                    raise HTTPException(
+                        status_code = 422,
+                        detail = validation_error_detail(e)
+                    )
+
+    model = get_model_item(await get_catalog(), model_id)
+    async with admission.admit(model_id):
+        prices = await inference_executor.run(
+            predict_sweep, model_id, whatif.features, sweeps)
+    popularity.add(model_id)
+
+    values = list(sweeps.values())
+    if len(values) == 2:
+        n = len(values[1])
+        prices = [prices[i:i + n] for i in range(0, len(prices), n)]
+
+    return WhatIfResponse(
+        mape=model.mape,
+        features=list(sweeps),
+        values=values,
+        prices=prices
+    )
+
+
+@app.post(
+    "/predict/{model_id}/heatmap",
+    tags=['Predicting'],
+    response_class=Response,
+    responses={
+        200: {
+            'description': "Little endian float32 prices of a `resolution` "
+            "x `resolution` grid in row-major order, from north to south and "
+            "west to east. The `X-Heatmap-Shape` header has the number of "
+            "rows and columns, `X-Heatmap-Bounds` the south, west, north and "
+            "east limits and `X-Model-Mape` the model's MAPE.",
+            'content': {'application/octet-stream': {}}
+        }
+    }
+)
+async def predict_heatmap_grid(
+    heatmap: HeatmapRequest,
+    model_id: str = 
+    Path(
+        title='Model id',
+        description=(
+            "Predict the property value over a grid of locations using the "
+            "model of provided id."
+        ),
+        openapi_examples={
+            "model id": {
+                "value": EXAMPLE_MODEL_ID,
+                "description": "The id of the desired model."
+            }
+        }
+    ),
+    ):
+
+    if heatmap.resolution > HEATMAP_MAX_RESOLUTION:
+        raise HTTPException(
+            status_code = 413,
+            detail = "Resolution must not exceed " \
+                f"{HEATMAP_MAX_RESOLUTION}."
+        )
+
+    validator = await get_validator_async(model_id)
+    map_input = next(
+        (i for i in input_columns[model_id].values() if i.type == 'map'),
+        None
+    )
+    if map_input is None:
         raise HTTPException(
             status_code = 422,
-            detail = str(e)  
+            detail = "Model has no map input."
         )
-    
-    # Get model
-    try:
-        model = get_model_cached(
-            f"{STORAGE_PATH}/{model_id}/{MODEL_FOLDER_NAME}")
-    except Exception as e:
+    lat, lng = map_input.lat, map_input.lng
+
+    if heatmap.bounds is None:
+        bounds = await inference_executor.run(
+            get_model_bounds, model_id, lat, lng)
+    else:
+        bounds = tuple(heatmap.bounds)
+    south, west, north, east = bounds
+    if south >= north or west >= east:
         raise HTTPException(
-            status_code = 500,
-            detail = str(e)
+            status_code = 422,
+            detail = "Bounds must be south, west, north and east limits."
         )
-    
-    try:
-        df = pd.DataFrame([features.features])
-        property_price = model.predict(df)
-        prediction = {
-            'mape': get_model(model_id).model.mape,
-            'property_price': round(float(property_price), 2)
+
+    # Validate the fixed inputs with the center of the grid
+    features = {
+        key: value for key, value in heatmap.features.items()
+        if key not in (lat, lng)
+    }
+    with phase('validate'):
+        try:
+            validator.model_validate({
+                **features,
+                lat: (south + north) / 2,
+                lng: (west + east) / 2
+            })
+        except ValidationError as e:
+            raise HTTPException(
+                status_code = 422,
+                detail = validation_error_detail(e)
+            )
+
+    popularity.add(model_id)
+
+    cache_key = heatmap_cache.key(
+        model_id, features, extra=(heatmap.resolution, bounds))
+    cached = heatmap_cache.get(cache_key)
+    if cached is None:
+        model = get_model_item(await get_catalog(), model_id)
+        async with admission.admit(model_id):
+            content = await inference_executor.run(
+                predict_heatmap, model_id, features, lat, lng, bounds,
+                heatmap.resolution)
+        cached = (content, model.mape)
+        heatmap_cache.put(cache_key, cached)
+    content, mape = cached
+
+    return Response(
+        content=content,
+        media_type='application/octet-stream',
+        headers={
+            'X-Heatmap-Shape': f"{heatmap.resolution},{heatmap.resolution}",
+            'X-Heatmap-Bounds': ','.join(str(limit) for limit in bounds),
+            'X-Model-Mape': str(mape),
         }
+    )
 
-        return PredictResponse(predict=prediction)
+
+@app.post(
+    "/predict/{model_id}/stream",
+    tags=['Predicting'],
+    response_class=StreamingResponse,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'description': "A CSV file with one property per line and the "
+            "inputs as columns, or a NDJSON file with one `features` object "
+            "per line.",
+            'content': {
+                'text/csv': {'schema': {'type': 'string'}},
+                'application/x-ndjson': {'schema': {'type': 'string'}},
+            }
+        },
+        'responses': {
+            '200': {
+                'description': "One `BatchPredictItem` per line, in the "
+                "same order of the body rows.",
+                'content': {'application/x-ndjson': {}}
+            }
+        }
+    }
+)
+async def predict_stream(
+    request: Request,
+    model_id: str = 
+    Path(
+        title='Model id',
+        description=(
+            "Predict the value of every property of a CSV or NDJSON body "
+            "using the model of provided id."
+        ),
+        openapi_examples={
+            "model id": {
+                "value": EXAMPLE_MODEL_ID,
+                "description": "The id of the desired model."
+            }
+        }
+    ),
+    ):
+
+    content_type = request.headers.get('content-type', '')
+    content_type = content_type.split(';')[0].strip()
+    if content_type not in STREAM_READERS:
+        raise HTTPException(
+            status_code = 415,
+            detail = "Content type must be one of: " \
+                f"{', '.join(STREAM_READERS)}."
+        )
+
+    # Get model's validator and model
+    validator = await get_validator_async(model_id)
+    model = await inference_executor.run(load_model, model_id)
+    popularity.add(model_id)
+
+    # Spool the body to disk once it exceeds STREAM_SPOOL_SIZE
+    body = SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+
+    text = io.TextIOWrapper(body, encoding='utf-8')
+    try:
+        reader = STREAM_READERS[content_type](
+            text, STREAM_CHUNK_SIZE, input_columns.get(model_id, {}))
     except Exception as e:
+        text.close()
         raise HTTPException(
-            status_code = 500,
-            detail = f"Error predicting the price: {str(e)}"
-        )
\ No newline at end of file
+            status_code = 422,
+            detail = f"Error reading the body: {str(e)}"
+        )
+
+    return StreamingResponse(
+        stream_predictions(model_id, model, validator, reader, text),
+        media_type='application/x-ndjson'
+    )
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single row predictions of the same model into one
+    vectorized call.
+
+    The first request of a model opens a batch that is flushed after
+    `window` seconds, or as soon as it reaches `max_batch_size` rows. Every
+    request of the batch waits for the same call and gets its own row of the
+    result back.
+
+    Args:
+        predict_many (Callable[[str, list[dict]], Awaitable[list]]):
+        Coroutine function that predicts a list of rows of a model and
+        returns one value per row.
+        window (float): Seconds a batch waits for more rows.
+        max_batch_size (int): Rows that flush a batch immediately.
+    """
+
+    def __init__(
+            self,
+            predict_many: Callable[[str, list[dict]], Awaitable[list]],
+            window: float,
+            max_batch_size: int):
+        self.predict_many = predict_many
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._batches: dict[str, list[tuple[dict, asyncio.Future]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, key: str, features: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._batches.setdefault(key, [])
+        batch.append((features, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(key, None)
+        if not batch:
+            return
+        # Keep a reference to the task until it is done
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: str, batch: list[tuple[dict, asyncio.Future]]):
+        self.batches += 1
+        self.rows += len(batch)
+        try:
+            results = await self.predict_many(
+                key, [features for features, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            'window': self.window,
+            'max_batch_size': self.max_batch_size,
+            'batches': self.batches,
+            'rows': self.rows,
+        }
@@ -0,0 +1,344 @@
+import os
+import json
+import threading
+from typing import Callable, Optional
+from database.crud import fetch_rows
+from database.queries import queries
+from pydantic import BaseModel
+from api.schemas import GetCountriesResponse, GetCitiesResponse, \
+    GetModelsCategory, GetModelsResponse, GetModelResponse, \
+    GetInputsResponse, ModelItem, InputItem
+from api.serialization import encode_json
+from api.city_search import CitySearchIndex
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check if an `If-None-Match` header matches an ETag, using the weak
+    comparison required for this header.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag.removeprefix('W/')
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+class CatalogVersion:
+    """
+    Version of the catalog stored in the database, bumped by every
+    ingestion.
+
+    The version is kept in memory and only read again when the database file
+    changes (its modification time, size or inode), so checking it doesn't
+    open a connection.
+
+    Args:
+        read_version (Callable[[], int]): Function that reads the version
+        from the database.
+        get_path (Callable[[], str]): Function that returns the database
+        path.
+    """
+
+    def __init__(
+            self,
+            read_version: Callable[[], int],
+            get_path: Callable[[], str]):
+        self.read_version = read_version
+        self.get_path = get_path
+        self._signature = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def _file_signature(self) -> tuple:
+        path = self.get_path()
+        stat = os.stat(path)
+        return (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def peek(self) -> Optional[int]:
+        """
+        Returns the version kept in memory, or None when the database file
+        changed and it must be read again with `get`. It never queries the
+        database, so it can run in the event loop.
+        """
+        signature = self._file_signature()
+        with self._lock:
+            if signature == self._signature:
+                return self._version
+        return None
+
+    def get(self) -> int:
+        signature = self._file_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._version = self.read_version()
+                self._signature = signature
+                self.reads += 1
+            return self._version
+
+
+# Model attribute and direction of each sorting option of the models
+# endpoint, matching the ORDER BY of the `get_models_from_city` query
+MODEL_SORT_KEYS = {
+    GetModelsCategory.year: ('data_year', True),
+    GetModelsCategory.mae: ('mae', False),
+    GetModelsCategory.mape: ('mape', False),
+    GetModelsCategory.r2: ('r2', True),
+    GetModelsCategory.rmse: ('rmse', False),
+}
+
+
+def sort_models(
+        models: list[ModelItem],
+        sort_by: GetModelsCategory) -> list[ModelItem]:
+    """
+    Sort models like SQLite does: ties keep their order and NULLs come first
+    in ascending order and last in descending order.
+    """
+    attribute, descending = MODEL_SORT_KEYS[sort_by]
+
+    def key(model):
+        value = getattr(model, attribute)
+        return (value is not None, value)
+
+    return sorted(models, key=key, reverse=descending)
+
+
+class CatalogIndex:
+    """
+    Read-only snapshot of the catalog with the responses of the catalog
+    endpoints built once: countries, cities by country, models by city and
+    sorting option, the metadata and inputs of each model and the city
+    autocomplete index.
+
+    Args:
+        models (list[ModelItem]): Models, in database order.
+        cities (list[tuple[str, str, str, str]]): Id, name, country and
+        hierarchy of the cities, sorted by name.
+        model_city (list[tuple[str, str]]): City and model ids of each
+        relation.
+        inputs (list[InputItem]): Inputs of all models, in database order.
+    """
+
+    def __init__(
+            self,
+            models: list[ModelItem],
+            cities: list[tuple[str, str, str, str]],
+            model_city: list[tuple[str, str]],
+            inputs: list[InputItem]):
+        self.models = {model.id: model for model in models}
+        self._encoded: dict[tuple, bytes] = {}
+
+        self.countries = GetCountriesResponse.model_construct(
+            countries=sorted({country for _, _, country, _ in cities}))
+
+        cities_by_country: dict[str, dict[str, str]] = {'all': {}}
+        for city_id, name, country, hierarchy in cities:
+            label = f'{name} ({hierarchy})'
+            cities_by_country['all'][label] = city_id
+            cities_by_country.setdefault(country, {})[label] = city_id
+        self.cities = {
+            country: GetCitiesResponse.model_construct(cities=city_dict)
+            for country, city_dict in cities_by_country.items()
+        }
+        self.city_search = CitySearchIndex(cities)
+
+        # Models of each city (and of any city) in database order
+        model_ids_by_city: dict[str, set[str]] = {'all': set()}
+        for city_id, model_id in model_city:
+            model_ids_by_city['all'].add(model_id)
+            model_ids_by_city.setdefault(city_id, set()).add(model_id)
+        self.model_ids = sorted(
+            model_id for model_id in model_ids_by_city['all']
+            if model_id in self.models
+        )
+        self.models_by_city = {}
+        for city_id, model_ids in model_ids_by_city.items():
+            city_models = [
+                model for model in models if model.id in model_ids]
+            for sort_by in GetModelsCategory:
+                self.models_by_city[(city_id, sort_by)] = \
+                    GetModelsResponse.model_construct(
+                        models=sort_models(city_models, sort_by))
+
+        # Inputs of each model sorted by type, like the `get_inputs` query
+        inputs_by_model: dict[str, list[InputItem]] = {}
+        for input_item in inputs:
+            inputs_by_model.setdefault(input_item.models_id, []).append(
+                input_item)
+        self.inputs = {
+            model_id: GetInputsResponse.model_construct(
+                inputs=sorted(model_inputs, key=lambda i: i.type))
+            for model_id, model_inputs in inputs_by_model.items()
+        }
+
+    def get_cities(self, country: str) -> GetCitiesResponse:
+        return self.cities.get(country) or GetCitiesResponse()
+
+    def get_models(
+            self,
+            city: str,
+            sort_by: GetModelsCategory) -> GetModelsResponse:
+        return self.models_by_city.get((city, sort_by)) or GetModelsResponse()
+
+    def get_model(self, model_id: str) -> Optional[ModelItem]:
+        return self.models.get(model_id)
+
+    def get_inputs(self, model_id: str) -> GetInputsResponse:
+        return self.inputs.get(model_id) or GetInputsResponse()
+
+    def encode(self, key: tuple, content: BaseModel, cache: bool) -> bytes:
+        """
+        Returns the JSON of a response, encoded once per catalog version when
+        `cache` is True. Responses of unknown ids are not cached, so clients
+        can't grow the cache.
+        """
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            encoded = encode_json(content)
+            if cache:
+                self._encoded[key] = encoded
+        return encoded
+
+    def encoded_countries(self) -> bytes:
+        return self.encode(('countries',), self.countries, True)
+
+    def encoded_cities(self, country: str) -> bytes:
+        return self.encode(
+            ('cities', country),
+            self.get_cities(country),
+            country in self.cities
+        )
+
+    def encoded_models(self, city: str, sort_by: GetModelsCategory) -> bytes:
+        return self.encode(
+            ('models', city, sort_by),
+            self.get_models(city, sort_by),
+            (city, sort_by) in self.models_by_city
+        )
+
+    def encoded_model(self, model_id: str) -> Optional[bytes]:
+        model = self.get_model(model_id)
+        if model is None:
+            return None
+        return self.encode(
+            ('model', model_id),
+            GetModelResponse.model_construct(model=model),
+            True
+        )
+
+    def encoded_inputs(self, model_id: str) -> bytes:
+        return self.encode(
+            ('inputs', model_id),
+            self.get_inputs(model_id),
+            model_id in self.inputs
+        )
+
+
+def model_item_from_row(row) -> ModelItem:
+    """
+    Map a row of the models table to a `ModelItem`.
+    """
+    return ModelItem(
+        id=row['id'], flavor=row['flavor'], r2=row['r2'], mae=row['mae'],
+        mape=row['mape'], rmse=row['rmse'], algorithm=row['algorithm'],
+        data_year=row['data_year'], author=row['author'],
+        links=json.loads(row['links'])
+    )
+
+
+def input_item_from_row(row) -> InputItem:
+    """
+    Map a row of the inputs table to an `InputItem`.
+    """
+    return InputItem(
+        models_id=row['models_id'], column_name=row['column_name'],
+        lat=row['lat'], lng=row['lng'], label=row['label'], type=row['type'],
+        options=json.loads(row['options']), description=row['description'],
+        unit=row['unit']
+    )
+
+
+def load_catalog_index() -> CatalogIndex:
+    """
+    Read the whole catalog from the database into a `CatalogIndex`.
+    """
+    return CatalogIndex(
+        fetch_rows(queries['get_catalog_models'], mapper=model_item_from_row),
+        fetch_rows(queries['get_catalog_cities'], mapper=tuple),
+        fetch_rows(queries['get_catalog_model_city'], mapper=tuple),
+        fetch_rows(queries['get_catalog_inputs'], mapper=input_item_from_row)
+    )
+
+
+def changed_models(old: CatalogIndex, new: CatalogIndex) -> set[str]:
+    """
+    Returns the ids of the models of `old` that were removed or whose
+    metadata or inputs changed in `new`.
+    """
+    return {
+        model_id for model_id, model in old.models.items()
+        if new.get_model(model_id) != model
+        or new.get_inputs(model_id) != old.get_inputs(model_id)
+    }
+
+
+class Catalog:
+    """
+    Keeps the `CatalogIndex` of the current catalog version. The index is
+    rebuilt when the version changes and swapped in a single assignment, so
+    readers always get a complete snapshot.
+
+    Args:
+        version (CatalogVersion): Version of the catalog.
+        load_index (Callable[[], CatalogIndex]): Function that builds the
+        index from the database.
+        on_swap (Callable[[CatalogIndex, CatalogIndex], None] | None):
+        Called with the old and the new index when an index is replaced,
+        e.g. to forget what was cached about the models that changed.
+    """
+
+    def __init__(
+            self,
+            version: CatalogVersion,
+            load_index: Callable[[], CatalogIndex],
+            on_swap: Optional[
+                Callable[[CatalogIndex, CatalogIndex], None]] = None):
+        self.version = version
+        self.load_index = load_index
+        self.on_swap = on_swap
+        self._current: Optional[tuple[int, CatalogIndex]] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def is_current(self) -> bool:
+        """
+        Check if the index is of the current version without querying the
+        database, so it can run in the event loop.
+        """
+        current = self._current
+        return current is not None and current[0] == self.version.peek()
+
+    def get(self) -> CatalogIndex:
+        version = self.version.get()
+        current = self._current
+        if current is not None and current[0] == version:
+            return current[1]
+
+        with self._lock:
+            current = self._current
+            if current is None or current[0] != version:
+                previous = current
+                current = self._current = (version, self.load_index())
+                self.builds += 1
+                if previous is not None and self.on_swap is not None:
+                    self.on_swap(previous[1], current[1])
+        return current[1]
+
+    def clear(self):
+        self._current = None
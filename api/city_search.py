@@ -0,0 +1,164 @@
+import unicodedata
+import numpy as np
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Optional
+
+# Minimum similarity (Dice coefficient of trigrams) of a fuzzy match
+FUZZY_MIN_SCORE = 0.3
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase a name, strip its accents and collapse its whitespace, so
+    "São  José" and "sao jose" match.
+    """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class CityMatch:
+    id: str
+    city: str
+    country: str
+    hierarchy: str
+    match: str
+    score: float
+
+
+class CitySearchIndex:
+    """
+    Autocomplete index of city names.
+
+    Prefix matches come from sorted arrays searched with bisect: first the
+    cities whose name starts with the query, then the ones with a later word
+    starting with it (e.g. "campos" finds "São José dos Campos"). When they
+    are not enough, the rest is filled with fuzzy matches ranked by trigram
+    similarity, which tolerate typos.
+
+    Args:
+        cities (list[tuple[str, str, str, str]]): Id, name, country and
+        hierarchy of the cities.
+    """
+
+    def __init__(self, cities: list[tuple[str, str, str, str]]):
+        self.cities = cities
+        self._names = [normalize(name) for _, name, _, _ in cities]
+
+        names = sorted((name, i) for i, name in enumerate(self._names))
+        self._name_keys = [key for key, _ in names]
+        self._name_ids = [i for _, i in names]
+
+        words = sorted(
+            (name[position + 1:], i)
+            for i, name in enumerate(self._names)
+            for position, char in enumerate(name) if char == ' '
+        )
+        self._word_keys = [key for key, _ in words]
+        self._word_ids = [i for _, i in words]
+
+        # Posting arrays of each trigram, so the trigrams a query shares
+        # with every city are counted at once with bincount
+        postings: dict[str, list[int]] = {}
+        trigram_counts = []
+        for i, name in enumerate(self._names):
+            name_trigrams = trigrams(name)
+            trigram_counts.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                postings.setdefault(trigram, []).append(i)
+        self._trigrams = {
+            trigram: np.array(ids, dtype=np.int32)
+            for trigram, ids in postings.items()
+        }
+        self._trigram_counts = np.array(trigram_counts, dtype=np.float32)
+
+        countries = sorted({country for _, _, country, _ in cities})
+        self._country_codes = {c: code for code, c in enumerate(countries)}
+        self._countries = np.array(
+            [self._country_codes[country] for _, _, country, _ in cities],
+            dtype=np.int32)
+
+    def _prefix(
+            self,
+            keys: list[str],
+            ids: list[int],
+            query: str,
+            limit: int,
+            country: Optional[str],
+            found: dict[int, tuple[str, float]],
+            match: str):
+        for j in range(bisect_left(keys, query), len(keys)):
+            if len(found) >= limit or not keys[j].startswith(query):
+                return
+            i = ids[j]
+            if i in found:
+                continue
+            if country is not None and self.cities[i][2] != country:
+                continue
+            found[i] = (match, 1.0)
+
+    def _fuzzy(
+            self,
+            query: str,
+            limit: int,
+            country: Optional[str],
+            found: dict[int, tuple[str, float]]):
+        query_trigrams = trigrams(query)
+        matched = [
+            self._trigrams[t] for t in query_trigrams if t in self._trigrams]
+        if not matched:
+            return
+        common = np.bincount(
+            np.concatenate(matched), minlength=len(self.cities))
+
+        scores = 2 * common / (len(query_trigrams) + self._trigram_counts)
+        if country is not None:
+            code = self._country_codes.get(country, -1)
+            scores[self._countries != code] = 0
+        if found:
+            scores[list(found)] = 0
+
+        k = min(limit - len(found), len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        for i in best[np.argsort(-scores[best], kind='stable')]:
+            score = float(scores[i])
+            if score >= FUZZY_MIN_SCORE:
+                found[int(i)] = ('fuzzy', round(score, 4))
+
+    def search(
+            self,
+            query: str,
+            limit: int = 10,
+            country: Optional[str] = None) -> list[CityMatch]:
+        """
+        Returns up to `limit` cities matching a partial name, prefix matches
+        first (in alphabetical order) and then fuzzy ones (by similarity).
+
+        Args:
+            query (str): Partial city name.
+            limit (int): Maximum number of results.
+            country (str | None): Only return cities of this country.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        found: dict[int, tuple[str, float]] = {}
+        self._prefix(self._name_keys, self._name_ids, query, limit, country,
+                     found, 'prefix')
+        self._prefix(self._word_keys, self._word_ids, query, limit, country,
+                     found, 'word')
+        if len(found) < limit:
+            self._fuzzy(query, limit, country, found)
+
+        return [
+            CityMatch(*self.cities[i], match=match, score=score)
+            for i, (match, score) in found.items()
+        ]
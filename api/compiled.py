@@ -0,0 +1,54 @@
+import json
+import numpy as np
+from api.timing import phase
+
+
+class CompiledModel:
+    """
+    Runs the ONNX version of a model, saved by the ingestion next to the
+    MLflow model, with onnxruntime.
+
+    The column order and input layout ("columns" for one [n, 1] tensor per
+    column or "matrix" for a single [n, m] float tensor named "input") are
+    read from the model's metadata props.
+
+    Args:
+        path (str): Path of the ONNX file.
+    """
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(
+            path, providers=['CPUExecutionProvider'])
+        props = self.session.get_modelmeta().custom_metadata_map
+        self.columns = json.loads(props['columns'])
+        self.layout = props['layout']
+        self.strings = {
+            i.name for i in self.session.get_inputs()
+            if i.type == 'tensor(string)'
+        }
+        self.output = self.session.get_outputs()[0].name
+
+    def feed(self, rows: list[dict]) -> dict[str, np.ndarray]:
+        if self.layout == 'matrix':
+            return {
+                'input': np.array(
+                    [[row[column] for column in self.columns] for row in rows],
+                    dtype=np.float32
+                )
+            }
+        return {
+            column: np.array(
+                [row[column] for row in rows],
+                dtype=object if column in self.strings else np.float32
+            ).reshape(-1, 1)
+            for column in self.columns
+        }
+
+    def predict(self, rows: list[dict]) -> np.ndarray:
+        with phase('frame'):
+            feed = self.feed(rows)
+        with phase('predict'):
+            outputs = self.session.run([self.output], feed)
+        return np.ravel(outputs[0]).astype(np.float64)
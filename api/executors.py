@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class QueueFullError(Exception):
+    """Raised when an executor already has as many tasks as it can hold."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a task does not finish before the executor's timeout."""
+
+
+class BoundedExecutor:
+    """
+    Thread pool used by async handlers to run blocking work without sharing
+    threads with other kinds of work.
+
+    The number of tasks running or waiting for a thread is limited to
+    `max_workers + max_queue`; new tasks are refused with `QueueFullError`
+    instead of piling up. Each task must finish within `timeout` seconds or
+    `DeadlineExceededError` is raised (a task that already started keeps its
+    thread until it finishes, but a queued one is dropped).
+
+    Args:
+        name (str): Prefix of the threads' names.
+        max_workers (int): Number of threads.
+        max_queue (int): Number of tasks allowed to wait for a thread.
+        timeout (float): Seconds a task has to finish, counting the time it
+        waited in the queue.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            max_workers: int,
+            max_queue: int,
+            timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"The {self.name} queue is full.")
+            self.pending += 1
+
+        # Keep the request context (e.g. timings) inside the thread
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, fn, *args)
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise DeadlineExceededError(
+                f"The {self.name} task did not finish in {self.timeout}s.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
@@ -0,0 +1,142 @@
+import os
+from time import perf_counter
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, \
+    REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from database.queries import queries
+
+# With several uvicorn workers, PROMETHEUS_MULTIPROC_DIR must point to an
+# empty directory shared by them (set before the API starts), so each
+# worker writes its metrics there and any of them can serve the sum
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+DB_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1,
+              .25, .5, 1)
+
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds',
+    'Duration of the requests by route.',
+    ['method', 'route', 'status']
+)
+MODEL_REQUEST_DURATION = Histogram(
+    'api_model_request_duration_seconds',
+    'Duration of the successful requests of a model by route.',
+    ['route', 'model_id']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'api_requests_in_flight',
+    'Requests being served.',
+    multiprocess_mode='livesum'
+)
+MODEL_CACHE_REQUESTS = Counter(
+    'api_model_cache_requests',
+    'Lookups in the models cache by result (hit or miss).',
+    ['result']
+)
+MODEL_CACHE_REMOVALS = Counter(
+    'api_model_cache_removals',
+    'Models dropped from the models cache by reason (eviction or '
+    'expiration).',
+    ['reason']
+)
+MODEL_LOAD_DURATION = Histogram(
+    'api_model_load_duration_seconds',
+    'Duration of the model loads.',
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+DB_QUERY_DURATION = Histogram(
+    'api_db_query_duration_seconds',
+    'Duration of the SQLite queries by query name.',
+    ['query'],
+    buckets=DB_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    'api_admission_rejections',
+    'Prediction requests refused by the admission control by scope (global '
+    'or model) and reason (queue_full or timeout).',
+    ['scope', 'reason']
+)
+VALIDATION_FAILURES = Counter(
+    'api_validation_failures',
+    'Features (or batch rows) refused by the validator of a model.'
+)
+
+# Names of the queries, so queries are labeled by name instead of their SQL
+QUERY_NAMES = {query: name for name, query in queries.items()}
+
+
+def observe_query(query: str, seconds: float):
+    DB_QUERY_DURATION.labels(QUERY_NAMES.get(query, 'other')).observe(seconds)
+
+
+def observe_model_cache(event: str, seconds: float):
+    if event in ('hit', 'miss'):
+        MODEL_CACHE_REQUESTS.labels(event).inc()
+    elif event == 'load':
+        MODEL_LOAD_DURATION.observe(seconds)
+    else:
+        MODEL_CACHE_REMOVALS.labels(event).inc()
+
+
+def observe_admission_rejection(scope: str, reason: str):
+    ADMISSION_REJECTIONS.labels(scope, reason).inc()
+
+
+def generate_metrics() -> bytes:
+    """
+    Returns the metrics in Prometheus text format, summed over all workers
+    in multiprocess mode.
+    """
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """
+    Drop the live gauges of this worker when it stops.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that measures the requests in flight and the duration of
+    each request by route, and by model for the successful prediction
+    requests (which fail for unknown models). Requests that don't match a
+    route are labeled "unmatched", so unknown paths don't create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            seconds = perf_counter() - start
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            REQUEST_DURATION.labels(
+                scope['method'], route, status_code).observe(seconds)
+            model_id = scope.get('path_params', {}).get('model_id')
+            if model_id is not None and status_code < 400 \
+                    and route.startswith('/predict/'):
+                MODEL_REQUEST_DURATION.labels(route, model_id).observe(seconds)
+
@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Any, Callable, Optional
+
+
+def get_rss() -> int:
+    """
+    Returns the resident set size of the process in bytes, or 0 when it is
+    not available (non Linux systems).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def get_dir_size(path: str) -> int:
+    """
+    Returns the size in bytes of all files inside `path`.
+    """
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+@dataclass
+class CacheEntry:
+    model: Any
+    size: int
+    last_used: float
+
+
+class PendingLoad:
+    """
+    Load in progress, shared by the requests that missed the same model.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.model: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ModelCache:
+    """
+    LRU cache of loaded models bounded by the memory they use instead of the
+    number of entries.
+
+    The size of each model is measured when it is loaded, as the growth of
+    the process resident memory or the size of its files on disk, whichever
+    is bigger. The memory growth is only used when no other load ran at the
+    same time and the load imported no module, since it would include their
+    memory. `prepare` can import the modules every load needs beforehand.
+    Least recently used models are evicted while the cache is over
+    `max_bytes`, and models not used for `ttl` seconds are dropped.
+
+    Concurrent misses of the same model wait for a single load instead of
+    loading it once each. When the load fails, all of them get its error,
+    and the next request tries again.
+
+    Args:
+        loader (Callable[[str], Any]): Function that loads a model from its
+        key (the model path).
+        max_bytes (int): Memory budget of the cache. The most recent model is
+        always kept, even if it alone exceeds the budget.
+        ttl (float): Seconds a model can stay idle before being dropped. Use
+        0 to keep models until they are evicted.
+        listener (Callable[[str, float], None] | None): Called with each
+        event of the cache ('hit', 'miss', 'load', 'eviction' or
+        'expiration') and its duration in seconds (only for loads), e.g. to
+        export metrics.
+        prepare (Callable[[], None] | None): Called before each load, e.g. to
+        import the modules used to load models.
+    """
+
+    def __init__(
+            self,
+            loader: Callable[[str], Any],
+            max_bytes: int,
+            ttl: float = 0,
+            listener: Optional[Callable[[str, float], None]] = None,
+            prepare: Optional[Callable[[], None]] = None):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.listener = listener
+        self.prepare = prepare
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._pending: dict[str, PendingLoad] = {}
+        self._lock = threading.Lock()
+        # Loads running and started, to tell if a load overlapped others
+        self._running_loads = 0
+        self._started_loads = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.shared_loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        now = monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._notify('hit')
+                entry.last_used = now
+                self._entries.move_to_end(key)
+                return entry.model
+            self.misses += 1
+            self._notify('miss')
+            pending = self._pending.get(key)
+            loading = pending is None
+            if loading:
+                pending = self._pending[key] = PendingLoad()
+            else:
+                self.shared_loads += 1
+
+        if not loading:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.model
+
+        try:
+            model, size, elapsed = self._load(key)
+        except BaseException as e:
+            # Not cached, so the next request loads it again
+            pending.error = e
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+            pending.done.set()
+            raise
+
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += elapsed
+            self._notify('load', elapsed)
+            # Unless the model was invalidated while it loaded
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+                if key not in self._entries:
+                    self._entries[key] = CacheEntry(model, size, monotonic())
+                    self.size += size
+                    self._evict()
+        pending.model = model
+        pending.done.set()
+        return model
+
+    def _notify(self, event: str, seconds: float = 0.0):
+        if self.listener is not None:
+            self.listener(event, seconds)
+
+    def _load(self, key: str) -> tuple[Any, int, float]:
+        if self.prepare is not None:
+            self.prepare()
+        with self._lock:
+            alone = self._running_loads == 0
+            self._running_loads += 1
+            self._started_loads += 1
+            started = self._started_loads
+        rss = get_rss()
+        modules = len(sys.modules)
+        start = perf_counter()
+        try:
+            model = self.loader(key)
+        finally:
+            elapsed = perf_counter() - start
+            growth = get_rss() - rss
+            with self._lock:
+                self._running_loads -= 1
+                alone = alone and self._started_loads == started
+        size = get_dir_size(key)
+        if alone and len(sys.modules) == modules:
+            size = max(growth, size)
+        return model, size, elapsed
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+    def _evict(self):
+        # Keep at least the most recent model
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+            self._notify('eviction')
+
+    def _expire(self, now: float):
+        if not self.ttl:
+            return
+        # Entries are ordered by last use, so idle ones are at the beginning
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self.ttl:
+                break
+            self._remove(key)
+            self.expirations += 1
+            self._notify('expiration')
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'models': list(self._entries),
+                'size_bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'load_seconds': round(self.load_seconds, 6),
+                'shared_loads': self.shared_loads,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
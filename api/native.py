@@ -0,0 +1,115 @@
+import importlib
+import numpy as np
+from typing import Any, TYPE_CHECKING
+from api.compiled import CompiledModel
+from api.timing import phase
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Flavors whose estimators can be called without the pyfunc wrapper
+NATIVE_FLAVORS = ('sklearn', 'xgboost', 'lightgbm')
+
+# Column dtypes of each input type
+INPUT_DTYPES = {
+    'int': 'int64',
+    'float': 'float64',
+    'bool': 'bool',
+    'categorical': 'object',
+    'str': 'object',
+}
+
+
+def get_input_dtypes(inputs: list[dict]) -> dict[str, str]:
+    """
+    Map the columns of a model's inputs to their dtypes, in the order the
+    inputs were defined.
+    """
+    dtypes = {}
+    for model_input in inputs:
+        if model_input['type'] == 'map':
+            dtypes[model_input['lat']] = INPUT_DTYPES['float']
+            dtypes[model_input['lng']] = INPUT_DTYPES['float']
+        else:
+            dtypes[model_input['column_name']] = \
+                INPUT_DTYPES.get(model_input['type'], 'object')
+    return dtypes
+
+
+class NativeModel:
+    """
+    Calls the estimator of a model directly, skipping the pyfunc schema
+    enforcement and building the input frame column by column with a column
+    order and dtypes computed once.
+
+    The frame only has the columns of the model's inputs, like the requests
+    sent to pyfunc. Columns the estimator was trained with that aren't
+    inputs (e.g. derived by a feature engineering step of its pipeline) are
+    left for the estimator to compute.
+
+    Args:
+        estimator (Any): Model loaded with its own MLflow flavor.
+        dtypes (dict[str, str]): Dtype of each input column.
+    """
+
+    def __init__(self, estimator: Any, dtypes: dict[str, str]):
+        self.estimator = estimator
+        # Keep the column order the estimator was trained with, when known,
+        # then any input it doesn't list
+        trained = getattr(estimator, 'feature_names_in_', None)
+        columns = [
+            column for column in (trained if trained is not None else [])
+            if column in dtypes
+        ]
+        columns += [column for column in dtypes if column not in columns]
+        self.dtypes = {column: dtypes[column] for column in columns}
+
+    def frame(self, rows: list[dict]) -> 'pd.DataFrame':
+        import pandas as pd
+        return pd.DataFrame(
+            {
+                column: np.array([row[column] for row in rows], dtype=dtype)
+                for column, dtype in self.dtypes.items()
+            },
+            copy=False
+        )
+
+    def predict(self, rows: list[dict]) -> np.ndarray:
+        with phase('frame'):
+            frame = self.frame(rows)
+        with phase('predict'):
+            return np.ravel(self.estimator.predict(frame))
+
+
+def load_native_model(
+        model_path: str,
+        flavor: str,
+        inputs: list[dict]) -> NativeModel:
+    module = importlib.import_module(f'mlflow.{flavor}')
+    return NativeModel(module.load_model(model_path), get_input_dtypes(inputs))
+
+
+def run_model(model, rows: list[dict]) -> np.ndarray:
+    """
+    Predict a list of rows with a pyfunc, a native or a compiled model.
+    """
+    if isinstance(model, (NativeModel, CompiledModel)):
+        return model.predict(rows)
+    import pandas as pd
+    with phase('frame'):
+        frame = pd.DataFrame(rows)
+    with phase('predict'):
+        return np.ravel(model.predict(frame))
+
+
+def matches_pyfunc(
+        native: NativeModel,
+        pyfunc,
+        x_test: list[dict]) -> bool:
+    """
+    Check if the native model predicts the same values as the pyfunc one for
+    the test sample of the model.
+    """
+    rows = [
+        {column: row[column] for column in native.dtypes} for row in x_test]
+    return bool(np.allclose(native.predict(rows), run_model(pyfunc, rows)))
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class PredictionCache:
+    """
+    LRU cache of predictions keyed by the model id and its validated
+    features.
+
+    Features are canonicalized before being used as key: their order is
+    ignored and coordinates are rounded to `coordinate_digits` decimal places,
+    so requests for the same property a few centimeters apart share their
+    prediction.
+
+    Args:
+        max_entries (int): Number of predictions kept. Use 0 to disable the
+        cache.
+        coordinate_digits (int): Decimal places kept in coordinates.
+    """
+
+    def __init__(self, max_entries: int, coordinate_digits: int = 5):
+        self.max_entries = max_entries
+        self.coordinate_digits = coordinate_digits
+        self._entries: OrderedDict[tuple, Any] = OrderedDict()
+        self._keys_by_model: dict[str, set[tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(
+            self,
+            model_id: str,
+            features: dict[str, Any],
+            coordinates: frozenset[str] = frozenset(),
+            extra: tuple = ()) -> Optional[tuple]:
+        """
+        Returns the cache key of a prediction, or None when the features
+        can't be cached. `extra` holds other hashable parameters of the
+        prediction, like the resolution of a heatmap.
+        """
+        if not self.max_entries:
+            return None
+        items = tuple(sorted(
+            (name, round(value, self.coordinate_digits))
+            if name in coordinates and isinstance(value, (int, float))
+            else (name, value)
+            for name, value in features.items()
+        ))
+        if not all(isinstance(value, Hashable) for _, value in items):
+            return None
+        return (model_id, items, *extra)
+
+    def get(self, key: Optional[tuple]) -> Any:
+        if key is None:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Optional[tuple], value: Any):
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._keys_by_model.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._keys_by_model[old_key[0]].discard(old_key)
+                self.evictions += 1
+
+    def invalidate(self, model_id: str):
+        """
+        Drop every prediction of a model, e.g. after it was ingested again.
+        """
+        with self._lock:
+            for key in self._keys_by_model.pop(model_id, set()):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_model.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Any, Union
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, \
+    StrictInt, StrictFloat, StrictBool, StrictStr, AfterValidator, \
+    create_model
+from typing import Optional, Any, Union, Literal, Annotated
 from enum import Enum
 
 class StatusResponse(BaseModel):
@@ -17,6 +19,96 @@ class StatusResponse(BaseModel):
     }
 
 
+class ReadyResponse(BaseModel):
+    ready: bool = Field(
+        description="True when no model preloaded at startup is pending, "
+        "even if some of them failed.")
+    pending: list[str] = Field(
+        default_factory=list,
+        description="Models still being loaded.")
+    loaded: list[str] = Field(
+        default_factory=list,
+        description="Models loaded and warmed up.")
+    failed: dict[str, str] = Field(
+        default_factory=dict,
+        description="Models that failed to load and their errors.")
+
+    model_config={
+        'json_schema_extra': {
+            "examples": [{
+                "ready": True,
+                "pending": [],
+                "loaded": ["55555555-5555-5555-5555-555555555555"],
+                "failed": {}
+            }]
+        }
+    }
+
+
+class ModelCacheStats(BaseModel):
+    models: list[str] = Field(
+        default_factory=list,
+        description="Ids of the models in the cache, from the least to the "
+        "most recently used.")
+    size_bytes: int = Field(
+        description="Estimated memory used by the cached models.")
+    max_bytes: int = Field(description="Memory budget of the cache.")
+    ttl: float = Field(
+        description="Seconds a model can stay idle before being dropped.")
+    hits: int = Field(description="Requests served by a cached model.")
+    misses: int = Field(description="Requests that had to load the model.")
+    loads: int = Field(description="Models loaded from the storage.")
+    load_seconds: float = Field(description="Total time spent loading models.")
+    shared_loads: int = Field(
+        description="Misses that waited for a load already in progress "
+        "instead of loading the model again.")
+    evictions: int = Field(
+        description="Models dropped to keep the cache within its budget.")
+    expirations: int = Field(
+        description="Models dropped for being idle longer than the ttl.")
+
+
+class ConcurrencyLimitStats(BaseModel):
+    limit: int = Field(
+        description="Requests allowed to run at the same time (0 for no "
+        "limit).")
+    active: int = Field(description="Requests running.")
+    waiting: int = Field(description="Requests waiting for a slot.")
+    admitted: int = Field(description="Requests admitted.")
+    queue_full: int = Field(
+        description="Requests refused because the wait queue was full.")
+    timeouts: int = Field(
+        description="Requests refused because they waited too long.")
+
+
+class AdmissionStats(BaseModel):
+    global_limit: ConcurrencyLimitStats = Field(
+        description="Limit of all the prediction requests.")
+    model_limit: int = Field(
+        description="Requests of a model allowed to run at the same time.")
+    model_queue: int = Field(
+        description="Requests of a model allowed to wait for a slot.")
+    timeout: float = Field(
+        description="Seconds a request can wait for each slot.")
+    models: dict[str, ConcurrencyLimitStats] = Field(
+        description="Limits of the models with requests running or waiting.")
+    model_rejections: dict[str, int] = Field(
+        description="Requests refused by model, for the models refused "
+        "most recently.")
+
+
+class PredictionCacheStats(BaseModel):
+    entries: int = Field(description="Predictions in the cache.")
+    max_entries: int = Field(description="Maximum number of predictions.")
+    hits: int = Field(description="Predictions served from the cache.")
+    misses: int = Field(description="Predictions not found in the cache.")
+    hit_rate: float = Field(description="Share of lookups served by the cache.")
+    evictions: int = Field(
+        description="Predictions dropped to keep the cache within its size.")
+    invalidations: int = Field(
+        description="Predictions dropped because their model changed.")
+
+
 class GetCountriesResponse(BaseModel):
     countries: list[str] = Field(
         default_factory=list,
@@ -56,6 +148,40 @@ class GetCitiesResponse(BaseModel):
     }
 
 
+class CitySearchItem(BaseModel):
+    id: str = Field(description="City's wikidata id.", examples=['Q191642'])
+    city: str = Field(description="City's name.",
+                      examples=['São José dos Campos'])
+    country: str = Field(description="City's country.", examples=['Brazil'])
+    hierarchy: str = Field(
+        description="Administrative division of the city, to tell apart " \
+        "cities with the same name.",
+        examples=['São Paulo']
+    )
+    label: str = Field(
+        description="Name and hierarchy, as the keys of `/cities/`.",
+        examples=['São José dos Campos (São Paulo)']
+    )
+    match: str = Field(
+        description="How the city matched: `prefix` (its name starts with " \
+        "the query), `word` (a later word starts with it) or `fuzzy` " \
+        "(similar name).",
+        examples=['prefix']
+    )
+    score: float = Field(
+        description="Similarity to the query, 1 for prefix matches.",
+        examples=[1.0]
+    )
+
+
+class CitySearchResponse(BaseModel):
+    cities: list[CitySearchItem] = Field(
+        default_factory=list,
+        description="Best matches, prefix matches first in alphabetical " \
+        "order and then fuzzy matches by similarity."
+    )
+
+
 class GetModelsCategory(str, Enum):
     year = 'year'
     mae = 'mae'
@@ -166,7 +292,10 @@ the input definition."
 
 
 class PredictRequest(BaseModel):
-    features: dict[str, Any]
+    features: dict[str, Any] = Field(
+        description="Inputs of the model. The schema expected by each model "
+        "is listed as `PredictFeatures_<model id>`."
+    )
 
     model_config={
         'json_schema_extra': {
@@ -209,6 +338,229 @@ class PredictResponse(BaseModel):
     }
 
 
+class EnsembleModelPrediction(BaseModel):
+    model_id: str = Field(
+        description="Id of the model.",
+        examples=['55555555-5555-5555-5555-555555555555'])
+    mape: float = Field(
+        description="Model's MAPE.",
+        examples=[.11])
+    property_price: Optional[float] = Field(
+        None,
+        description="property's predicted price. Null when the model "
+        "failed.",
+        examples=[250_000])
+    weight: float = Field(
+        description="Share of the model in the ensemble price, proportional "
+        "to the inverse of its MAPE. 0 when the model failed.",
+        examples=[.6])
+    latency_ms: float = Field(
+        description="Time taken by the model's prediction in milliseconds.",
+        examples=[12.5])
+    error: Optional[str] = Field(
+        None,
+        description="Why the model failed, e.g. features missing from its "
+        "inputs. Null when the prediction succeeded.",
+        examples=[None])
+
+
+class EnsemblePredictResponse(BaseModel):
+    city: str = Field(
+        description="Id of the city.",
+        examples=['Q191642'])
+    property_price: float = Field(
+        description="MAPE-weighted average of the prices of the models "
+        "that succeeded.",
+        examples=[255_000])
+    latency_ms: float = Field(
+        description="Time taken by all models in milliseconds. They run "
+        "concurrently, so it is close to the slowest one.",
+        examples=[13.1])
+    models: list[EnsembleModelPrediction] = Field(
+        default_factory=list,
+        description="Prediction of each model of the city, sorted by MAPE."
+    )
+
+
+class BatchPredictRequest(BaseModel):
+    features: list[dict[str, Any]] = Field(
+        min_length=1,
+        description="List of properties to predict. Each item follows the "
+        "same rules of the `features` parameter of the predict endpoint."
+    )
+
+    model_config={
+        'json_schema_extra': {
+            "examples": [{
+                'features': [
+                    {
+                        "rooms": 3,
+                        "parking": 2,
+                        "bathrooms": 1,
+                        "area": 90,
+                        "has_multiple_parking_spaces": True,
+                        "neighbourhood": "Jardim Esplanada",
+                        "lat_value": -23.1789,
+                        "lon_value": -45.8869,
+                    },
+                    {
+                        "rooms": 2,
+                        "parking": 1,
+                        "bathrooms": 1,
+                        "area": 55,
+                        "has_multiple_parking_spaces": False,
+                        "neighbourhood": "Centro",
+                        "lat_value": -23.1857,
+                        "lon_value": -45.8840,
+                    }
+                ]
+            }]
+        }
+    }
+
+
+class BatchPredictItem(BaseModel):
+    index: int = Field(
+        description="Position of the property in the request list.",
+        examples=[0])
+    property_price: Optional[float] = Field(
+        None,
+        description="property's predicted price. Null when the row is "
+        "invalid.",
+        examples=[250_000])
+    error: Optional[str] = Field(
+        None,
+        description="Validation error of the row. Null when the prediction "
+        "succeeded.",
+        examples=[None])
+
+
+class BatchPredictResponse(BaseModel):
+    mape: float = Field(
+        description="Model's MAPE.",
+        examples=[.11])
+    predictions: list[BatchPredictItem] = Field(
+        default_factory=list,
+        description="Predictions in the same order of the request list."
+    )
+
+
+class SweepItem(BaseModel):
+    feature: str = Field(
+        description="Column of the model to vary.",
+        examples=['area'])
+    values: Optional[list[Any]] = Field(
+        None,
+        description="Values of the feature. When omitted, categorical "
+        "inputs use their `options`, bool inputs use false and true and "
+        "numeric inputs use `steps` evenly spaced values from `start` to "
+        "`stop`.",
+        examples=[None])
+    start: Optional[float] = Field(
+        None,
+        description="First value of a numeric range.",
+        examples=[50])
+    stop: Optional[float] = Field(
+        None,
+        description="Last value of a numeric range.",
+        examples=[150])
+    steps: int = Field(
+        10,
+        ge=2,
+        description="Number of values of a numeric range. Int inputs drop "
+        "repeated values after rounding.",
+        examples=[11])
+
+
+class WhatIfRequest(BaseModel):
+    features: dict[str, Any] = Field(
+        description="Base inputs of the model, with the same rules of the "
+        "`features` parameter of the predict endpoint. Swept features "
+        "replace their base value."
+    )
+    sweeps: list[SweepItem] = Field(
+        min_length=1,
+        max_length=2,
+        description="One feature for a curve or two for a surface."
+    )
+
+    model_config={
+        'json_schema_extra': {
+            "examples": [{
+                'features': {
+                    "rooms": 3,
+                    "parking": 2,
+                    "bathrooms": 1,
+                    "area": 90,
+                    "has_multiple_parking_spaces": True,
+                    "neighbourhood": "Jardim Esplanada",
+                    "lat_value": -23.1789,
+                    "lon_value": -45.8869,
+                },
+                'sweeps': [
+                    {'feature': 'area', 'start': 50, 'stop': 150, 'steps': 11},
+                    {'feature': 'parking', 'values': [1, 2, 3]},
+                ]
+            }]
+        }
+    }
+
+
+class WhatIfResponse(BaseModel):
+    mape: float = Field(
+        description="Model's MAPE.",
+        examples=[.11])
+    features: list[str] = Field(
+        description="Swept features, in the order of the request.",
+        examples=[['area', 'parking']])
+    values: list[list[Any]] = Field(
+        description="Values of each swept feature.",
+        examples=[[[50, 100, 150], [1, 2]]])
+    prices: Union[list[float], list[list[float]]] = Field(
+        description="Predicted prices. For one feature, `prices[i]` is the "
+        "price at `values[0][i]`. For two, `prices[i][j]` is the price at "
+        "`values[0][i]` and `values[1][j]`.",
+        examples=[[
+            [200_000, 210_000], [350_000, 365_000], [480_000, 500_000]]])
+
+
+class HeatmapRequest(BaseModel):
+    features: dict[str, Any] = Field(
+        description="Inputs of the model held fixed over the grid, with the "
+        "same rules of the `features` parameter of the predict endpoint. "
+        "The latitude and longitude of the map input are filled by the grid "
+        "and can be omitted."
+    )
+    resolution: int = Field(
+        64,
+        ge=2,
+        description="Number of rows and columns of the grid.",
+        examples=[64])
+    bounds: Optional[list[float]] = Field(
+        None,
+        min_length=4,
+        max_length=4,
+        description="South, west, north and east limits of the grid. When "
+        "omitted, the extent of the model's test sample is used.",
+        examples=[[-23.30, -45.99, -23.10, -45.80]])
+
+    model_config={
+        'json_schema_extra': {
+            "examples": [{
+                'features': {
+                    "rooms": 3,
+                    "parking": 2,
+                    "bathrooms": 1,
+                    "area": 90,
+                    "has_multiple_parking_spaces": True,
+                    "neighbourhood": "Jardim Esplanada",
+                },
+                'resolution': 64
+            }]
+        }
+    }
+
+
 def validate_input_data(
         inputs: list[InputItem],
         features: dict[str, Any]) -> dict[str, Any]:
@@ -265,4 +617,170 @@ def validate_input_data(
         raise ValueError(
         f"Unexpected fields in input data: {sorted(extra_fields)}. "
         f"Only the following fields are allowed: {sorted(required_fields)}."
-    )
\ No newline at end of file
+    )
+
+
+# Types used by the compiled validators for each input type
+FEATURE_TYPES = {
+    'int': StrictInt,
+    'float': Union[StrictInt, StrictFloat],
+    'bool': StrictBool,
+    'str': StrictStr,
+}
+
+
+def reject_option(value: str) -> str:
+    raise ValueError(f"Value '{value}' is not a valid option: []")
+
+
+# Categorical inputs without options, which accept no value
+NO_OPTIONS = Annotated[StrictStr, AfterValidator(reject_option)]
+
+
+def create_features_model(
+        model_id: str,
+        inputs: list[InputItem]) -> type[BaseModel]:
+    """
+    Compile the inputs of a model into a pydantic model that validates its
+    features with the same rules of `validate_input_data`.
+
+    Fields are named after their position and use the column names as
+    aliases, so any column name is accepted.
+
+    Returns:
+    type[BaseModel]: Model named `PredictFeatures_<model_id>`.
+    """
+    fields = {}
+
+    def add_field(column, annotation, description):
+        fields[f'field_{len(fields)}'] = (
+            annotation,
+            Field(alias=column, description=description)
+        )
+
+    for input_def in inputs:
+        if input_def.type == 'map':
+            for column in [input_def.lat, input_def.lng]:
+                add_field(
+                    column, FEATURE_TYPES['float'], input_def.description)
+        elif input_def.type == 'categorical' and input_def.options:
+            add_field(
+                input_def.column_name,
+                Literal[tuple(input_def.options)],
+                input_def.description
+            )
+        elif input_def.type == 'categorical':
+            add_field(input_def.column_name, NO_OPTIONS, input_def.description)
+        else:
+            add_field(
+                input_def.column_name,
+                FEATURE_TYPES.get(input_def.type, Any),
+                input_def.description
+            )
+
+    return create_model(
+        f'PredictFeatures_{model_id}',
+        __config__=ConfigDict(extra='forbid', strict=True),
+        **fields
+    )
+
+
+def get_coordinate_columns(inputs: list[InputItem]) -> frozenset[str]:
+    """
+    Returns the latitude and longitude columns of the map inputs.
+    """
+    return frozenset(
+        column
+        for input_def in inputs if input_def.type == 'map'
+        for column in [input_def.lat, input_def.lng]
+    )
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """
+    Summarize a validation error of a features model in a single line.
+    """
+    messages = []
+    for err in error.errors():
+        field = '.'.join(str(loc) for loc in err['loc'])
+        message = f"Field '{field}': {err['msg']}"
+        if err['type'] != 'missing':
+            message += f" (got {err['input']!r})"
+        messages.append(message)
+    return '; '.join(messages)
+
+
+def get_input_columns(inputs: list[InputItem]) -> dict[str, InputItem]:
+    """
+    Map each column of a model to its input. Both columns of a map input
+    point to it.
+    """
+    columns = {}
+    for input_def in inputs:
+        if input_def.type == 'map':
+            columns[input_def.lat] = input_def
+            columns[input_def.lng] = input_def
+        else:
+            columns[input_def.column_name] = input_def
+    return columns
+
+
+# Values of the bool inputs in CSV bodies
+CSV_BOOLS = {'true': True, 'false': False}
+
+
+def parse_csv_int(value: str) -> Union[int, str]:
+    try:
+        return int(value)
+    except ValueError:
+        # Integers written as floats by tools that store them so (e.g. "3.0")
+        number = float(value)
+        return int(number) if number.is_integer() else value
+
+
+def parse_csv_value(input_def: Optional[InputItem], value: str) -> Any:
+    """
+    Convert a CSV field to the type of its input. Fields that can't be
+    converted, or whose column isn't an input, are kept as strings for the
+    validator to reject.
+    """
+    input_type = input_def.type if input_def is not None else 'str'
+    try:
+        if input_type == 'int':
+            return parse_csv_int(value)
+        if input_type in ('float', 'map'):
+            return float(value)
+        if input_type == 'bool':
+            return CSV_BOOLS[value.strip().lower()]
+    except (ValueError, KeyError):
+        pass
+    return value
+
+
+def get_sweep_values(input_def: InputItem, sweep: SweepItem) -> list[Any]:
+    """
+    Returns the values a sweep goes through.
+
+    Raises:
+    ValueError: The sweep has no values and its input has no default ones.
+    """
+    if sweep.values is not None:
+        if not sweep.values:
+            raise ValueError(f"Sweep of '{sweep.feature}' has no values.")
+        return sweep.values
+
+    if input_def.type == 'categorical' and input_def.options:
+        return list(input_def.options)
+    if input_def.type == 'bool':
+        return [False, True]
+    if input_def.type not in ('int', 'float', 'map'):
+        raise ValueError(f"Sweep of '{sweep.feature}' needs values.")
+    if sweep.start is None or sweep.stop is None:
+        raise ValueError(
+            f"Sweep of '{sweep.feature}' needs values or start and stop.")
+
+    step = (sweep.stop - sweep.start) / (sweep.steps - 1)
+    values = [sweep.start + step * i for i in range(sweep.steps)]
+    if input_def.type == 'int':
+        return list(dict.fromkeys(round(value) for value in values))
+    return [round(value, 10) for value in values]
@@ -0,0 +1,23 @@
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def encode_json(content: BaseModel) -> bytes:
+    """
+    Encode a response model the same way FastAPI does, but with orjson and
+    without validating it again.
+    """
+    return orjson.dumps(content.model_dump(mode='json'))
+
+
+def encoded_response(content: bytes, response: Response) -> Response:
+    """
+    Wrap JSON bytes in a response, keeping the headers set by the route's
+    dependencies on `response` (FastAPI only copies them to responses it
+    builds itself).
+    """
+    encoded = Response(content=content, media_type='application/json')
+    for name, value in response.headers.items():
+        encoded.headers[name] = value
+    return encoded
@@ -0,0 +1,156 @@
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+
+
+class RequestTimings:
+    """
+    Time spent by a request in each phase (database, validation, model load,
+    frame construction, prediction...), in seconds. Phases that run more than
+    once add up.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        # Phases of the same request may run in different threads
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def header(self, total: float) -> str:
+        """
+        Returns the phases as a `Server-Timing` header value, in ms.
+        """
+        with self._lock:
+            phases = list(self.phases.items())
+        return ', '.join(
+            f'{name};dur={seconds * 1000:.2f}'
+            for name, seconds in phases + [('total', total)]
+        )
+
+    def fields(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                name: round(seconds * 1000, 3)
+                for name, seconds in self.phases.items()
+            }
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'request_timings', default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record(name: str, seconds: float):
+    """
+    Add `seconds` to a phase of the current request, if any.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Time the block as a phase of the current request. Does nothing outside
+    a request (e.g. during the warm-up).
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects the phases of each request, sends them in
+    the `Server-Timing` header and logs them as structured fields (`extra`
+    of the log record). Requests slower than `slow_ms` are logged as
+    warnings, the rest as debug.
+
+    Args:
+        app: ASGI application.
+        logger (logging.Logger): Logger of the requests.
+        slow_ms (float): Duration in ms from which a request is slow.
+        header (bool): Whether to send the `Server-Timing` header.
+    """
+
+    def __init__(
+            self,
+            app,
+            logger: logging.Logger,
+            slow_ms: float,
+            header: bool = True):
+        self.app = app
+        self.logger = logger
+        self.slow_ms = slow_ms
+        self.header = header
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = perf_counter()
+        status_code = 500
+
+        async def send_with_timings(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.header:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        'Server-Timing',
+                        timings.header(perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            self.log(scope, status_code, perf_counter() - start, timings)
+
+    def log(
+            self,
+            scope,
+            status_code: int,
+            seconds: float,
+            timings: RequestTimings):
+        duration_ms = seconds * 1000
+        level = logging.WARNING if duration_ms >= self.slow_ms \
+            else logging.DEBUG
+        if not self.logger.isEnabledFor(level):
+            return
+        route = scope.get('route')
+        fields = timings.fields()
+        self.logger.log(
+            level,
+            "%s %s %d in %.1fms %s",
+            scope['method'], scope['path'], status_code, duration_ms, fields,
+            extra={
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': getattr(route, 'path', None),
+                'status_code': status_code,
+                'duration_ms': round(duration_ms, 3),
+                'timings': fields,
+            }
+        )
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from api.schemas import InputItem
+
+# Values used to build the dummy prediction of each input type
+DUMMY_VALUES = {
+    'int': 1,
+    'float': 1.0,
+    'bool': False,
+    'str': '',
+}
+
+
+def dummy_features(inputs: list[InputItem]) -> dict[str, Any]:
+    """
+    Build a valid set of features for a model from its inputs definition.
+    """
+    features = {}
+    for input_def in inputs:
+        if input_def.type == 'map':
+            features[input_def.lat] = 0.0
+            features[input_def.lng] = 0.0
+        elif input_def.type == 'categorical' and input_def.options:
+            features[input_def.column_name] = input_def.options[0]
+        elif input_def.type == 'categorical':
+            features[input_def.column_name] = DUMMY_VALUES['str']
+        else:
+            features[input_def.column_name] = DUMMY_VALUES.get(input_def.type)
+    return features
+
+
+class Popularity:
+    """
+    Counts the predictions made with each model. Counts are kept in memory
+    and merged into a json file when the API stops, so the next start can
+    preload the most used models.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, model_id: str, n: int = 1):
+        with self._lock:
+            self._counts[model_id] += n
+
+    def rank(self, model_ids: list[str], path: str) -> list[str]:
+        """
+        Sort `model_ids` from the most to the least used, considering the
+        counts saved in `path` and the ones of the current process.
+        """
+        counts = self.load(path)
+        with self._lock:
+            counts.update(self._counts)
+        return sorted(model_ids, key=lambda model_id: -counts[model_id])
+
+    def load(self, path: str) -> Counter:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return Counter(json.load(f))
+        except (OSError, ValueError):
+            return Counter()
+
+    def save(self, path: str):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        saved = self.load(path)
+        saved.update(counts)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f)
+        os.replace(tmp_path, path)
+
+
+def select_models(
+        setting: str,
+        model_ids: list[str],
+        ranked: Callable[[], list[str]]) -> list[str]:
+    """
+    Choose the models to preload.
+
+    Args:
+        setting (str): One of the following options:
+            - "": No model is preloaded.
+            - "all": Every registered model.
+            - "top:N": The N most used models.
+            - A comma separated list of model ids.
+        model_ids (list[str]): Ids of the registered models.
+        ranked (Callable[[], list[str]]): Returns the registered models
+        sorted by popularity.
+    """
+    setting = setting.strip()
+    if not setting:
+        return []
+    if setting == 'all':
+        return model_ids
+    if setting.startswith('top:'):
+        return ranked()[:int(setting.removeprefix('top:'))]
+    return [model_id.strip() for model_id in setting.split(',')]
+
+
+class WarmUp:
+    """
+    Loads and warms models in a background pool and keeps track of their
+    status, so the API can tell when it is ready to receive traffic. Models
+    that fail to warm up are reported but don't keep the API from being
+    ready, as they are loaded again on their first request.
+    """
+
+    def __init__(self):
+        self.pending: set[str] = set()
+        self.loaded: list[str] = []
+        self.failed: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def ready(self) -> bool:
+        return not self.pending
+
+    def start(
+            self,
+            model_ids: list[str],
+            warm_model: Callable[[str], None],
+            workers: int):
+        with self._lock:
+            self.pending.update(model_ids)
+        if not model_ids:
+            return
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='warmup')
+        for model_id in model_ids:
+            self._executor.submit(self._warm, model_id, warm_model)
+
+    def _warm(self, model_id: str, warm_model: Callable[[str], None]):
+        try:
+            warm_model(model_id)
+        except Exception as e:
+            with self._lock:
+                self.failed[model_id] = str(e)
+        else:
+            with self._lock:
+                self.loaded.append(model_id)
+        finally:
+            with self._lock:
+                self.pending.discard(model_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'ready': not self.pending,
+                'pending': sorted(self.pending),
+                'loaded': list(self.loaded),
+                'failed': dict(self.failed),
+            }
@@ -0,0 +1,131 @@
+"""
+Compares the catalog reads of each endpoint through `execute_with_pandas`
+(as the API did), through the row based `fetch_rows`/`fetch_row` with typed
+mappers and through the in-memory catalog index.
+
+It creates a temporary dev database, so it doesn't touch the one in DB_PATH.
+Run it from the project root:
+
+    python -m benchmarks.catalog_queries
+"""
+import json
+import os
+from tempfile import TemporaryDirectory
+from benchmarks.native_inference import time_calls
+from tests.conftest import standard_uuid
+
+
+def pandas_paths() -> dict:
+    from database.crud import execute_with_pandas
+    from database.queries import queries
+    from api.schemas import ModelItem, InputItem
+
+    def countries():
+        df = execute_with_pandas(queries['get_all_countries'])
+        return df['country'].to_list()
+
+    def cities():
+        df = execute_with_pandas(
+            queries['get_all_cities'], {'country': None})
+        df['city'] = df['city'] + ' (' + df['hierarchy'] + ')'
+        return dict(zip(df['city'], df['id']))
+
+    def models():
+        df = execute_with_pandas(
+            queries['get_models_from_city'].format(sort_by='mape'),
+            {'city_id': None})
+        df['links'] = df['links'].apply(lambda x: json.loads(x))
+        return [ModelItem(**m) for m in df.to_dict(orient='records')]
+
+    def model():
+        df = execute_with_pandas(
+            queries['get_model'], {'model_id': str(standard_uuid)})
+        df['links'] = df['links'].apply(lambda x: json.loads(x))
+        return ModelItem(**df.to_dict(orient='records')[0])
+
+    def inputs():
+        df = execute_with_pandas(
+            queries['get_inputs'], {'model_id': str(standard_uuid)})
+        df.drop('id', axis=1, inplace=True)
+        df['options'] = df['options'].apply(lambda x: json.loads(x))
+        return [InputItem(**i) for i in df.to_dict(orient='records')]
+
+    return {'countries': countries, 'cities': cities, 'models': models,
+            'model': model, 'inputs': inputs}
+
+
+def row_paths() -> dict:
+    from database.crud import fetch_rows, fetch_row
+    from database.queries import queries
+    from api.catalog import model_item_from_row, input_item_from_row
+
+    def cities():
+        return {
+            f"{row['city']} ({row['hierarchy']})": row['id']
+            for row in fetch_rows(
+                queries['get_all_cities'], {'country': None})
+        }
+
+    return {
+        'countries': lambda: fetch_rows(
+            queries['get_all_countries'], mapper=lambda row: row['country']),
+        'cities': cities,
+        'models': lambda: fetch_rows(
+            queries['get_models_from_city'].format(sort_by='mape'),
+            {'city_id': None}, mapper=model_item_from_row),
+        'model': lambda: fetch_row(
+            queries['get_model'], {'model_id': str(standard_uuid)},
+            mapper=model_item_from_row),
+        'inputs': lambda: fetch_rows(
+            queries['get_inputs'], {'model_id': str(standard_uuid)},
+            mapper=input_item_from_row),
+    }
+
+
+def index_paths() -> dict:
+    from api.catalog import load_catalog_index
+    from api.schemas import GetModelsCategory
+
+    index = load_catalog_index()
+    return {
+        'countries': lambda: index.countries,
+        'cities': lambda: index.get_cities('all'),
+        'models': lambda: index.get_models('all', GetModelsCategory.mape),
+        'model': lambda: index.get_model(str(standard_uuid)),
+        'inputs': lambda: index.get_inputs(str(standard_uuid)),
+    }
+
+
+def main(n: int = 1000):
+    with TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = f'{tmp}/benchmark.db'
+        os.environ['ENV'] = 'dev'
+        from database.init_db import init_db
+        init_db()
+
+        paths = {
+            'pandas': pandas_paths(),
+            'rows': row_paths(),
+            'index': index_paths(),
+        }
+        results = {
+            endpoint: {
+                name: time_calls(endpoints[endpoint], n)
+                for name, endpoints in paths.items()
+            }
+            for endpoint in paths['pandas']
+        }
+
+    print(f"{'endpoint':<12}" + ''.join(
+        f"{name + ' (µs)':>16}" for name in paths) + f"{'speedup':>10}")
+    for endpoint, times in results.items():
+        print(
+            f"{endpoint:<12}"
+            + ''.join(f"{value:>16.1f}" for value in times.values())
+            + f"{times['pandas'] / times['rows']:>9.1f}x"
+        )
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures the city autocomplete index on a synthetic catalog of 100k cities:
+the time to build it and the median time of prefix, word prefix, fuzzy and
+country filtered queries.
+
+It doesn't need the database. Run it from the project root:
+
+    python -m benchmarks.city_search
+"""
+import random
+from time import perf_counter
+from api.city_search import CitySearchIndex
+from benchmarks.native_inference import time_calls
+
+SYLLABLES = ['sa', 'o', 'jo', 'se', 'cam', 'pos', 'ri', 'be', 'lo', 'ho',
+             'ri', 'zon', 'te', 'ber', 'gen', 'os', 'lin', 'ton', 'ville',
+             'por', 'to', 'ale', 'gre', 'ma', 'na', 'us', 'tres', 'co']
+COUNTRIES = ['Brazil', 'England', 'Norway', 'United States', 'Mexico']
+
+
+def synthetic_cities(n: int, seed: int = 0) -> list[tuple]:
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(
+            rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))
+        ).capitalize()
+
+    return [
+        (
+            f'Q{i}',
+            ' '.join(word() for _ in range(rng.choice([1, 1, 1, 2, 3]))),
+            rng.choice(COUNTRIES),
+            word(),
+        )
+        for i in range(n)
+    ]
+
+
+def main(n_cities: int = 100_000, n: int = 1000):
+    cities = synthetic_cities(n_cities)
+
+    start = perf_counter()
+    index = CitySearchIndex(cities)
+    build = perf_counter() - start
+
+    name = cities[0][1]
+    queries = {
+        'prefix': lambda: index.search(name[:3]),
+        'word prefix': lambda: index.search('ville'),
+        'fuzzy': lambda: index.search(name[:4] + 'xq' + name[4:8]),
+        'country': lambda: index.search(name[:3], country='Norway'),
+    }
+    results = {query: time_calls(fn, n) for query, fn in queries.items()}
+
+    print(f"Built the index of {n_cities} cities in {build:.2f} s\n")
+    print(f"{'query':<16}{'median (µs)':>14}")
+    for query, value in results.items():
+        print(f"{query:<16}{value:>14.1f}")
+
+    results['build'] = build
+    return results
+
+
+if __name__ == '__main__':
+    main()
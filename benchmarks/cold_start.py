@@ -0,0 +1,132 @@
+"""
+Measures the cold start of the API in fresh processes: the time to import
+`api.api`, to answer `/ready` and to answer the first prediction (which pays
+for the lazy imports and the model load). It also prints the import-time
+breakdown of `api.api` from `python -X importtime`.
+
+It creates a temporary dev database and storage with the dev model, so it
+doesn't touch the ones in DB_PATH and STORAGE_PATH. Run it from the project
+root:
+
+    python -m benchmarks.cold_start
+"""
+import json
+import os
+import subprocess
+import sys
+import zipfile
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import numpy as np
+from tests.conftest import standard_uuid
+
+# Modules that should only be imported when a request needs them
+HEAVY_MODULES = ('mlflow', 'pandas', 'sklearn', 'pytest', 'tests.conftest')
+
+COLD_START_SCRIPT = """
+import json, sys, time
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+from api.api import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    client.get('/ready')
+    ready = time.perf_counter()
+    loaded = [m for m in {heavy_modules!r} if m in sys.modules]
+    response = client.post(
+        '/predict/{model_id}', json={{'features': {features!r}}})
+    response.raise_for_status()
+    predicted = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'ready': ready - start,
+    'first predict': predicted - ready,
+    'loaded': loaded,
+}}))
+"""
+
+
+def import_profile(env: dict, top: int = 15) -> list[tuple[str, int, int]]:
+    """
+    Returns the `top` modules imported by `api.api` that took the longest,
+    as (module, self µs, cumulative µs), sorted by cumulative time.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import api.api'],
+        env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line.split(':', 1)[1].split('|')
+        modules.append((name.strip(), int(self_time), int(cumulative)))
+    return sorted(modules, key=lambda m: m[2], reverse=True)[:top]
+
+
+def cold_start(env: dict, features: dict) -> dict:
+    script = COLD_START_SCRIPT.format(
+        heavy_modules=HEAVY_MODULES,
+        model_id=standard_uuid,
+        features=features)
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process'] = perf_counter() - start
+    return timings
+
+
+def main(n: int = 5, top: int = 15):
+    with TemporaryDirectory() as tmp:
+        storage_path = f'{tmp}/storage'
+        env = {
+            **os.environ,
+            'DB_PATH': f'{tmp}/benchmark.db',
+            'STORAGE_PATH': storage_path,
+            'ENV': 'dev',
+        }
+        with zipfile.ZipFile(f'./tests/data/{standard_uuid}.zip') as zip:
+            zip.extractall(f'{storage_path}/{standard_uuid}')
+        with open(f'{storage_path}/{standard_uuid}/model_metadata.json',
+                  encoding='utf-8') as f:
+            metadata = json.load(f)
+        # First test row, with bools stored as 0/1 converted back
+        row = metadata['x_test'][0]
+        features = {}
+        for i in metadata['inputs']:
+            if i['type'] == 'map':
+                features[i['lat']] = row[i['lat']]
+                features[i['lng']] = row[i['lng']]
+            elif i['type'] == 'bool':
+                features[i['column_name']] = bool(row[i['column_name']])
+            else:
+                features[i['column_name']] = row[i['column_name']]
+        subprocess.run(
+            [sys.executable, '-c', 'import database.init_db'],
+            env=env, check=True)
+
+        profile = import_profile(env, top)
+        runs = [cold_start(env, features) for _ in range(n)]
+
+    print(f"{'module':<40}{'self (ms)':>12}{'cumulative (ms)':>18}")
+    for name, self_time, cumulative in profile:
+        print(f"{name:<40}{self_time / 1000:>12.1f}{cumulative / 1000:>18.1f}")
+
+    results = {
+        phase: float(np.median([run[phase] for run in runs]))
+        for phase in ['import', 'ready', 'first predict', 'process']
+    }
+    print(f"\n{'phase':<20}{'median (s)':>12}")
+    for phase, value in results.items():
+        print(f"{phase:<20}{value:>12.3f}")
+    print(f"\nHeavy modules loaded before the first prediction: "
+          f"{runs[0]['loaded'] or 'none'}")
+
+    results['loaded'] = runs[0]['loaded']
+    results['profile'] = profile
+    return results
+
+
+if __name__ == '__main__':
+    main()
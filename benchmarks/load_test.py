@@ -0,0 +1,411 @@
+"""
+Load test of the API running in uvicorn: mixed traffic of catalog browsing
+and predictions at a fixed concurrency, reporting the requests per second
+and the p50/p95/p99 latency of each route.
+
+It creates a temporary storage with copies of the dev model under synthetic
+ids and a dev database with a synthetic catalog (cities, models and their
+inputs), so it doesn't touch the ones in DB_PATH and STORAGE_PATH. Run it
+from the project root:
+
+    python -m benchmarks.load_test --concurrency 32 --duration 30
+
+Save the results as the baseline with `--save-baseline`. Later runs with
+the same settings are compared with it and the script exits with status 1
+when a route had errors or its p95 latency or RPS got worse than the
+tolerance allows. Baselines depend on the machine, so save them where the
+comparison runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import uuid
+import zipfile
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+import httpx
+import numpy as np
+from tests.conftest import standard_uuid
+
+BASELINE_PATH = './benchmarks/baselines/load_test.json'
+
+# Relative weight of each kind of request in the traffic
+DEFAULT_MIX = {
+    'countries': 1,
+    'cities': 1,
+    'city_search': 2,
+    'models': 2,
+    'model': 1,
+    'inputs': 2,
+    'predict': 6,
+}
+
+COUNTRIES = ['Brazil', 'England', 'Norway', 'Portugal', 'Mexico']
+
+
+def model_features(metadata: dict) -> list[dict]:
+    """
+    Returns the features of each row of the model's test sample, with bools
+    (stored as 0/1) converted back. Rows with categories outside the input's
+    options (grouped by the model when it was trained) are skipped, since
+    the API refuses them.
+    """
+    rows = []
+    for row in metadata['x_test']:
+        features = {}
+        for i in metadata['inputs']:
+            if i['type'] == 'map':
+                features[i['lat']] = row[i['lat']]
+                features[i['lng']] = row[i['lng']]
+            elif i['type'] == 'bool':
+                features[i['column_name']] = bool(row[i['column_name']])
+            else:
+                features[i['column_name']] = row[i['column_name']]
+        if all(
+            features[i['column_name']] in i['options']
+            for i in metadata['inputs'] if i['type'] == 'categorical'
+        ):
+            rows.append(features)
+    return rows
+
+
+def create_catalog(env: dict, n_models: int, n_cities: int) -> tuple:
+    """
+    Create the dev database and storage of `env` plus `n_models` copies of
+    the dev model (same files and inputs, new ids) available in `n_cities`
+    synthetic cities.
+
+    Returns:
+        tuple[list[str], list[str], list[dict]]: Model ids, city ids and the
+        features of the dev model's test sample.
+    """
+    storage_path = env['STORAGE_PATH']
+    with zipfile.ZipFile(f'./tests/data/{standard_uuid}.zip') as zip:
+        zip.extractall(f'{storage_path}/{standard_uuid}')
+    with open(f'{storage_path}/{standard_uuid}/model_metadata.json',
+              encoding='utf-8') as f:
+        metadata = json.load(f)
+    subprocess.run(
+        [sys.executable, '-c', 'import database.init_db'],
+        env=env, check=True)
+
+    rng = random.Random(0)
+    model_ids = [str(standard_uuid)] + [
+        str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(n_models - 1)]
+    city_ids = [f'Q{900_000 + i}' for i in range(n_cities)]
+
+    # Import after setting DB_PATH, the connection reads it on each call
+    os.environ['DB_PATH'] = env['DB_PATH']
+    from database.connection import get_connection
+    with get_connection() as conn:
+        conn.executemany(
+            'INSERT INTO cities VALUES (?, ?, ?, ?)',
+            [
+                (city_id, f'Synthetic City {i}', rng.choice(COUNTRIES),
+                 f'Region {i % 50}')
+                for i, city_id in enumerate(city_ids)
+            ]
+        )
+        for model_id in model_ids[1:]:
+            os.symlink(
+                os.path.abspath(f'{storage_path}/{standard_uuid}'),
+                f'{storage_path}/{model_id}')
+            conn.execute(
+                'INSERT INTO models SELECT ?, flavor, r2, mae, mape, rmse, '
+                'algorithm, data_year, author, links FROM models '
+                'WHERE id = ?',
+                (model_id, str(standard_uuid)))
+            conn.execute(
+                'INSERT INTO inputs SELECT NULL, ?, column_name, lat, lng, '
+                'label, type, options, description, unit FROM inputs '
+                'WHERE models_id = ?',
+                (model_id, str(standard_uuid)))
+        conn.executemany(
+            'INSERT INTO model_city VALUES (NULL, ?, ?)',
+            [
+                (city_id, model_id)
+                for city_id in city_ids
+                for model_id in rng.sample(model_ids, min(3, len(model_ids)))
+            ]
+        )
+    return model_ids, city_ids, model_features(metadata)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(env: dict, port: int, workers: int) -> subprocess.Popen:
+    """
+    Start uvicorn and wait until `/ready` says the preloaded models are warm.
+    """
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api.api:app',
+         '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        env=env)
+    for _ in range(600):
+        if server.poll() is not None:
+            raise RuntimeError('The API stopped before being ready.')
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/ready').status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        sleep(0.1)
+    server.terminate()
+    raise RuntimeError('The API was not ready in 60 seconds.')
+
+
+def request_factory(model_ids, city_ids, features, mix: dict, seed: int):
+    """
+    Returns a function that draws the next request as (route, method, url,
+    json body) following the weights of `mix`.
+    """
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+
+    def next_request():
+        kind = rng.choices(kinds, weights)[0]
+        model_id = rng.choice(model_ids)
+        if kind == 'countries':
+            return '/countries/', 'GET', '/countries/', None
+        if kind == 'cities':
+            return ('/cities/', 'GET',
+                    f'/cities/?country={rng.choice(COUNTRIES)}', None)
+        if kind == 'city_search':
+            query = f'synthetic city {rng.randrange(len(city_ids))}'
+            return ('/cities/search', 'GET',
+                    f'/cities/search?q={query[:rng.randint(3, len(query))]}',
+                    None)
+        if kind == 'models':
+            return ('/models/', 'GET',
+                    f'/models/?city={rng.choice(city_ids)}&sortBy=mape', None)
+        if kind == 'model':
+            return '/model/{model_id}', 'GET', f'/model/{model_id}', None
+        if kind == 'inputs':
+            return '/inputs/{model_id}', 'GET', f'/inputs/{model_id}', None
+        return ('/predict/{model_id}', 'POST', f'/predict/{model_id}',
+                {'features': rng.choice(features)})
+
+    return next_request
+
+
+async def run_load(
+        base_url: str,
+        next_request,
+        concurrency: int,
+        duration: float,
+        warmup: float) -> tuple[dict, float]:
+    """
+    Send requests from `concurrency` clients for `warmup` + `duration`
+    seconds, keeping the latencies of the requests sent after the warm-up.
+
+    Returns:
+        tuple[dict, float]: Latencies in seconds and number of errors of
+        each route, and the measured duration.
+    """
+    results: dict[str, dict] = {}
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=60) as client:
+        start = perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while perf_counter() < stop_at:
+                route, method, url, body = next_request()
+                sent = perf_counter()
+                try:
+                    response = await client.request(method, url, json=body)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                done = perf_counter()
+                if sent < measure_from:
+                    continue
+                route_results = results.setdefault(
+                    route, {'latencies': [], 'errors': 0})
+                route_results['latencies'].append(done - sent)
+                route_results['errors'] += failed
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, perf_counter() - measure_from
+
+
+def summarize(results: dict, elapsed: float) -> dict:
+    summary = {}
+    all_latencies = []
+    for route, route_results in sorted(results.items()):
+        latencies = np.array(route_results['latencies']) * 1000
+        all_latencies.extend(latencies)
+        summary[route] = {
+            'requests': len(latencies),
+            'errors': route_results['errors'],
+            'rps': len(latencies) / elapsed,
+            **{
+                f'p{p}': float(np.percentile(latencies, p))
+                for p in (50, 95, 99)
+            },
+        }
+    summary['total'] = {
+        'requests': len(all_latencies),
+        'errors': sum(r['errors'] for r in results.values()),
+        'rps': len(all_latencies) / elapsed,
+        **{
+            f'p{p}': float(np.percentile(all_latencies, p))
+            for p in (50, 95, 99)
+        },
+    }
+    return summary
+
+
+def print_summary(summary: dict):
+    print(f"{'route':<22}{'requests':>10}{'errors':>8}{'rps':>10}"
+          f"{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}")
+    for route, r in summary.items():
+        print(f"{route:<22}{r['requests']:>10}{r['errors']:>8}"
+              f"{r['rps']:>10.1f}{r['p50']:>11.2f}{r['p95']:>11.2f}"
+              f"{r['p99']:>11.2f}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Returns the regressions of `summary` against `baseline`: routes whose
+    p95 latency grew or whose RPS dropped more than `tolerance` (a fraction
+    of the baseline value), or that had errors.
+    """
+    regressions = []
+    for route, expected in baseline.items():
+        result = summary.get(route)
+        if result is None:
+            continue
+        if result['p95'] > expected['p95'] * (1 + tolerance):
+            regressions.append(
+                f"{route}: p95 {result['p95']:.2f}ms > "
+                f"{expected['p95']:.2f}ms baseline")
+        if result['rps'] < expected['rps'] * (1 - tolerance):
+            regressions.append(
+                f"{route}: {result['rps']:.1f} rps < "
+                f"{expected['rps']:.1f} rps baseline")
+        if result['errors']:
+            regressions.append(f"{route}: {result['errors']} errors")
+    return regressions
+
+
+def parse_mix(text: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, text.split(',')):
+        kind, weight = item.split('=')
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind {kind}.")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Clients sending requests at the same time.')
+    parser.add_argument('--duration', type=float, default=20,
+                        help='Seconds measured.')
+    parser.add_argument('--warmup', type=float, default=3,
+                        help='Seconds of traffic sent before measuring.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='uvicorn workers.')
+    parser.add_argument('--models', type=int, default=5,
+                        help='Models in the synthetic catalog.')
+    parser.add_argument('--cities', type=int, default=1000,
+                        help='Cities in the synthetic catalog.')
+    parser.add_argument('--mix', default='',
+                        help='Weights of the request kinds, e.g. '
+                        '"predict=10,countries=0". Kinds: '
+                        f'{", ".join(DEFAULT_MIX)}.')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='JSON file with the baseline results.')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Save the results as the baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed regression as a fraction of the '
+                        'baseline.')
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+    # Results are only comparable with a baseline of the same traffic
+    settings = {
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'models': args.models,
+        'cities': args.cities,
+        'mix': mix,
+    }
+
+    with TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            'DB_PATH': f'{tmp}/load_test.db',
+            'STORAGE_PATH': f'{tmp}/storage',
+            'MODEL_FOLDER_NAME': os.getenv('MODEL_FOLDER_NAME', 'model'),
+            'ENV': 'dev',
+            # The predictions cycle through the test sample, so with the
+            # cache nearly all of them would be cache hits
+            'PREDICTION_CACHE_SIZE': '0',
+        }
+        if args.workers > 1:
+            os.makedirs(f'{tmp}/metrics')
+            env['PROMETHEUS_MULTIPROC_DIR'] = f'{tmp}/metrics'
+        model_ids, city_ids, features = create_catalog(
+            env, args.models, args.cities)
+        # Only the models with files, the other dev models would fail to
+        # warm up and keep the API from being ready
+        env['PRELOAD_MODELS'] = ','.join(model_ids)
+
+        port = free_port()
+        server = start_server(env, port, args.workers)
+        try:
+            next_request = request_factory(
+                model_ids, city_ids, features, mix, seed=0)
+            results, elapsed = asyncio.run(run_load(
+                f'http://127.0.0.1:{port}', next_request,
+                args.concurrency, args.duration, args.warmup))
+        finally:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': summary}, f, indent=2)
+        print(f"\nSaved the baseline in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline in {args.baseline}, use --save-baseline.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['settings'] != settings:
+        print(f"\nThe baseline was measured with {baseline['settings']}, "
+              f"run it with the same settings or save a new baseline.")
+        return 2
+    regressions = compare(summary, baseline['results'], args.tolerance)
+    if regressions:
+        print("\nRegressions:\n" + '\n'.join(regressions))
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Microbenchmarks of the API's hot functions: input validation by number of
+inputs, `prepare_sql_values` of the ingestion by number of cities and
+inputs, each `database.crud` function and the `get_models`, `get_inputs`
+and `predict` handlers called in-process.
+
+Each run appends the best-of-5 mean time of every benchmark to a history
+file (one JSON object per line, with the commit it ran on) and compares it
+with the last run of another commit, so each optimization can be checked
+in isolation. It creates a temporary dev database and storage with the dev
+model, so it doesn't touch the ones in DB_PATH and STORAGE_PATH. Run it
+from the project root:
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter crud --against 1a2b3c4
+
+Benchmarks of packages that can't be imported are skipped, so run it in the
+api service for the validation and handler benchmarks and in the
+mlflow_client service for the ingestion ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import zipfile
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Optional
+
+HISTORY_PATH = './benchmarks/history/micro.jsonl'
+
+INPUT_COUNTS = (5, 20, 100)
+CITY_COUNTS = (1, 100, 1000)
+INGESTION_INPUT_COUNTS = (5, 50)
+
+# Types of the synthetic inputs, in turns
+INPUT_TYPES = ('int', 'float', 'bool', 'categorical', 'map')
+
+
+def time_calls(fn: Callable, n: int, repeat: int = 5) -> float:
+    """
+    Returns the best-of-`repeat` mean time of a call of `fn` in
+    microseconds: the mean of the fastest of `repeat` rounds of `n` calls,
+    which filters out noise from other processes.
+    """
+    fn()
+    rounds = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(n):
+            fn()
+        rounds.append((perf_counter() - start) / n)
+    return min(rounds) * 1e6
+
+
+def synthetic_input_dicts(n: int) -> tuple[list[dict], dict]:
+    """
+    Returns `n` inputs of mixed types, as the dicts of the model metadata,
+    and valid features for them.
+    """
+    inputs = []
+    features = {}
+    for i in range(n):
+        input_type = INPUT_TYPES[i % len(INPUT_TYPES)]
+        column = f'column_{i}'
+        item = {
+            'models_id': 'benchmark',
+            'column_name': column,
+            'lat': f'{column}_lat' if input_type == 'map' else None,
+            'lng': f'{column}_lng' if input_type == 'map' else None,
+            'label': column,
+            'type': input_type,
+            'options': [f'option_{j}' for j in range(20)]
+            if input_type == 'categorical' else [],
+            'description': None,
+            'unit': None,
+        }
+        inputs.append(item)
+        if input_type == 'map':
+            features[item['lat']] = -23.2
+            features[item['lng']] = -45.9
+        else:
+            features[column] = {
+                'int': 3, 'float': 90.5, 'bool': True,
+                'categorical': 'option_19'}[input_type]
+    return inputs, features
+
+
+def synthetic_inputs(n: int) -> tuple[list, dict]:
+    """
+    Returns `n` inputs of mixed types and valid features for them.
+    """
+    from api.schemas import InputItem
+
+    inputs, features = synthetic_input_dicts(n)
+    return [InputItem(**item) for item in inputs], features
+
+
+def synthetic_metadata(n_cities: int, n_inputs: int) -> dict:
+    inputs, _ = synthetic_input_dicts(n_inputs)
+    return {
+        'id': 'benchmark',
+        'flavor': 'sklearn',
+        'r2': .8, 'mae': 1000., 'mape': .1, 'rmse': 2000.,
+        'algorithm': 'regression',
+        'data_year': 2024,
+        'author': 'Benchmark',
+        'links': {'Github': 'https://github.com/'},
+        'cities': [
+            {'wikidata_id': f'Q{i}', 'name': f'City {i}',
+             'country': 'Brazil', 'hierarchy': 'São Paulo'}
+            for i in range(n_cities)
+        ],
+        'inputs': [
+            {key: value for key, value in item.items() if key != 'models_id'}
+            for item in inputs
+        ],
+    }
+
+
+def validation_benchmarks() -> dict[str, Callable]:
+    from api.schemas import validate_input_data, create_features_model
+
+    benchmarks = {}
+    for n in INPUT_COUNTS:
+        inputs, features = synthetic_inputs(n)
+        validator = create_features_model('benchmark', inputs)
+        benchmarks[f'validate_input_data[{n} inputs]'] = \
+            lambda inputs=inputs, features=features: \
+            validate_input_data(inputs, features)
+        benchmarks[f'compiled_validator[{n} inputs]'] = \
+            lambda validator=validator, features=features: \
+            validator.model_validate(features)
+    return benchmarks
+
+
+def ingestion_benchmarks() -> dict[str, Callable]:
+    from mlflow_client.ingestion import prepare_sql_values
+
+    return {
+        f'prepare_sql_values[{cities} cities, {inputs} inputs]':
+            lambda metadata=synthetic_metadata(cities, inputs):
+            prepare_sql_values(metadata)
+        for cities in CITY_COUNTS
+        for inputs in INGESTION_INPUT_COUNTS
+    }
+
+
+def crud_benchmarks(model_id: str) -> dict[str, Callable]:
+    from database import crud
+    from database.queries import queries
+
+    params = {'model_id': model_id}
+    city = ('Q-benchmark', 'Benchmark', 'Brazil', 'São Paulo')
+    return {
+        'crud.fetch_all': lambda: crud.fetch_all(
+            queries['get_inputs'], params),
+        'crud.fetch_one': lambda: crud.fetch_one(
+            queries['get_model'], params),
+        'crud.fetch_rows': lambda: crud.fetch_rows(
+            queries['get_inputs'], params),
+        'crud.fetch_row': lambda: crud.fetch_row(
+            queries['get_model'], params),
+        'crud.fetch_value': lambda: crud.fetch_value(
+            queries['get_catalog_version']),
+        'crud.execute_with_pandas': lambda: crud.execute_with_pandas(
+            queries['get_inputs'], params),
+        'crud.execute_query': lambda: crud.execute_query(
+            'INSERT OR REPLACE INTO cities VALUES (?, ?, ?, ?)', city),
+        'crud.execute_many': lambda: crud.execute_many(
+            'INSERT OR REPLACE INTO cities VALUES (?, ?, ?, ?)', [city] * 10),
+    }
+
+
+def handler_benchmarks(model_id: str, features: dict) -> dict[str, Callable]:
+    from fastapi import Response
+    from api import api
+    from api.schemas import GetModelsCategory, PredictRequest
+
+    loop = asyncio.new_event_loop()
+    request = PredictRequest(features=features)
+
+    def predict_uncached():
+        api.prediction_cache.clear()
+        return loop.run_until_complete(api.predict(request, model_id))
+
+    return {
+        'handler.get_models': lambda: loop.run_until_complete(
+            api.get_models(Response(), 'all', GetModelsCategory.mape)),
+        'handler.get_inputs': lambda: loop.run_until_complete(
+            api.get_inputs(Response(), model_id)),
+        'handler.predict[cached]': lambda: loop.run_until_complete(
+            api.predict(request, model_id)),
+        'handler.predict[uncached]': predict_uncached,
+    }
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def read_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_previous(
+        history: list[dict],
+        commit: str,
+        against: Optional[str]) -> Optional[dict]:
+    """
+    Returns the last run of the commit `against` (a prefix of it) or, when
+    None, the last run of a commit other than `commit`.
+    """
+    for run in reversed(history):
+        if against is not None:
+            if run['commit'].startswith(against):
+                return run
+        elif run['commit'] != commit:
+            return run
+    return None
+
+
+def print_results(results: dict, previous: Optional[dict]):
+    header = f"{'benchmark':<50}{'best mean (µs)':>16}"
+    if previous is not None:
+        header += f"{previous['commit'] + ' (µs)':>20}{'change':>10}"
+    print(header)
+    for name, value in results.items():
+        line = f"{name:<50}{value:>16.2f}"
+        before = previous['results'].get(name) if previous else None
+        if before:
+            line += f"{before:>20.2f}{(value / before - 1) * 100:>+9.1f}%"
+        print(line)
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--filter', default='',
+                        help='Only run benchmarks whose name has this text.')
+    parser.add_argument('-n', type=int, default=200,
+                        help='Calls per round of each benchmark.')
+    parser.add_argument('--history', default=HISTORY_PATH,
+                        help='JSON lines file with the results of each run.')
+    parser.add_argument('--against', default=None,
+                        help='Commit to compare with (default: the last run '
+                        'of another commit).')
+    parser.add_argument('--no-save', action='store_true',
+                        help="Don't append the results to the history.")
+    args = parser.parse_args(argv)
+
+    with TemporaryDirectory() as tmp:
+        os.environ.update({
+            'DB_PATH': f'{tmp}/benchmark.db',
+            'STORAGE_PATH': f'{tmp}/storage',
+            'MODEL_FOLDER_NAME': os.getenv('MODEL_FOLDER_NAME', 'model'),
+            'ENV': 'dev',
+        })
+        from tests.conftest import standard_uuid
+        model_id = str(standard_uuid)
+        with zipfile.ZipFile(f'./tests/data/{model_id}.zip') as zip:
+            zip.extractall(f'{tmp}/storage/{model_id}')
+        with open(f'{tmp}/storage/{model_id}/model_metadata.json',
+                  encoding='utf-8') as f:
+            row = json.load(f)['x_test'][0]
+        features = {
+            'rooms': row['rooms'],
+            'parking': row['parking'],
+            'bathrooms': row['bathrooms'],
+            'area': row['area'],
+            'has_multiple_parking_spaces':
+                bool(row['has_multiple_parking_spaces']),
+            'neighbourhood': 'Jardim Esplanada',
+            'lat_value': row['lat_value'],
+            'lon_value': row['lon_value'],
+        }
+        from database.init_db import init_db
+        init_db()
+
+        groups = {
+            'validation': validation_benchmarks,
+            'ingestion': ingestion_benchmarks,
+            'crud': lambda: crud_benchmarks(model_id),
+            'handler': lambda: handler_benchmarks(model_id, features),
+        }
+        benchmarks = {}
+        for group, build in groups.items():
+            # Each service only ships some packages: the api one has no
+            # mlflow_client and the mlflow_client one has no api
+            try:
+                benchmarks.update(build())
+            except ImportError as e:
+                print(f"Skipping the {group} benchmarks: {e}")
+        results = {
+            name: time_calls(fn, args.n)
+            for name, fn in benchmarks.items() if args.filter in name
+        }
+
+    commit = git_commit()
+    history = read_history(args.history)
+    print_results(results, find_previous(history, commit, args.against))
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'commit': commit,
+                'date': datetime.now(timezone.utc).isoformat(
+                    timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.node(),
+                'results': results,
+            }) + '\n')
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares the time of a single row prediction of the dev model through the
+pyfunc wrapper (building the frame with `pd.DataFrame([features])`, as the
+API did) and through its native estimator.
+
+Run it from the project root:
+
+    python -m benchmarks.native_inference
+"""
+import json
+import zipfile
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import mlflow.pyfunc
+import numpy as np
+import pandas as pd
+from api.native import load_native_model
+from tests.conftest import standard_uuid
+
+
+def time_calls(fn, n: int) -> float:
+    """
+    Returns the median time of `n` calls of `fn` in microseconds.
+    """
+    fn()
+    times = []
+    for _ in range(n):
+        start = perf_counter()
+        fn()
+        times.append(perf_counter() - start)
+    return float(np.median(times)) * 1e6
+
+
+def main(n: int = 1000):
+    with TemporaryDirectory() as tmp:
+        with zipfile.ZipFile(f'./tests/data/{standard_uuid}.zip') as zip:
+            zip.extractall(tmp)
+        with open(f'{tmp}/model_metadata.json', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        pyfunc = mlflow.pyfunc.load_model(f'{tmp}/model')
+        native = load_native_model(
+            f'{tmp}/model', metadata['flavor'], metadata['inputs'])
+
+    row = {column: metadata['x_test'][0][column] for column in native.dtypes}
+
+    pyfunc_time = time_calls(lambda: pyfunc.predict(pd.DataFrame([row])), n)
+    native_time = time_calls(lambda: native.predict([row]), n)
+    estimator_time = time_calls(
+        lambda: native.estimator.predict(native.frame([row])), n)
+    dataframe_time = time_calls(lambda: pd.DataFrame([row]), n)
+    frame_time = time_calls(lambda: native.frame([row]), n)
+
+    results = {
+        'pyfunc + pd.DataFrame': pyfunc_time,
+        'native': native_time,
+        'estimator only': estimator_time,
+        'pd.DataFrame([features])': dataframe_time,
+        'NativeModel.frame': frame_time,
+        'overhead saved per call': pyfunc_time - native_time,
+    }
+    print(f"{'path':<30}{'median (µs)':>12}")
+    for name, value in results.items():
+        print(f"{name:<30}{value:>12.1f}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
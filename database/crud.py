@@ -1,29 +1,100 @@
-import pandas as pd
+import sqlite3
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Optional, TypeVar
 from database.connection import get_connection
 
+T = TypeVar('T')
+
+# Called with each query and its duration in seconds (connection included),
+# e.g. by the API to report the time spent in SQLite per request
+query_listeners: list[Callable[[str, float], None]] = []
+
+
+@contextmanager
+def timed_query(query):
+    if not query_listeners:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        for listener in query_listeners:
+            listener(query, seconds)
+
 def fetch_all(query, params=()):
-    with get_connection() as conn:
+    with timed_query(query), get_connection() as conn:
         c = conn.execute(query, params)
         return c.fetchall()
 
 
 def fetch_one(query, params=()):
-    with get_connection() as conn:
+    with timed_query(query), get_connection() as conn:
         c = conn.execute(query, params)
         return c.fetchone()
 
 
 def execute_query(query, params=()):
-    with get_connection() as conn:
+    with timed_query(query), get_connection() as conn:
         conn.execute(query, params)
 
 
 def execute_many(query, param_list):
-    with get_connection() as conn:
+    with timed_query(query), get_connection() as conn:
         conn.executemany(query, param_list)
 
 
 def execute_with_pandas(query, params=()):
-    with get_connection() as conn:
+    # pandas is slow to import and most callers don't need it
+    import pandas as pd
+    with timed_query(query), get_connection() as conn:
         res = pd.read_sql_query(query, params=params, con=conn)
-        return res
\ No newline at end of file
+        return res
+
+
+def fetch_rows(
+        query,
+        params=(),
+        mapper: Callable[[sqlite3.Row], T] = dict) -> list[T]:
+    """
+    Run a query without pandas and map each row with `mapper`.
+
+    Args:
+        query (str): SQL query.
+        params (tuple | dict): Query parameters.
+        mapper (Callable[[sqlite3.Row], T]): Function that receives each row
+        (indexable by column name) and returns the result item. Rows are
+        returned as dicts by default.
+
+    Returns:
+        list[T]: One mapped item per row.
+    """
+    with timed_query(query), get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.execute(query, params)
+        return [mapper(row) for row in c.fetchall()]
+
+
+def fetch_row(
+        query,
+        params=(),
+        mapper: Callable[[sqlite3.Row], T] = dict) -> Optional[T]:
+    """
+    Same as `fetch_rows`, for a single row. Returns None when the query has
+    no results.
+    """
+    with timed_query(query), get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(query, params).fetchone()
+        return None if row is None else mapper(row)
+
+
+def fetch_value(query, params=()) -> Any:
+    """
+    Returns the first column of the first row of a query, or None when it
+    has no results.
+    """
+    row = fetch_one(query, params)
+    return None if row is None else row[0]
@@ -36,18 +36,19 @@ def init_db(
             table_exists= False
             has_data= False
 
-    if not table_exists:
-        with open(schema_path) as f:
-            schema = f.read()
-
-        with get_connection() as conn:
-            c = conn.cursor()
-            c.executescript(schema)
-
-            if not has_data and is_dev:
-                with open(data_path) as f:
-                    data = f.read()
-                c.executescript(data)
+    # The schema only creates missing tables, so it also upgrades databases
+    # created before a table was added
+    with open(schema_path) as f:
+        schema = f.read()
+
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.executescript(schema)
+
+        if not table_exists and not has_data and is_dev:
+            with open(data_path) as f:
+                data = f.read()
+            c.executescript(data)
 
 
 init_db()
\ No newline at end of file
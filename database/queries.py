@@ -34,6 +34,40 @@ SELECT *
 FROM inputs
 WHERE models_id = :model_id
 ORDER BY type
+""",
+
+    'get_catalog_models': """
+SELECT id, flavor, r2, mae, mape, rmse, algorithm, data_year, author, links
+FROM models
+""",
+
+    'get_catalog_cities': """
+SELECT id, city, country, hierarchy
+FROM cities
+ORDER BY city
+""",
+
+    'get_catalog_model_city': """
+SELECT cities_id, models_id
+FROM model_city
+""",
+
+    'get_catalog_inputs': """
+SELECT models_id, column_name, lat, lng, label, type, options, description,
+    unit
+FROM inputs
+""",
+
+    'get_catalog_version': """
+SELECT version
+FROM catalog
+WHERE id = 1
+""",
+
+    'bump_catalog_version': """
+UPDATE catalog
+SET version = version + 1
+WHERE id = 1
 """,
 
     'test_fetch_query': """
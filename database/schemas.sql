@@ -38,4 +38,13 @@ CREATE TABLE IF NOT EXISTS inputs (
     description TEXT,
     unit TEXT,
     FOREIGN KEY(models_id) REFERENCES models(id)
-);
\ No newline at end of file
+);
+
+-- Single row bumped by every ingestion, used by the API to know when the
+-- catalog changed
+CREATE TABLE IF NOT EXISTS catalog (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO catalog VALUES (1, 0);
\ No newline at end of file
@@ -0,0 +1,177 @@
+import importlib
+import json
+import numpy as np
+import pandas as pd
+from mlflow_client.config import MODEL_FOLDER_NAME, COMPILED_MODEL_NAME
+
+# Maximum relative difference accepted between the compiled and the MLflow
+# predictions of the test sample. ONNX trees and linear models run in float32.
+COMPILED_RTOL = 1e-4
+
+
+def get_input_columns(inputs: list[dict]) -> list[str]:
+    """
+    Returns the columns of the model's inputs, the only ones the API
+    receives. Map inputs have a latitude and a longitude column.
+    """
+    columns = []
+    for model_input in inputs:
+        if model_input['type'] == 'map':
+            columns += [model_input['lat'], model_input['lng']]
+        else:
+            columns.append(model_input['column_name'])
+    return columns
+
+
+def get_model_columns(model, input_columns: list[str]) -> list[str]:
+    """
+    Returns the columns the model was trained with, in order, or the input
+    columns when the model doesn't store them.
+
+    Raises:
+        ValueError: The model was trained with columns that aren't inputs
+        (e.g. derived by a feature engineering step), which the API can't
+        feed to the compiled model.
+    """
+    columns = getattr(model, 'feature_names_in_', None)
+    if columns is None:
+        return list(input_columns)
+    missing = [column for column in columns if column not in input_columns]
+    if missing:
+        raise ValueError(f"Columns without an input: {missing}")
+    return list(columns)
+
+
+def selects_columns(model) -> bool:
+    """
+    Check if a scikit-learn model starts by selecting columns by name.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(model, Pipeline):
+        model = model.steps[0][1]
+    return isinstance(model, ColumnTransformer)
+
+
+def compiled_feed(
+        x: pd.DataFrame,
+        columns: list[str],
+        layout: str) -> dict[str, np.ndarray]:
+    """
+    Build the inputs of a compiled model from a DataFrame.
+
+    Args:
+        x (pd.DataFrame): Rows to predict.
+        columns (list[str]): Columns of the model, in order.
+        layout (str): "columns" for one [n, 1] tensor per column (string
+        columns stay as strings) or "matrix" for a single float [n, m]
+        tensor named "input".
+
+    Returns:
+        dict[str, np.ndarray]: Tensors by input name.
+    """
+    if layout == 'matrix':
+        return {'input': x[columns].to_numpy(dtype=np.float32)}
+    return {
+        column: x[column].to_numpy(
+            dtype=object if x[column].dtype == object else np.float32
+        ).reshape(-1, 1)
+        for column in columns
+    }
+
+
+def convert_to_onnx(
+        model,
+        flavor: str,
+        x_test: pd.DataFrame,
+        input_columns: list[str]):
+    """
+    Convert a model loaded with its own MLflow flavor to ONNX. Only the
+    sklearn flavor is supported.
+
+    Scikit-learn models starting with a ColumnTransformer get one input per
+    column, so encoders keep receiving strings. Other models only take
+    numeric features and get a single matrix input.
+
+    The column order and input layout are stored in the model's metadata
+    props, the API reads them to build its inputs.
+
+    Raises:
+        ValueError: The flavor can't be compiled or the model needs columns
+        that aren't inputs.
+    """
+    columns = get_model_columns(model, input_columns)
+
+    match flavor:
+        case 'sklearn':
+            from skl2onnx import to_onnx
+            from skl2onnx.common.data_types import FloatTensorType, \
+                StringTensorType
+            if selects_columns(model):
+                layout = 'columns'
+                initial_types = [
+                    (column, StringTensorType([None, 1]))
+                    if x_test[column].dtype == object
+                    else (column, FloatTensorType([None, 1]))
+                    for column in columns
+                ]
+            else:
+                layout = 'matrix'
+                initial_types = [
+                    ('input', FloatTensorType([None, len(columns)]))]
+            onnx_model = to_onnx(model, initial_types=initial_types)
+        case _:
+            raise ValueError(f"Flavor {flavor} can't be compiled.")
+
+    props = {'columns': json.dumps(columns), 'layout': layout}
+    for key, value in props.items():
+        prop = onnx_model.metadata_props.add()
+        prop.key, prop.value = key, value
+    return onnx_model
+
+
+def compile_model(model_dir: str, model_metadata: dict):
+    """
+    Convert the MLflow model inside `model_dir` to ONNX and save it as
+    `COMPILED_MODEL_NAME` next to the MLflow model folder.
+
+    The compiled model is only saved if it predicts the same values as the
+    MLflow model for the test sample of the metadata, with both models only
+    getting the columns of the model's inputs, like in the API.
+
+    Args:
+        model_dir (str): Folder with the MLflow model folder and metadata.
+        model_metadata (dict): Metadata of the model.
+
+    Raises:
+        ValueError: The model can't be compiled or the compiled model
+        predicts different values.
+    """
+    import mlflow
+    import onnxruntime as ort
+
+    model_path = f'{model_dir}/{MODEL_FOLDER_NAME}'
+    flavor = model_metadata['flavor']
+    input_columns = get_input_columns(model_metadata['inputs'])
+    x_test = pd.DataFrame(model_metadata['x_test'])[input_columns]
+
+    module = importlib.import_module(f'mlflow.{flavor}')
+    model = module.load_model(model_path)
+    onnx_model = convert_to_onnx(model, flavor, x_test, input_columns)
+
+    props = {prop.key: prop.value for prop in onnx_model.metadata_props}
+    columns = json.loads(props['columns'])
+    expected = np.ravel(mlflow.pyfunc.load_model(model_path).predict(x_test))
+
+    session = ort.InferenceSession(
+        onnx_model.SerializeToString(), providers=['CPUExecutionProvider'])
+    output = session.get_outputs()[0].name
+    predicted = np.ravel(session.run(
+        [output], compiled_feed(x_test, columns, props['layout']))[0])
+
+    if not np.allclose(predicted, expected, rtol=COMPILED_RTOL):
+        raise ValueError("Compiled model differs from the MLflow model.")
+
+    with open(f'{model_dir}/{COMPILED_MODEL_NAME}', 'wb') as f:
+        f.write(onnx_model.SerializeToString())
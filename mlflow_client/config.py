@@ -1,3 +1,4 @@
 MODEL_FOLDER_NAME='model'
 MODEL_JSON_NAME='model_metadata.json'
+COMPILED_MODEL_NAME='model.onnx'
 DEV_FOLDER_PATH='./model_development'
\ No newline at end of file
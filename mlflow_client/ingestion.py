@@ -4,7 +4,9 @@ import zipfile
 import json
 from tempfile import TemporaryDirectory
 from database.connection import get_connection
+from database.queries import queries
 from mlflow_client.config import MODEL_JSON_NAME
+from mlflow_client.compilation import compile_model
 
 
 def should_ingest():
@@ -93,6 +95,7 @@ def prepare_sql_values(model_metadata):
 
 def make_ingestion():
     STORAGE_PATH = os.getenv('STORAGE_PATH')
+    COMPILE_MODELS = os.getenv('COMPILE_MODELS', 'true').lower() == 'true'
 
     file_path, model_id = should_ingest()
     # Unzip file
@@ -109,6 +112,14 @@ def make_ingestion():
             as f:
             model_metadata = json.load(f)
 
+        # Save an ONNX version of the model next to it when possible. The
+        # API keeps using the MLflow model when it is missing.
+        if COMPILE_MODELS:
+            try:
+                compile_model(extraction_path, model_metadata)
+            except Exception as e:
+                print(f"Model {model_id} was not compiled: {e}")
+
         model_table_values, city_table_values, \
         model_city_values, inputs_table_values = \
             prepare_sql_values(model_metadata)
@@ -144,6 +155,8 @@ def make_ingestion():
                         "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                         model_input
                     )
+                # Let the API know the catalog changed
+                c.execute(queries['bump_catalog_version'])
                 
                 # Move model folder to storage
                 shutil.move(extraction_path, STORAGE_PATH)
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from api.admission import ConcurrencyLimit, AdmissionControl, \
+    AdmissionRejectedError
+
+
+def test_concurrency_limit_queues_in_order():
+    async def run():
+        limit = ConcurrencyLimit('test', 1, 2, 1)
+        order = []
+
+        async def request(name):
+            await limit.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limit.release()
+
+        await asyncio.gather(request('a'), request('b'), request('c'))
+        return limit, order
+
+    limit, order = asyncio.run(run())
+    assert order == ['a', 'b', 'c']
+    assert limit.active == 0
+    assert limit.stats()['admitted'] == 3
+
+
+def test_concurrency_limit_rejects_when_queue_full():
+    async def run():
+        limit = ConcurrencyLimit('test', 1, 1, 1)
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as e:
+            await limit.acquire()
+        limit.release()
+        await waiter
+        limit.release()
+        return limit, e.value
+
+    limit, error = asyncio.run(run())
+    assert error.reason == 'queue_full'
+    assert limit.queue_full == 1
+    assert limit.active == 0
+
+
+def test_concurrency_limit_rejects_after_timeout():
+    async def run():
+        limit = ConcurrencyLimit('test', 1, 5, 0.01)
+        await limit.acquire()
+        with pytest.raises(AdmissionRejectedError) as e:
+            await limit.acquire()
+        # The slot isn't handed to the request that gave up
+        limit.release()
+        return limit, e.value
+
+    limit, error = asyncio.run(run())
+    assert error.reason == 'timeout'
+    assert limit.timeouts == 1
+    assert limit.active == 0
+    assert limit.waiting == 0
+
+
+def test_concurrency_limit_disabled():
+    async def run():
+        limit = ConcurrencyLimit('test', 0, 0, 1)
+        for _ in range(10):
+            await limit.acquire()
+        return limit
+
+    limit = asyncio.run(run())
+    assert limit.active == 0
+    assert limit.admitted == 10
+
+
+def test_admission_control_per_model():
+    rejections = []
+
+    async def run():
+        admission = AdmissionControl(
+            global_limit=2, global_queue=0, model_limit=1, model_queue=0,
+            timeout=1,
+            on_reject=lambda scope, reason: rejections.append((scope, reason)))
+
+        async with admission.admit('a'):
+            stats = admission.stats()
+            # Model 'a' is at its limit, model 'b' still gets a slot
+            with pytest.raises(AdmissionRejectedError):
+                async with admission.admit('a'):
+                    pass
+            async with admission.admit('b'):
+                # And the global limit is reached
+                with pytest.raises(AdmissionRejectedError):
+                    async with admission.admit('c'):
+                        pass
+        return admission, stats
+
+    admission, stats = asyncio.run(run())
+    assert stats['models']['a']['active'] == 1
+    assert stats['global_limit']['active'] == 1
+    assert rejections == [('model', 'queue_full'), ('global', 'queue_full')]
+    assert admission.stats()['model_rejections'] == {'a': 1}
+    # Limits of idle models are dropped
+    assert admission.models == {}
+    assert admission.global_limit.active == 0
+
+
+def test_admission_control_bounds_model_rejections():
+    async def run():
+        admission = AdmissionControl(
+            global_limit=1, global_queue=0, model_limit=1, model_queue=0,
+            timeout=1, max_rejection_models=2)
+        for model_id in ['a', 'b', 'a', 'c']:
+            async with admission.admit(model_id):
+                with pytest.raises(AdmissionRejectedError):
+                    async with admission.admit(model_id):
+                        pass
+        return admission
+
+    admission = asyncio.run(run())
+    # 'b' was rejected the longest ago
+    assert admission.stats()['model_rejections'] == {'a': 2, 'c': 1}
@@ -1,5 +1,9 @@
 from tests.conftest import std_model_cases, standard_uuid
 import os
+import json
+import pytest
+import numpy as np
+import pandas as pd
 
 def test_status(client):
     response = client.get('/')
@@ -85,6 +89,109 @@ def test_get_inputs(client):
         assert input_['column_name'] in expected_inputs
 
 
+@pytest.mark.parametrize(
+    "url",
+    ['/countries/', '/cities/?country=Brazil', '/cities/search?q=sao',
+     '/models/?sortBy=mape', f'/inputs/{standard_uuid}']
+)
+def test_catalog_etag(client, url):
+    from database.crud import execute_query
+    from database.queries import queries
+
+    response = client.get(url)
+    etag = response.headers['etag']
+    assert response.status_code == 200
+    assert response.headers['cache-control']
+
+    not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['etag'] == etag
+    assert not_modified.content == b''
+
+    # An ingestion bumps the catalog version
+    execute_query(queries['bump_catalog_version'])
+    modified = client.get(url, headers={'If-None-Match': etag})
+    assert modified.status_code == 200
+    assert modified.headers['etag'] != etag
+    assert modified.json() == response.json()
+
+
+def test_catalog_change_invalidates_model(client):
+    from api.api import validators, prediction_cache
+    from database.crud import execute_query
+    from database.queries import queries
+
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    first = client.post(
+        f'/predict/{standard_uuid}', json={'features': features})
+    assert str(standard_uuid) in validators
+
+    # Ingesting the model again changes its metadata
+    execute_query(
+        "UPDATE models SET mape = 0.5 WHERE id = ?", (str(standard_uuid),))
+    execute_query(queries['bump_catalog_version'])
+    client.get('/models/')
+
+    assert str(standard_uuid) not in validators
+    assert prediction_cache.stats()['invalidations'] >= 1
+    second = client.post(
+        f'/predict/{standard_uuid}', json={'features': features})
+    assert second.json()['predict']['mape'] == 0.5
+    assert second.json()['predict']['property_price'] == \
+        first.json()['predict']['property_price']
+
+def test_catalog_version_read_in_db_executor(client, monkeypatch):
+    import threading
+    from api.api import catalog_version
+    from database.crud import execute_query
+    from database.queries import queries
+
+    threads = []
+    read_version = catalog_version.read_version
+
+    def spy():
+        threads.append(threading.current_thread().name)
+        return read_version()
+
+    monkeypatch.setattr(catalog_version, 'read_version', spy)
+    execute_query(queries['bump_catalog_version'])
+    response = client.get('/countries/')
+
+    assert response.status_code == 200
+    # Not in the event loop
+    assert threads and all(name.startswith('db') for name in threads)
+
+def test_search_cities(client):
+    response = client.get('/cities/search', params={'q': 'tres cora'})
+    assert response.status_code == 200
+    cities = response.json()['cities']
+    assert cities[0] == {
+        'id': 'Q1439211',
+        'city': 'Três Corações',
+        'country': 'Brazil',
+        'hierarchy': 'Minas Gerais',
+        'label': 'Três Corações (Minas Gerais)',
+        'match': 'prefix',
+        'score': 1.0
+    }
+
+    response = client.get(
+        '/cities/search', params={'q': 'o', 'country': 'Norway', 'limit': 1})
+    assert [c['city'] for c in response.json()['cities']] == ['Oslo']
+
+    response = client.get('/cities/search', params={'q': ''})
+    assert response.status_code == 422
+
+
 def test_predict(client):
     features = {
         'features': {
@@ -107,3 +214,706 @@ def test_predict(client):
     
     assert isinstance(prediction['predict']['mape'], float)
     assert isinstance(prediction['predict']['property_price'], float)
+
+
+def test_predict_server_timing(client, caplog):
+    import logging
+
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 137,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+
+    with caplog.at_level(logging.DEBUG, logger='api.api'):
+        response = client.post(
+            f'/predict/{standard_uuid}', json={'features': features})
+
+    phases = {
+        item.split(';')[0]: float(item.split('dur=')[1])
+        for item in response.headers['server-timing'].split(', ')
+    }
+    assert {'validate', 'cache', 'model_load', 'predict', 'total'} <= \
+        set(phases)
+    assert all(duration >= 0 for duration in phases.values())
+
+    record = next(
+        r for r in caplog.records if getattr(r, 'route', None) ==
+        '/predict/{model_id}')
+    assert record.status_code == 200
+    assert record.duration_ms > 0
+    assert 'predict' in record.timings
+
+
+def test_predict_admission(client, monkeypatch):
+    from api.admission import AdmissionControl
+    from api.prediction_cache import PredictionCache
+
+    admission = AdmissionControl(
+        global_limit=1, global_queue=0, model_limit=4, model_queue=0,
+        timeout=1)
+    monkeypatch.setattr('api.api.admission', admission)
+    monkeypatch.setattr('api.api.prediction_cache', PredictionCache(100))
+    # Take the only global slot, as a running request would
+    admission.global_limit.active = 1
+
+    features = {'features': {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }}
+
+    response = client.post(f'/predict/{standard_uuid}', json=features)
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+
+    stats = client.get('/admission').json()
+    assert stats['global_limit']['queue_full'] == 1
+    assert stats['model_rejections'] == {}
+    assert stats['models'] == {}
+
+    # Invalid requests are refused before waiting for a slot
+    response = client.post(
+        f'/predict/{standard_uuid}', json={'features': {}})
+    assert response.status_code == 422
+
+    admission.global_limit.active = 0
+    response = client.post(f'/predict/{standard_uuid}', json=features)
+    assert response.status_code == 200
+    assert client.get('/admission').json()['global_limit']['admitted'] == 1
+
+    # Predictions in the cache don't need a slot
+    admission.global_limit.active = 1
+    response = client.post(f'/predict/{standard_uuid}', json=features)
+    assert response.status_code == 200
+    assert 'admission' not in response.headers['server-timing']
+    assert client.get('/admission').json()['global_limit']['admitted'] == 1
+
+
+def test_predict_ensemble(client, monkeypatch):
+    import shutil
+    from api.api import STORAGE_PATH
+    from api.prediction_cache import PredictionCache
+    from database.crud import execute_query
+    from database.queries import queries
+
+    # A copy of the dev model with a worse MAPE and a model with an input the
+    # request doesn't have, both in the city of the dev model
+    copy_id = str(standard_uuid).replace('5', '6')
+    extra_id = str(standard_uuid).replace('5', '7')
+    shutil.copytree(
+        f'{STORAGE_PATH}/{standard_uuid}', f'{STORAGE_PATH}/{copy_id}')
+    for model_id, mape in [(copy_id, 2.), (extra_id, 1.)]:
+        execute_query(
+            "INSERT INTO models SELECT ?, flavor, r2, mae, ?, rmse, "
+            "algorithm, data_year, author, links FROM models WHERE id = ?",
+            (model_id, mape, str(standard_uuid)))
+        execute_query(
+            "INSERT INTO model_city VALUES (NULL, 'Q191642', ?)", (model_id,))
+        execute_query(
+            "INSERT INTO inputs SELECT NULL, ?, column_name, lat, lng, label, "
+            "type, options, description, unit FROM inputs "
+            "WHERE models_id = ?", (model_id, str(standard_uuid)))
+    execute_query(
+        "INSERT INTO inputs VALUES "
+        "(NULL, ?, 'pool', '', '', 'Pool', 'bool', '[]', NULL, NULL)",
+        (extra_id,))
+    execute_query(queries['bump_catalog_version'])
+
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+        # Not an input of any model, so no model gets it
+        "garden": True,
+    }
+    response = client.post(
+        '/predict/ensemble/Q191642', json={'features': features})
+    assert response.status_code == 200
+    ensemble = response.json()
+
+    models = {m['model_id']: m for m in ensemble['models']}
+    assert [m['model_id'] for m in ensemble['models']] == \
+        [str(standard_uuid), extra_id, copy_id]
+    dev, copy, extra = \
+        models[str(standard_uuid)], models[copy_id], models[extra_id]
+
+    assert dev['error'] is None and copy['error'] is None
+    assert dev['property_price'] == copy['property_price']
+    assert extra['property_price'] is None
+    assert "pool" in extra['error']
+    assert extra['weight'] == 0
+    # Weights are proportional to the inverse of the MAPE
+    assert dev['weight'] + copy['weight'] == pytest.approx(1)
+    assert dev['weight'] / copy['weight'] == \
+        pytest.approx(copy['mape'] / dev['mape'], rel=1e-4)
+    assert ensemble['property_price'] == \
+        pytest.approx(dev['property_price'], abs=.01)
+    assert ensemble['latency_ms'] > 0
+    assert all(m['latency_ms'] > 0 for m in ensemble['models'])
+
+    # Fails when no model can predict the features
+    response = client.post('/predict/ensemble/Q191642', json={'features': {}})
+    assert response.status_code == 422
+
+    # Unexpected errors of a model don't fail the others
+    async def predict_features(model_id, features):
+        if model_id == copy_id:
+            raise OSError('broken model directory')
+        return 1000.
+
+    monkeypatch.setattr('api.api.predict_features', predict_features)
+    monkeypatch.setattr('api.api.prediction_cache', PredictionCache(0))
+    response = client.post(
+        '/predict/ensemble/Q191642', json={'features': features})
+    assert response.status_code == 200
+    models = {m['model_id']: m for m in response.json()['models']}
+    assert 'broken model directory' in models[copy_id]['error']
+    assert models[str(standard_uuid)]['weight'] == 1
+    assert response.json()['property_price'] == 1000.
+
+    response = client.post('/predict/ensemble/Q0', json={'features': {}})
+    assert response.status_code == 404
+
+
+def test_predict_batch(client):
+    row = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    invalid_row = {**row, "neighbourhood": "Not a neighbourhood"}
+    features = {'features': [row, invalid_row, row]}
+
+    prediction = client.post(
+        f'/predict/{standard_uuid}/batch', json=features)
+    assert prediction.status_code == 200
+    prediction = prediction.json()
+
+    assert isinstance(prediction['mape'], float)
+    items = prediction['predictions']
+    assert [item['index'] for item in items] == [0, 1, 2]
+    assert isinstance(items[0]['property_price'], float)
+    assert items[0]['property_price'] == items[2]['property_price']
+    assert items[1]['property_price'] is None
+    assert 'Not a neighbourhood' in items[1]['error']
+
+
+def test_predict_whatif(client):
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+
+    curve = client.post(
+        f'/predict/{standard_uuid}/whatif',
+        json={
+            'features': features,
+            'sweeps': [{'feature': 'area', 'start': 50, 'stop': 150,
+                        'steps': 5}]
+        })
+    assert curve.status_code == 200
+    curve = curve.json()
+    assert curve['features'] == ['area']
+    assert curve['values'] == [[50, 75, 100, 125, 150]]
+    assert len(curve['prices']) == 5
+
+    surface = client.post(
+        f'/predict/{standard_uuid}/whatif',
+        json={
+            'features': features,
+            'sweeps': [
+                {'feature': 'rooms', 'values': [1, 2, 3]},
+                {'feature': 'neighbourhood'},
+            ]
+        })
+    assert surface.status_code == 200
+    surface = surface.json()
+    inputs = client.get(f'/inputs/{standard_uuid}').json()['inputs']
+    options = next(
+        i['options'] for i in inputs if i['column_name'] == 'neighbourhood')
+    assert surface['values'] == [[1, 2, 3], options]
+    assert len(surface['prices']) == 3
+    assert all(len(row) == len(options) for row in surface['prices'])
+
+    # The surface matches single predictions
+    prediction = client.post(
+        f'/predict/{standard_uuid}',
+        json={'features': {
+            **features, 'rooms': 2, 'neighbourhood': options[-1]}})
+    assert prediction.json()['predict']['property_price'] == \
+        surface['prices'][1][-1]
+
+
+@pytest.mark.parametrize(
+    "sweeps, status_code",
+    [
+        ([{'feature': 'pool', 'values': [True]}], 422),
+        ([{'feature': 'rooms', 'values': [1.5]}], 422),
+        ([{'feature': 'area'}], 422),
+        ([{'feature': 'area', 'values': [1]},
+          {'feature': 'area', 'values': [2]}], 422),
+        ([{'feature': 'area', 'start': 1, 'stop': 2, 'steps': 200},
+          {'feature': 'rooms', 'start': 1, 'stop': 200, 'steps': 200}], 413),
+        ([{'feature': 'area', 'start': 1, 'stop': 2,
+           'steps': 20_000_000}], 413),
+    ]
+)
+def test_predict_whatif_invalid(client, sweeps, status_code):
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+
+    response = client.post(
+        f'/predict/{standard_uuid}/whatif',
+        json={'features': features, 'sweeps': sweeps})
+
+    assert response.status_code == status_code
+
+
+def test_predict_whatif_example(client):
+    from api.schemas import WhatIfRequest
+
+    example = WhatIfRequest.model_config['json_schema_extra']['examples'][0]
+    response = client.post(f'/predict/{standard_uuid}/whatif', json=example)
+
+    assert response.status_code == 200
+    assert response.json()['features'] == ['area', 'parking']
+
+def test_predict_heatmap(client):
+    from api.api import heatmap_cache
+
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+    }
+    bounds = [-23.3, -46.0, -23.1, -45.8]
+
+    response = client.post(
+        f'/predict/{standard_uuid}/heatmap',
+        json={'features': features, 'resolution': 4, 'bounds': bounds})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/octet-stream'
+    assert response.headers['x-heatmap-shape'] == '4,4'
+    assert response.headers['x-heatmap-bounds'] == \
+        ','.join(str(limit) for limit in bounds)
+    grid = np.frombuffer(response.content, dtype='<f4').reshape(4, 4)
+
+    # The first cell is the north west corner
+    prediction = client.post(
+        f'/predict/{standard_uuid}',
+        json={'features': {
+            **features, 'lat_value': -23.1, 'lon_value': -46.0}})
+    assert grid[0, 0] == pytest.approx(
+        prediction.json()['predict']['property_price'], rel=1e-6)
+
+    # The same heatmap is served from the cache
+    hits = heatmap_cache.hits
+    again = client.post(
+        f'/predict/{standard_uuid}/heatmap',
+        json={'features': features, 'resolution': 4, 'bounds': bounds})
+    assert again.content == response.content
+    assert heatmap_cache.hits == hits + 1
+
+    # Without bounds, the extent of the test sample is used
+    response = client.post(
+        f'/predict/{standard_uuid}/heatmap',
+        json={'features': features, 'resolution': 2})
+    assert response.status_code == 200
+    assert len(response.content) == 2 * 2 * 4
+
+
+@pytest.mark.parametrize(
+    "body, status_code",
+    [
+        ({'resolution': 10_000}, 413),
+        ({'resolution': 4, 'bounds': [-23.1, -46.0, -23.3, -45.8]}, 422),
+        ({'resolution': 4, 'features': {'rooms': 3}}, 422),
+    ]
+)
+def test_predict_heatmap_invalid(client, body, status_code):
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+    }
+
+    response = client.post(
+        f'/predict/{standard_uuid}/heatmap',
+        json={'features': features, **body})
+
+    assert response.status_code == status_code
+
+
+def test_predict_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr('api.api.MAX_BATCH_SIZE', 1)
+    features = {'features': [{'rooms': 1}, {'rooms': 2}]}
+
+    prediction = client.post(
+        f'/predict/{standard_uuid}/batch', json=features)
+
+    assert prediction.status_code == 413
+
+
+@pytest.mark.parametrize('content_type', ['text/csv', 'application/x-ndjson'])
+def test_predict_stream(client, monkeypatch, content_type):
+    monkeypatch.setattr('api.api.STREAM_CHUNK_SIZE', 2)
+    row = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90.5,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    rows = [row, {**row, "neighbourhood": "Not a neighbourhood"}, row]
+
+    if content_type == 'text/csv':
+        body = pd.DataFrame(rows).to_csv(index=False)
+    else:
+        body = '\n'.join(json.dumps(row) for row in rows)
+
+    response = client.post(
+        f'/predict/{standard_uuid}/stream',
+        content=body.encode('utf-8'),
+        headers={'content-type': content_type}
+    )
+    assert response.status_code == 200
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item['index'] for item in items] == [0, 1, 2]
+    assert isinstance(items[0]['property_price'], float)
+    assert items[0]['property_price'] == items[2]['property_price']
+    assert 'Not a neighbourhood' in items[1]['error']
+
+
+@pytest.mark.parametrize('content_type', ['text/csv', 'application/x-ndjson'])
+def test_predict_stream_missing_field(client, monkeypatch, content_type):
+    monkeypatch.setattr('api.api.STREAM_CHUNK_SIZE', 3)
+    row = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90.5,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    missing = {key: value for key, value in row.items() if key != 'rooms'}
+    # The row without rooms must not change the type of the other ones
+    rows = [row, missing, row]
+
+    if content_type == 'text/csv':
+        body = pd.DataFrame(rows).to_csv(index=False)
+    else:
+        body = '\n'.join(json.dumps(row) for row in rows)
+
+    response = client.post(
+        f'/predict/{standard_uuid}/stream',
+        content=body.encode('utf-8'),
+        headers={'content-type': content_type}
+    )
+    assert response.status_code == 200
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item['index'] for item in items] == [0, 1, 2]
+    assert isinstance(items[0]['property_price'], float)
+    assert items[0]['property_price'] == items[2]['property_price']
+    assert 'rooms' in items[1]['error']
+
+
+def test_predict_stream_unsupported_type(client):
+    response = client.post(
+        f'/predict/{standard_uuid}/stream',
+        content=b'{}',
+        headers={'content-type': 'application/json'}
+    )
+    assert response.status_code == 415
+
+
+def test_predict_stream_admission(client, monkeypatch):
+    from api import api
+
+    # Admission stats seen while each chunk is predicted
+    seen = []
+    predict_chunk = api.predict_chunk
+
+    def spy(*args):
+        stats = api.admission.stats()
+        seen.append((
+            stats['global_limit']['active'],
+            stats['models'][str(standard_uuid)]['active']))
+        return predict_chunk(*args)
+
+    monkeypatch.setattr('api.api.predict_chunk', spy)
+    monkeypatch.setattr('api.api.STREAM_CHUNK_SIZE', 1)
+    row = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90.5,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    body = '\n'.join(json.dumps(row) for row in [row, row])
+
+    response = client.post(
+        f'/predict/{standard_uuid}/stream',
+        content=body.encode('utf-8'),
+        headers={'content-type': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200
+
+    # The slots are held while the stream runs and released after it
+    assert seen == [(1, 1)] * 3
+    stats = client.get('/admission').json()
+    assert stats['global_limit']['active'] == 0
+    assert stats['models'] == {}
+
+def test_predict_invalid_features(client):
+    features = {'features': {'rooms': 'three'}}
+
+    prediction = client.post(f'/predict/{standard_uuid}', json=features)
+
+    assert prediction.status_code == 422
+    assert "Field 'rooms'" in prediction.json()['detail']
+
+
+def test_openapi_features_schemas(client):
+    schemas = client.get('/openapi.json').json()['components']['schemas']
+
+    features_schema = schemas[f'PredictFeatures_{standard_uuid}']
+    assert 'neighbourhood' in features_schema['properties']
+    assert 'lat_value' in features_schema['properties']
+    assert features_schema['additionalProperties'] is False
+
+
+def test_openapi_skips_models_without_inputs(client, monkeypatch):
+    from api import api
+    model_ids = api.get_model_ids()
+    monkeypatch.setattr(
+        'api.api.get_model_ids', lambda: [*model_ids, 'model-without-inputs'])
+
+    response = client.get('/openapi.json')
+
+    assert response.status_code == 200
+    schemas = response.json()['components']['schemas']
+    assert f'PredictFeatures_{standard_uuid}' in schemas
+    assert 'PredictFeatures_model-without-inputs' not in schemas
+
+
+def test_get_model_cache_stats(client):
+    client.post(f'/predict/{standard_uuid}/batch', json={'features': [{
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }]})
+    stats = client.get('/cache/models')
+
+    assert stats.status_code == 200
+    assert {'hits', 'misses', 'evictions', 'load_seconds'} <= \
+        set(stats.json())
+    # Models are listed by id, without their storage paths
+    assert stats.json()['models'] == [str(standard_uuid)]
+
+    # Models can't be dropped from the cache through the API
+    response = client.delete(f'/cache/models/{standard_uuid}')
+    assert response.status_code == 404
+
+
+def test_ready(client):
+    response = client.get('/ready')
+
+    assert response.status_code == 200
+    assert response.json()['ready']
+
+
+def test_ready_after_preload(temp_db_path, storage, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.api import app, warm_up
+
+    monkeypatch.setattr('api.api.PRELOAD_MODELS', str(standard_uuid))
+
+    with TestClient(app) as client:
+        warm_up._executor.shutdown(wait=True)
+        response = client.get('/ready')
+
+    assert response.status_code == 200
+    assert response.json()['loaded'] == [str(standard_uuid)]
+
+
+def test_warm_up_model_without_options(client, monkeypatch):
+    from api import api
+
+    model_id = str(standard_uuid)
+    inputs = api.query_inputs(model_id)
+    no_options = inputs.model_copy(update={'inputs': [
+        input_def.model_copy(update={'options': []})
+        if input_def.type == 'categorical' else input_def
+        for input_def in inputs.inputs
+    ]})
+    monkeypatch.setattr('api.api.query_inputs', lambda _: no_options)
+    api.invalidate_model(model_id)
+
+    # The model is still loaded and called, even though no value of its
+    # categorical passes validation
+    api.warm_up_model(model_id)
+
+    assert f"{api.STORAGE_PATH}/{model_id}/{api.MODEL_FOLDER_NAME}" in \
+        api.model_cache.stats()['models']
+    api.invalidate_model(model_id)
+
+
+def test_inference_queue_full(client, monkeypatch):
+    from api.api import inference_executor
+    monkeypatch.setattr(inference_executor, 'max_pending', 0)
+    monkeypatch.setattr('api.api.RETRY_AFTER', 5)
+
+    prediction = client.post(
+        f'/predict/{standard_uuid}/batch',
+        json={'features': [{'rooms': 1}]})
+    countries = client.get('countries')
+
+    assert prediction.status_code == 503
+    assert prediction.headers['Retry-After'] == '5'
+    assert countries.status_code == 200
+
+
+def test_predict_micro_batching(client, monkeypatch):
+    from api.api import predict_many_async
+    from api.batching import MicroBatcher
+    from api.prediction_cache import PredictionCache
+
+    batcher = MicroBatcher(predict_many_async, window=0.001, max_batch_size=8)
+    monkeypatch.setattr('api.api.micro_batcher', batcher)
+    monkeypatch.setattr('api.api.prediction_cache', PredictionCache(0))
+    features = {
+        'features': {
+            "rooms": 3,
+            "parking": 2,
+            "bathrooms": 1,
+            "area": 90,
+            "has_multiple_parking_spaces": True,
+            "neighbourhood": "Jardim Esplanada",
+            "lat_value": -23.1789,
+            "lon_value": -45.8869,
+        }
+    }
+
+    prediction = client.post(f'/predict/{standard_uuid}', json=features)
+
+    assert prediction.status_code == 200
+    assert isinstance(prediction.json()['predict']['property_price'], float)
+    assert batcher.stats()['rows'] == 1
+
+
+def test_predict_cache(client):
+    from api.api import prediction_cache, invalidate_model
+    features = {
+        'features': {
+            "rooms": 3,
+            "parking": 2,
+            "bathrooms": 1,
+            "area": 91,
+            "has_multiple_parking_spaces": True,
+            "neighbourhood": "Jardim Esplanada",
+            "lat_value": -23.1789,
+            "lon_value": -45.8869,
+        }
+    }
+    hits = prediction_cache.stats()['hits']
+
+    first = client.post(f'/predict/{standard_uuid}', json=features)
+    second = client.post(f'/predict/{standard_uuid}', json=features)
+
+    assert first.json() == second.json()
+    assert prediction_cache.stats()['hits'] == hits + 1
+
+    invalidate_model(str(standard_uuid))
+
+    client.post(f'/predict/{standard_uuid}', json=features)
+    assert prediction_cache.stats()['hits'] == hits + 1
+    assert client.get('/cache/predictions').json()['invalidations'] > 0
+
+
+def test_predict_native_inference(client, monkeypatch):
+    from api.api import model_cache
+    from api.native import NativeModel
+    from api.prediction_cache import PredictionCache
+
+    monkeypatch.setattr('api.api.prediction_cache', PredictionCache(0))
+    features = {
+        'features': {
+            "rooms": 3,
+            "parking": 2,
+            "bathrooms": 1,
+            "area": 90,
+            "has_multiple_parking_spaces": True,
+            "neighbourhood": "Jardim Esplanada",
+            "lat_value": -23.1789,
+            "lon_value": -45.8869,
+        }
+    }
+
+    model_cache.clear()
+    pyfunc = client.post(f'/predict/{standard_uuid}', json=features)
+
+    monkeypatch.setattr('api.api.NATIVE_INFERENCE', True)
+    model_cache.clear()
+    native = client.post(f'/predict/{standard_uuid}', json=features)
+    model = model_cache.get(model_cache.stats()['models'][0])
+    model_cache.clear()
+
+    assert isinstance(model, NativeModel)
+    assert native.json() == pyfunc.json()
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from api.batching import MicroBatcher
+
+
+def test_micro_batcher_groups_concurrent_rows():
+    calls = []
+
+    async def predict_many(key, rows):
+        calls.append((key, rows))
+        return [row['x'] * 2 for row in rows]
+
+    batcher = MicroBatcher(predict_many, window=0.01, max_batch_size=10)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.predict('a', {'x': i}) for i in range(3)),
+            batcher.predict('b', {'x': 10})
+        )
+
+    assert asyncio.run(run()) == [0, 2, 4, 20]
+    assert sorted(calls) == [
+        ('a', [{'x': 0}, {'x': 1}, {'x': 2}]),
+        ('b', [{'x': 10}])
+    ]
+    assert batcher.stats()['batches'] == 2
+    assert batcher.stats()['rows'] == 4
+
+
+def test_micro_batcher_flushes_full_batches():
+    sizes = []
+
+    async def predict_many(key, rows):
+        sizes.append(len(rows))
+        return rows
+
+    # The window is never reached, batches are flushed by size
+    batcher = MicroBatcher(predict_many, window=60, max_batch_size=2)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.predict('a', i) for i in range(4)))
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+    assert sizes == [2, 2]
+
+
+def test_micro_batcher_propagates_errors():
+    async def predict_many(key, rows):
+        raise ValueError('broken model')
+
+    batcher = MicroBatcher(predict_many, window=0.01, max_batch_size=10)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.predict('a', i) for i in range(2)),
+            return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(error, ValueError) for error in errors)
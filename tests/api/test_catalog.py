@@ -0,0 +1,138 @@
+import json
+import pytest
+from api.catalog import CatalogVersion, Catalog, load_catalog_index, \
+    etag_matches, changed_models
+from api.schemas import GetModelsCategory
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ('"catalog-1"', True),
+        ('W/"catalog-1"', True),
+        ('"catalog-0", "catalog-1"', True),
+        ('*', True),
+        ('"catalog-2"', False),
+    ]
+)
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"catalog-1"') == expected
+
+
+def test_catalog_version_reads_on_change(tmp_path):
+    path = tmp_path / 'db'
+    path.write_text('a')
+    versions = iter([1, 2])
+    catalog_version = CatalogVersion(lambda: next(versions), lambda: path)
+
+    assert catalog_version.peek() is None
+    assert catalog_version.get() == 1
+    assert catalog_version.get() == 1
+    assert catalog_version.peek() == 1
+    assert catalog_version.reads == 1
+
+    path.write_text('ab')
+
+    # Peeking never reads the version
+    assert catalog_version.peek() is None
+    assert catalog_version.reads == 1
+    assert catalog_version.get() == 2
+    assert catalog_version.reads == 2
+
+
+def test_catalog_index_matches_queries(temp_db_path):
+    from database.crud import execute_with_pandas
+    from database.queries import queries
+
+    index = load_catalog_index()
+
+    countries = execute_with_pandas(queries['get_all_countries'])
+    assert index.countries.countries == countries['country'].to_list()
+
+    cities = execute_with_pandas(
+        queries['get_all_cities'], {'country': None})
+    assert list(index.get_cities('all').cities.values()) == \
+        cities['id'].to_list()
+
+    for city in ['all', *cities['id'].to_list()]:
+        for sort_by, order in [('year', 'data_year DESC'), ('mae', 'mae'),
+                               ('mape', 'mape'), ('r2', 'r2 DESC'),
+                               ('rmse', 'rmse')]:
+            models = execute_with_pandas(
+                queries['get_models_from_city'].format(sort_by=order),
+                {'city_id': None if city == 'all' else city})
+            assert [
+                model.id for model in
+                index.get_models(city, GetModelsCategory(sort_by)).models
+            ] == models['id'].to_list()
+
+    for model_id in index.model_ids:
+        inputs = execute_with_pandas(
+            queries['get_inputs'], {'model_id': model_id})
+        assert [
+            i.column_name for i in index.get_inputs(model_id).inputs
+        ] == inputs['column_name'].to_list()
+
+
+def test_catalog_rebuilds_on_new_version():
+    versions = iter([1, 1, 2])
+
+    class Version:
+        def get(self):
+            return next(versions)
+
+    catalog = Catalog(Version(), lambda: object())
+    first = catalog.get()
+
+    assert catalog.get() is first
+    assert catalog.get() is not first
+    assert catalog.builds == 2
+
+
+def test_catalog_on_swap():
+    versions = iter([1, 2])
+    swaps = []
+
+    class Version:
+        def get(self):
+            return next(versions)
+
+    catalog = Catalog(
+        Version(), lambda: object(),
+        on_swap=lambda old, new: swaps.append((old, new)))
+    first = catalog.get()
+    second = catalog.get()
+
+    assert swaps == [(first, second)]
+
+
+def test_changed_models(temp_db_path):
+    from database.crud import execute_query
+
+    old = load_catalog_index()
+    removed, changed, relabeled, *_ = old.model_ids
+    execute_query("DELETE FROM models WHERE id = ?", (removed,))
+    execute_query("UPDATE models SET mape = 0.5 WHERE id = ?", (changed,))
+    execute_query(
+        "UPDATE inputs SET label = 'Other' WHERE models_id = ?", (relabeled,))
+    new = load_catalog_index()
+
+    assert changed_models(old, new) == {removed, changed, relabeled}
+    assert changed_models(new, new) == set()
+
+
+def test_catalog_index_encoded(temp_db_path):
+    index = load_catalog_index()
+    sort_by = GetModelsCategory.mape
+
+    assert json.loads(index.encoded_models('all', sort_by)) == \
+        index.get_models('all', sort_by).model_dump(mode='json')
+    assert json.loads(index.encoded_model(index.model_ids[0])) == \
+        {'model': index.get_model(index.model_ids[0]).model_dump()}
+    assert index.encoded_model('missing') is None
+
+    # Encoded once per catalog version, except for unknown ids
+    assert index.encoded_countries() is index.encoded_countries()
+    assert json.loads(index.encoded_cities('Atlantis')) == {'cities': {}}
+    assert ('cities', 'Atlantis') not in index._encoded
@@ -0,0 +1,60 @@
+from api.city_search import CitySearchIndex, normalize, trigrams
+
+
+cities = [
+    ('Q1', 'São José dos Campos', 'Brazil', 'São Paulo'),
+    ('Q2', 'São José', 'Brazil', 'Santa Catarina'),
+    ('Q3', 'San Jose', 'United States', 'California'),
+    ('Q4', 'Springfield', 'United States', 'Illinois'),
+    ('Q5', 'Springfield', 'United States', 'Missouri'),
+    ('Q6', 'Campos dos Goytacazes', 'Brazil', 'Rio de Janeiro'),
+]
+
+
+def test_normalize():
+    assert normalize('  São   JOSÉ ') == 'sao jose'
+    assert normalize('Três Corações') == 'tres coracoes'
+
+
+def test_trigrams():
+    assert trigrams('ab') == {'  a', ' ab', 'ab '}
+
+
+def test_search_prefix():
+    index = CitySearchIndex(cities)
+
+    matches = index.search('sao jose')
+    assert [m.id for m in matches[:2]] == ['Q2', 'Q1']
+    assert all(m.match == 'prefix' for m in matches[:2])
+
+    # Same name, told apart by the hierarchy
+    matches = index.search('spring', limit=2)
+    assert {m.hierarchy for m in matches} == {'Illinois', 'Missouri'}
+
+
+def test_search_word_prefix():
+    index = CitySearchIndex(cities)
+
+    matches = index.search('campos', limit=2)
+    assert [(m.id, m.match) for m in matches] == [
+        ('Q6', 'prefix'), ('Q1', 'word')]
+
+
+def test_search_fuzzy():
+    index = CitySearchIndex(cities)
+
+    matches = index.search('sprnigfield', limit=1)
+    assert matches[0].city == 'Springfield'
+    assert matches[0].match == 'fuzzy'
+    assert 0 < matches[0].score < 1
+
+    assert index.search('xyz') == []
+    assert index.search('   ') == []
+
+
+def test_search_country():
+    index = CitySearchIndex(cities)
+
+    matches = index.search('san jose', country='United States')
+    assert [m.id for m in matches] == ['Q3']
+    assert index.search('sao', country='Norway') == []
@@ -0,0 +1,57 @@
+import json
+import shutil
+import numpy as np
+import pytest
+from api.compiled import CompiledModel
+from api.native import run_model
+from tests.conftest import standard_uuid
+
+# y = 1000 * rooms + 500 if type is "house", with "type" one hot encoded
+COMPILED_MODEL_PATH = 'tests/data/compiled_model.onnx'
+
+
+def test_compiled_model_predict():
+    model = CompiledModel(COMPILED_MODEL_PATH)
+
+    assert model.columns == ['rooms', 'type']
+    assert model.layout == 'columns'
+
+    rows = [{'rooms': 2, 'type': 'house'}, {'type': 'apartment', 'rooms': 3}]
+    assert np.allclose(run_model(model, rows), [2500, 3000])
+
+
+def test_load_model_artifact_prefers_compiled(tmp_path):
+    from api.api import load_model_artifact
+
+    shutil.copy(COMPILED_MODEL_PATH, tmp_path / 'model.onnx')
+    inputs = [
+        {'column_name': 'rooms', 'lat': None, 'lng': None, 'type': 'int'},
+        {'column_name': 'type', 'lat': None, 'lng': None,
+         'type': 'categorical'},
+    ]
+    (tmp_path / 'model_metadata.json').write_text(
+        json.dumps({'inputs': inputs}))
+
+    # The MLflow model folder doesn't even need to exist
+    model = load_model_artifact(str(tmp_path / 'model'))
+
+    assert isinstance(model, CompiledModel)
+
+
+# Enabled with a valid model whose columns aren't inputs of the dev model
+@pytest.mark.parametrize(
+    'enabled, corrupted', [(False, False), (True, True), (True, False)])
+def test_load_model_artifact_falls_back(monkeypatch, storage, enabled,
+                                        corrupted):
+    from api.api import load_model_artifact
+
+    monkeypatch.setattr('api.api.COMPILED_INFERENCE', enabled)
+    model_dir = storage / str(standard_uuid)
+    if corrupted:
+        (model_dir / 'model.onnx').write_bytes(b'not an onnx model')
+    else:
+        shutil.copy(COMPILED_MODEL_PATH, model_dir / 'model.onnx')
+
+    model = load_model_artifact(str(model_dir / 'model'))
+
+    assert not isinstance(model, CompiledModel)
@@ -0,0 +1,57 @@
+import asyncio
+import contextvars
+import threading
+import pytest
+from api.executors import BoundedExecutor, QueueFullError, \
+    DeadlineExceededError
+
+
+def test_bounded_executor_runs_in_its_threads():
+    executor = BoundedExecutor('test', 1, 0, timeout=5)
+
+    name = asyncio.run(executor.run(lambda: threading.current_thread().name))
+
+    assert name.startswith('test')
+    assert executor.stats()['pending'] == 0
+
+
+def test_bounded_executor_keeps_context():
+    request_id = contextvars.ContextVar('request_id')
+    executor = BoundedExecutor('test', 1, 0, timeout=5)
+
+    async def run():
+        request_id.set('abc')
+        return await executor.run(request_id.get)
+
+    assert asyncio.run(run()) == 'abc'
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor('test', 1, 1, timeout=5)
+    release = threading.Event()
+
+    async def run():
+        tasks = [
+            asyncio.ensure_future(executor.run(release.wait))
+            for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert executor.stats()['rejected'] == 1
+
+
+def test_bounded_executor_deadline():
+    executor = BoundedExecutor('test', 1, 0, timeout=0.05)
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(DeadlineExceededError):
+            await executor.run(release.wait)
+        release.set()
+
+    asyncio.run(run())
+    assert executor.stats()['timeouts'] == 1
@@ -0,0 +1,68 @@
+from api import metrics
+from tests.conftest import standard_uuid
+
+
+def sample(text: str, name: str, **labels) -> float:
+    """
+    Returns the value of a sample of the Prometheus text format (labels
+    are written in alphabetical order).
+    """
+    label_text = ','.join(
+        f'{k}="{v}"' for k, v in sorted(labels.items()))
+    prefix = f'{name}{{{label_text}}} ' if labels else f'{name} '
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def test_observe_query():
+    from database.queries import queries
+
+    def count(query):
+        return sample(
+            metrics.generate_metrics().decode(),
+            'api_db_query_duration_seconds_count', query=query)
+
+    before = count('get_catalog_version')
+    metrics.observe_query(queries['get_catalog_version'], 0.001)
+    metrics.observe_query('SELECT 1', 0.001)
+
+    assert count('get_catalog_version') == before + 1
+    assert count('other') >= 1
+
+
+def test_metrics_endpoint(client):
+    features = {
+        "rooms": 3,
+        "parking": 2,
+        "bathrooms": 1,
+        "area": 90,
+        "has_multiple_parking_spaces": True,
+        "neighbourhood": "Jardim Esplanada",
+        "lat_value": -23.1789,
+        "lon_value": -45.8869,
+    }
+    client.post(f'/predict/{standard_uuid}', json={'features': features})
+    client.post(f'/predict/{standard_uuid}', json={'features': {}})
+    client.get('/not-a-route')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+
+    route = '/predict/{model_id}'
+    assert sample(text, 'api_request_duration_seconds_count',
+                  method='POST', route=route, status='200') >= 1
+    assert sample(text, 'api_request_duration_seconds_count',
+                  method='POST', route=route, status='422') >= 1
+    assert sample(text, 'api_request_duration_seconds_count',
+                  method='GET', route='unmatched', status='404') >= 1
+    assert sample(text, 'api_model_request_duration_seconds_count',
+                  route=route, model_id=standard_uuid) >= 1
+    assert sample(text, 'api_validation_failures_total') >= 1
+    assert sample(text, 'api_model_cache_requests_total', result='miss') + \
+        sample(text, 'api_model_cache_requests_total', result='hit') >= 1
+    # The /metrics request itself
+    assert sample(text, 'api_requests_in_flight') == 1
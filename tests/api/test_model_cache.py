@@ -0,0 +1,235 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+import pytest
+from api.model_cache import ModelCache
+
+
+@pytest.fixture
+def sizes(monkeypatch):
+    # Fake the size of each model and a clock controlled by the test
+    sizes = {'a': 40, 'b': 40, 'c': 40, 'big': 500}
+    clock = {'now': 0.0}
+    monkeypatch.setattr('api.model_cache.get_rss', lambda: 0)
+    monkeypatch.setattr('api.model_cache.get_dir_size', lambda key: sizes[key])
+    monkeypatch.setattr('api.model_cache.monotonic', lambda: clock['now'])
+    yield sizes, clock
+
+
+def test_model_cache_hits_and_misses(sizes):
+    loaded = []
+    cache = ModelCache(
+        loader=lambda key: loaded.append(key) or key.upper(), max_bytes=100)
+
+    assert cache.get('a') == 'A'
+    assert cache.get('a') == 'A'
+
+    stats = cache.stats()
+    assert loaded == ['a']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['loads'] == 1
+    assert stats['size_bytes'] == 40
+
+
+def test_model_cache_evicts_by_size(sizes):
+    cache = ModelCache(loader=str.upper, max_bytes=100)
+
+    cache.get('a')
+    cache.get('b')
+    # Make 'a' the most recently used model
+    cache.get('a')
+    cache.get('c')
+
+    stats = cache.stats()
+    assert stats['models'] == ['a', 'c']
+    assert stats['size_bytes'] == 80
+    assert stats['evictions'] == 1
+
+    # A model bigger than the budget is kept alone
+    cache.get('big')
+    assert cache.stats()['models'] == ['big']
+
+
+def test_model_cache_expires_idle_models(sizes):
+    _, clock = sizes
+    cache = ModelCache(loader=str.upper, max_bytes=100, ttl=10)
+
+    cache.get('a')
+    clock['now'] = 5
+    cache.get('b')
+    clock['now'] = 12
+    cache.get('b')
+
+    stats = cache.stats()
+    assert stats['models'] == ['b']
+    assert stats['expirations'] == 1
+
+
+def test_model_cache_does_not_cache_errors(sizes):
+    def loader(key):
+        raise OSError('missing model')
+    cache = ModelCache(loader=loader, max_bytes=100)
+
+    with pytest.raises(OSError):
+        cache.get('a')
+
+    assert cache.stats()['models'] == []
+
+
+def test_model_cache_listener(sizes):
+    _, clock = sizes
+    events = []
+    cache = ModelCache(
+        loader=str.upper,
+        max_bytes=100,
+        ttl=10,
+        listener=lambda event, seconds: events.append(event))
+
+    cache.get('a')
+    cache.get('a')
+    cache.get('big')
+    clock['now'] = 20
+    cache.get('c')
+
+    assert events == ['miss', 'load', 'hit', 'miss', 'load', 'eviction',
+                      'expiration', 'miss', 'load']
+
+
+def test_model_cache_shares_concurrent_loads(sizes):
+    started = threading.Event()
+    release = threading.Event()
+    loaded = []
+
+    def loader(key):
+        loaded.append(key)
+        started.set()
+        release.wait(5)
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=100)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(cache.get, 'a')
+        started.wait(5)
+        others = [executor.submit(cache.get, 'a') for _ in range(3)]
+        # Wait until every request is waiting for the load in progress
+        while cache.stats()['shared_loads'] < 3:
+            sleep(.001)
+        release.set()
+        results = [f.result(5) for f in [first, *others]]
+
+    stats = cache.stats()
+    assert results == ['A'] * 4
+    assert loaded == ['a']
+    assert stats['misses'] == 4
+    assert stats['loads'] == 1
+    assert stats['shared_loads'] == 3
+    assert stats['models'] == ['a']
+
+
+def test_model_cache_shares_load_errors(sizes):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise OSError('storage unavailable')
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=100)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        first = executor.submit(cache.get, 'a')
+        started.wait(5)
+        others = [executor.submit(cache.get, 'a') for _ in range(2)]
+        while cache.stats()['shared_loads'] < 2:
+            sleep(.001)
+        release.set()
+        for future in [first, *others]:
+            with pytest.raises(OSError, match='storage unavailable'):
+                future.result(5)
+
+    # The error isn't cached, the next request loads the model again
+    assert cache.get('a') == 'A'
+    assert calls == ['a', 'a']
+
+
+def test_model_cache_invalidate_during_load(sizes):
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader(key):
+        started.set()
+        release.wait(5)
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=100)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(cache.get, 'a')
+        started.wait(5)
+        cache.invalidate('a')
+        release.set()
+        assert future.result(5) == 'A'
+
+    # The model loaded before the invalidation isn't kept
+    assert cache.stats()['models'] == []
+
+
+def test_model_cache_sizes_from_memory_growth(sizes, monkeypatch):
+    rss = {'bytes': 0}
+    monkeypatch.setattr('api.model_cache.get_rss', lambda: rss['bytes'])
+
+    def prepare():
+        # Modules imported before the first load
+        rss['bytes'] += 1000
+
+    def loader(key):
+        rss['bytes'] += 70
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=1000, prepare=prepare)
+    cache.get('a')
+
+    # Only the growth of the load itself counts, not the imports
+    assert cache.stats()['size_bytes'] == 70
+
+
+def test_model_cache_sizes_concurrent_loads_from_files(sizes, monkeypatch):
+    rss = {'bytes': 0}
+    monkeypatch.setattr('api.model_cache.get_rss', lambda: rss['bytes'])
+    started = threading.Barrier(2)
+
+    def loader(key):
+        started.wait(5)
+        rss['bytes'] += 70
+        started.wait(5)
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=1000)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(cache.get, key) for key in ['a', 'b']]
+        assert [f.result(5) for f in futures] == ['A', 'B']
+
+    # The memory growth includes the other load, so the files are used
+    assert cache.stats()['size_bytes'] == 80
+
+
+def test_model_cache_sizes_loads_importing_modules_from_files(
+        sizes, monkeypatch):
+    import sys
+    rss = {'bytes': 0}
+    monkeypatch.setattr('api.model_cache.get_rss', lambda: rss['bytes'])
+
+    def loader(key):
+        # e.g. the modules needed to unpickle the first model of a library
+        rss['bytes'] += 1000
+        monkeypatch.setitem(sys.modules, f'fake_module_{key}', None)
+        return key.upper()
+
+    cache = ModelCache(loader=loader, max_bytes=1000)
+    cache.get('a')
+
+    assert cache.stats()['size_bytes'] == 40
@@ -0,0 +1,53 @@
+import json
+import mlflow.pyfunc
+import numpy as np
+import pytest
+from api.native import NativeModel, get_input_dtypes, load_native_model, \
+    matches_pyfunc, run_model
+from tests.conftest import std_input_cases, standard_uuid
+
+
+@pytest.fixture
+def dev_model(storage):
+    model_dir = storage / str(standard_uuid)
+    with open(model_dir / 'model_metadata.json', encoding='utf-8') as f:
+        metadata = json.load(f)
+    yield str(model_dir / 'model'), metadata
+
+
+def test_get_input_dtypes():
+    assert get_input_dtypes(std_input_cases) == {
+        'neighbourhood': 'object',
+        'is_new': 'bool',
+        'n_bedrooms': 'int64',
+        'area_m2': 'float64',
+        'latitude': 'float64',
+        'longitude': 'float64',
+    }
+
+
+def test_native_model_frame():
+    class Estimator:
+        feature_names_in_ = ['b', 'a']
+
+    model = NativeModel(Estimator(), {'a': 'int64', 'b': 'float64'})
+    frame = model.frame([{'a': 1, 'b': 2}, {'a': 3, 'b': 4.5}])
+
+    assert frame.columns.to_list() == ['b', 'a']
+    assert frame.dtypes.astype(str).to_list() == ['float64', 'int64']
+
+    # Trained columns that aren't inputs are computed by the estimator
+    model = NativeModel(Estimator(), {'a': 'int64', 'c': 'bool'})
+    assert list(model.dtypes) == ['a', 'c']
+
+
+def test_native_model_matches_pyfunc(dev_model):
+    model_path, metadata = dev_model
+    pyfunc = mlflow.pyfunc.load_model(model_path)
+
+    native = load_native_model(model_path, 'sklearn', metadata['inputs'])
+
+    assert matches_pyfunc(native, pyfunc, metadata['x_test'])
+
+    row = {column: metadata['x_test'][0][column] for column in native.dtypes}
+    assert np.allclose(run_model(native, [row]), run_model(pyfunc, [row]))
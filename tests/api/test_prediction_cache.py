@@ -0,0 +1,60 @@
+from api.prediction_cache import PredictionCache
+
+
+def test_prediction_cache_canonical_key():
+    cache = PredictionCache(max_entries=10, coordinate_digits=3)
+    coordinates = frozenset(['lat', 'lng'])
+
+    key = cache.key('a', {'lat': -23.17891, 'lng': -45.8869, 'rooms': 2},
+                    coordinates)
+    same_key = cache.key('a', {'rooms': 2, 'lng': -45.88688, 'lat': -23.1789},
+                         coordinates)
+    other_model = cache.key('a2', {'lat': -23.1789, 'lng': -45.8869,
+                                   'rooms': 2}, coordinates)
+
+    assert key == same_key
+    assert key != other_model
+    assert cache.key('a', {'options': ['a', 'b']}) is None
+    assert cache.key('a', {'rooms': 2}, extra=(64,)) != \
+        cache.key('a', {'rooms': 2}, extra=(32,))
+
+
+def test_prediction_cache_lru_and_stats():
+    cache = PredictionCache(max_entries=2)
+
+    cache.put(('a', 1), 10)
+    cache.put(('a', 2), 20)
+    assert cache.get(('a', 1)) == 10
+    cache.put(('a', 3), 30)
+
+    assert cache.get(('a', 2)) is None
+    assert cache.get(('a', 3)) == 30
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 2 / 3
+    assert stats['evictions'] == 1
+
+
+def test_prediction_cache_invalidate():
+    cache = PredictionCache(max_entries=10)
+
+    cache.put(('a', 1), 10)
+    cache.put(('b', 1), 20)
+    cache.invalidate('a')
+
+    assert cache.get(('a', 1)) is None
+    assert cache.get(('b', 1)) == 20
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_prediction_cache_disabled():
+    cache = PredictionCache(max_entries=0)
+
+    key = cache.key('a', {'rooms': 2})
+    cache.put(key, 10)
+
+    assert key is None
+    assert cache.get(key) is None
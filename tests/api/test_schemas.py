@@ -0,0 +1,139 @@
+import pytest
+from pydantic import ValidationError
+from api.schemas import InputItem, SweepItem, validate_input_data, \
+    create_features_model, format_validation_error, get_input_columns, \
+    get_sweep_values, parse_csv_value
+from tests.conftest import std_input_cases
+
+
+inputs = [
+    InputItem(models_id='0', **input_case) for input_case in std_input_cases]
+
+valid_features = {
+    'neighbourhood': 'Morumbi',
+    'is_new': True,
+    'n_bedrooms': 2,
+    'area_m2': 80.5,
+    'latitude': -23.1,
+    'longitude': -45
+}
+
+
+@pytest.mark.parametrize(
+    "features",
+    [
+        # Missing field
+        {k: v for k, v in valid_features.items() if k != 'n_bedrooms'},
+        # Extra field
+        {**valid_features, 'pool': True},
+        # Wrong types
+        {**valid_features, 'n_bedrooms': 2.5},
+        {**valid_features, 'is_new': 'yes'},
+        {**valid_features, 'area_m2': '80'},
+        {**valid_features, 'latitude': None},
+        # Option not listed
+        {**valid_features, 'neighbourhood': 'Centro'},
+    ]
+)
+def test_features_model_rejects_invalid(features):
+    features_model = create_features_model('0', inputs)
+
+    with pytest.raises((ValueError, TypeError)):
+        validate_input_data(inputs, features)
+
+    with pytest.raises(ValidationError):
+        features_model.model_validate(features)
+
+
+def test_features_model_categorical_without_options():
+    no_options = [InputItem(
+        models_id='0', **{**std_input_cases[0], 'options': []})]
+    features_model = create_features_model('0', no_options)
+
+    # Like validate_input_data, no value is accepted
+    for value in ['Morumbi', '']:
+        with pytest.raises(ValueError):
+            validate_input_data(no_options, {'neighbourhood': value})
+        with pytest.raises(ValidationError, match='not a valid option'):
+            features_model.model_validate({'neighbourhood': value})
+
+
+def test_features_model_accepts_valid():
+    features_model = create_features_model('0', inputs)
+
+    validate_input_data(inputs, valid_features)
+    features = features_model.model_validate(valid_features)
+
+    assert features.model_dump(by_alias=True) == valid_features
+    assert features_model.__name__ == 'PredictFeatures_0'
+
+
+def test_format_validation_error():
+    features_model = create_features_model('0', inputs)
+
+    with pytest.raises(ValidationError) as e:
+        features_model.model_validate(
+            {**valid_features, 'neighbourhood': 'Centro', 'pool': 1})
+
+    message = format_validation_error(e.value)
+    assert "Field 'neighbourhood'" in message
+    assert "'Centro'" in message
+    assert "Field 'pool'" in message
+
+
+def test_get_input_columns():
+    columns = get_input_columns(inputs)
+
+    assert set(columns) == set(valid_features)
+    assert columns['latitude'] is columns['longitude']
+
+
+@pytest.mark.parametrize(
+    "column, value, expected",
+    [
+        ('n_bedrooms', '3', 3),
+        ('n_bedrooms', '3.0', 3),
+        ('n_bedrooms', '3.5', '3.5'),
+        ('n_bedrooms', 'three', 'three'),
+        ('area_m2', '80', 80.0),
+        ('latitude', '-23.1', -23.1),
+        ('is_new', 'True', True),
+        ('is_new', 'false', False),
+        ('is_new', 'yes', 'yes'),
+        ('neighbourhood', '1', '1'),
+        ('pool', '1', '1'),
+    ]
+)
+def test_parse_csv_value(column, value, expected):
+    columns = get_input_columns(inputs)
+
+    parsed = parse_csv_value(columns.get(column), value)
+
+    assert parsed == expected
+    assert type(parsed) is type(expected)
+
+
+@pytest.mark.parametrize(
+    "sweep, expected",
+    [
+        ({'feature': 'neighbourhood'}, ['Morumbi', 'América']),
+        ({'feature': 'is_new'}, [False, True]),
+        ({'feature': 'n_bedrooms', 'start': 1, 'stop': 3, 'steps': 5},
+         [1, 2, 3]),
+        ({'feature': 'area_m2', 'start': 50, 'stop': 100, 'steps': 3},
+         [50, 75, 100]),
+        ({'feature': 'area_m2', 'values': [60, 70.5]}, [60, 70.5]),
+    ]
+)
+def test_get_sweep_values(sweep, expected):
+    columns = get_input_columns(inputs)
+    sweep = SweepItem(**sweep)
+
+    assert get_sweep_values(columns[sweep.feature], sweep) == expected
+
+
+def test_get_sweep_values_without_range():
+    columns = get_input_columns(inputs)
+
+    with pytest.raises(ValueError, match='start and stop'):
+        get_sweep_values(columns['area_m2'], SweepItem(feature='area_m2'))
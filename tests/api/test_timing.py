@@ -0,0 +1,56 @@
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api import timing
+from api.timing import RequestTimings, ServerTimingMiddleware
+
+
+def test_request_timings():
+    timings = RequestTimings()
+    timings.add('db', 0.001)
+    timings.add('db', 0.002)
+    timings.add('predict', 0.01)
+
+    assert timings.fields() == {'db': 3.0, 'predict': 10.0}
+    assert timings.header(0.02) == \
+        'db;dur=3.00, predict;dur=10.00, total;dur=20.00'
+
+
+def test_phase_outside_request():
+    with timing.phase('db'):
+        pass
+    timing.record('db', 1)
+    assert timing.current() is None
+
+
+def test_server_timing_middleware(caplog):
+    logger = logging.getLogger('test_timing')
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware, logger=logger, slow_ms=5)
+
+    @app.get('/fast')
+    def fast():
+        with timing.phase('db'):
+            pass
+        return {}
+
+    @app.get('/slow')
+    async def slow():
+        with timing.phase('predict'):
+            time.sleep(0.01)
+        return {}
+
+    with caplog.at_level(logging.DEBUG, logger='test_timing'):
+        client = TestClient(app)
+        fast_response = client.get('/fast')
+        slow_response = client.get('/slow')
+
+    assert fast_response.headers['server-timing'].startswith('db;dur=')
+    assert slow_response.headers['server-timing'].startswith('predict;dur=')
+
+    fast_record, slow_record = caplog.records
+    assert fast_record.levelno == logging.DEBUG
+    assert slow_record.levelno == logging.WARNING
+    assert slow_record.route == '/slow'
+    assert slow_record.timings['predict'] >= 10
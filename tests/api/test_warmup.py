@@ -0,0 +1,76 @@
+import pytest
+from api.schemas import InputItem
+from api.warmup import WarmUp, Popularity, select_models, dummy_features
+from tests.conftest import std_input_cases
+
+
+def test_dummy_features():
+    inputs = [
+        InputItem(models_id='0', **input_case)
+        for input_case in std_input_cases]
+
+    features = dummy_features(inputs)
+
+    assert features == {
+        'neighbourhood': 'Morumbi',
+        'is_new': False,
+        'n_bedrooms': 1,
+        'area_m2': 1.0,
+        'latitude': 0.0,
+        'longitude': 0.0
+    }
+
+    # Categorical inputs without options don't break the warm-up
+    no_options = InputItem(
+        models_id='0', **{**std_input_cases[0], 'options': []})
+    assert dummy_features([no_options]) == {'neighbourhood': ''}
+
+
+@pytest.mark.parametrize(
+    "setting, expected",
+    [
+        ('', []),
+        ('all', ['a', 'b', 'c']),
+        ('top:2', ['c', 'a']),
+        ('b, c', ['b', 'c']),
+    ]
+)
+def test_select_models(setting, expected):
+    ranked = lambda: ['c', 'a', 'b']
+    assert select_models(setting, ['a', 'b', 'c'], ranked) == expected
+
+
+def test_popularity(tmp_path):
+    path = str(tmp_path / 'popularity.json')
+    popularity = Popularity()
+
+    popularity.add('b', 3)
+    popularity.save(path)
+    popularity.add('a')
+    popularity.add('c', 2)
+
+    assert popularity.rank(['a', 'b', 'c'], path) == ['b', 'c', 'a']
+
+    popularity.save(path)
+    assert Popularity().load(path) == {'a': 1, 'b': 3, 'c': 2}
+
+
+def test_warm_up():
+    def warm_model(model_id):
+        if model_id == 'broken':
+            raise ValueError('broken model')
+
+    warm_up = WarmUp()
+    assert warm_up.ready
+
+    warm_up.start(['a', 'broken'], warm_model, workers=2)
+    warm_up._executor.shutdown(wait=True)
+
+    # A model that failed to warm up is listed but doesn't keep the API
+    # from being ready
+    status = warm_up.status()
+    assert status['ready']
+    assert warm_up.ready
+    assert status['pending'] == []
+    assert status['loaded'] == ['a']
+    assert status['failed'] == {'broken': 'broken model'}
@@ -96,4 +96,51 @@ def test_query_get_models_from_city(temp_db_path):
 
     res = execute_with_pandas(query, params)
     print(res)
-    assert res['data_year'].to_list() == expected
\ No newline at end of file
+    assert res['data_year'].to_list() == expected
+
+def test_fetch_rows(temp_db_path):
+    from database.crud import fetch_rows
+
+    res = fetch_rows(queries['get_all_cities'], {'country': 'Norway'})
+
+    assert res == [
+        {'id': 'Q26793', 'city': 'Bergen', 'hierarchy': 'Bergen Municipality'},
+        {'id': 'Q585', 'city': 'Oslo', 'hierarchy': 'Oslo Municipality'},
+    ]
+
+    res = fetch_rows(
+        queries['get_all_cities'], {'country': 'Norway'},
+        mapper=lambda row: row['city'])
+
+    assert res == ['Bergen', 'Oslo']
+
+
+def test_fetch_row(temp_db_path):
+    from database.crud import fetch_row
+
+    res = fetch_row(queries['get_model'], {'model_id': str(standard_uuid)})
+    missing = fetch_row(queries['get_model'], {'model_id': 'missing'})
+
+    assert res['id'] == str(standard_uuid)
+    assert missing is None
+
+
+def test_fetch_value(temp_db_path):
+    from database.crud import fetch_value
+
+    assert fetch_value(queries['get_catalog_version']) == 0
+    assert fetch_value(queries['get_model'], {'model_id': 'missing'}) is None
+
+
+def test_query_listeners(temp_db_path, monkeypatch):
+    from database import crud
+
+    calls = []
+    monkeypatch.setattr(crud, 'query_listeners', [
+        lambda query, seconds: calls.append((query, seconds))])
+
+    crud.fetch_value(queries['get_catalog_version'])
+
+    assert len(calls) == 1
+    assert calls[0][0] == queries['get_catalog_version']
+    assert calls[0][1] > 0
@@ -0,0 +1,60 @@
+import json
+import zipfile
+import mlflow.sklearn
+import numpy as np
+import onnxruntime as ort
+import pytest
+from mlflow_client.compilation import compile_model, convert_to_onnx, \
+    compiled_feed
+from mlflow_client.config import MODEL_FOLDER_NAME, COMPILED_MODEL_NAME
+from tests.conftest import std_input_cases, standard_uuid
+from tests.mlflow_client.conftest import generic_model, X_generic_model
+
+input_columns = list(X_generic_model.columns)
+
+
+def test_convert_to_onnx():
+    onnx_model = convert_to_onnx(
+        generic_model, 'sklearn', X_generic_model, input_columns)
+    props = {prop.key: prop.value for prop in onnx_model.metadata_props}
+    columns = json.loads(props['columns'])
+
+    session = ort.InferenceSession(onnx_model.SerializeToString())
+    predicted = session.run(
+        None, compiled_feed(X_generic_model, columns, props['layout']))[0]
+
+    assert columns == list(X_generic_model.columns)
+    assert np.allclose(
+        np.ravel(predicted), generic_model.predict(X_generic_model),
+        rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize('flavor', ['pytorch', 'xgboost', 'lightgbm'])
+def test_convert_to_onnx_unsupported_flavor(flavor):
+    with pytest.raises(ValueError, match="can't be compiled"):
+        convert_to_onnx(
+            generic_model, flavor, X_generic_model, input_columns)
+
+
+def test_compile_model(tmp_path):
+    mlflow.sklearn.save_model(generic_model, tmp_path / MODEL_FOLDER_NAME)
+    metadata = {
+        'flavor': 'sklearn',
+        'x_test': X_generic_model.to_dict(orient='records'),
+        'inputs': std_input_cases,
+    }
+
+    compile_model(str(tmp_path), metadata)
+    assert (tmp_path / COMPILED_MODEL_NAME).exists()
+
+
+def test_compile_model_rejects_columns_without_input(tmp_path):
+    # The dev model computes avg_room_size, which the API never receives
+    with zipfile.ZipFile(f'tests/data/{standard_uuid}.zip') as zip:
+        zip.extractall(tmp_path)
+    with open(tmp_path / 'model_metadata.json', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    with pytest.raises(ValueError, match='avg_room_size'):
+        compile_model(str(tmp_path), metadata)
+    assert not (tmp_path / COMPILED_MODEL_NAME).exists()
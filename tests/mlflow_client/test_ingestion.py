@@ -135,6 +135,8 @@ def test_sql_ingestion_success(ingestion_flow_env):
         c.execute('DELETE FROM models WHERE id = ?', (standard_uuid,))
         c.execute('DELETE FROM inputs WHERE models_id = ?', (standard_uuid,))
         c.execute('DELETE FROM model_city WHERE models_id = ?', (standard_uuid,))
+        c.execute('SELECT version FROM catalog')
+        catalog_version = c.fetchone()[0]
 
     make_ingestion()
 
@@ -157,6 +159,9 @@ def test_sql_ingestion_success(ingestion_flow_env):
                   (standard_uuid,))
         query_inputs = c.fetchall()
 
+        c.execute('SELECT version FROM catalog')
+        new_catalog_version = c.fetchone()[0]
+
     # Check database registers
     assert len(query_models) == 1
     print(query_cities)
@@ -164,6 +169,7 @@ def test_sql_ingestion_success(ingestion_flow_env):
     assert len(query_cities) == len(std_json['cities'])
     assert len(query_model_city) == len(std_json['cities'])
     assert len(query_inputs) == len(std_json['inputs'])
+    assert new_catalog_version == catalog_version + 1
 
     # Check storage file
     assert os.path.exists(f'{storage_path}/{standard_uuid}')